@@ -0,0 +1,77 @@
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from alembic.script import ScriptDirectory
+from sqlalchemy import engine_from_config, inspect, pool
+from sqlalchemy.engine import make_url
+
+from database import Base
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Migrations run on a sync driver; DATABASE_URL from the environment takes precedence over alembic.ini
+database_url = os.getenv("DATABASE_URL")
+if database_url:
+    url = make_url(database_url)
+    if url.drivername == "postgresql+asyncpg":
+        url = url.set(drivername="postgresql+psycopg2")
+    elif url.drivername == "sqlite+aiosqlite":
+        url = url.set(drivername="sqlite")
+    config.set_main_option("sqlalchemy.url", url.render_as_string(hide_password=False).replace("%", "%%"))
+
+target_metadata = Base.metadata
+
+# Schema that the old Base.metadata.create_all() call at startup built, before migrations existed
+CREATE_ALL_REVISION = "0001_initial_schema"
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def stamp_create_all_schema(connection) -> None:
+    """
+    Mark a database built by create_all() as being at the initial revision, so upgrading it
+    does not try to create tables that already exist
+    """
+    tables = inspect(connection).get_table_names()
+    if "alembic_version" not in tables and "form_sessions" in tables:
+        context.get_context().stamp(ScriptDirectory.from_config(config), CREATE_ALL_REVISION)
+
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+
+        with context.begin_transaction():
+            stamp_create_all_schema(connection)
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,64 @@
+"""Initial schema: form sessions and form fields
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+Databases created by the old Base.metadata.create_all() call at startup
+already have these tables; env.py stamps them with this revision before
+upgrading.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial_schema"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "form_sessions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("output_path", sa.String(), nullable=True),
+        sa.Column("total_fields", sa.Integer(), nullable=True),
+        sa.Column("filled_fields", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_form_sessions_id", "form_sessions", ["id"])
+    op.create_index("ix_form_sessions_session_id", "form_sessions", ["session_id"], unique=True)
+
+    op.create_table(
+        "form_fields",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("field_name", sa.String(), nullable=False),
+        sa.Column("field_type", sa.String(), nullable=False),
+        sa.Column("value", sa.Text(), nullable=True),
+        sa.Column("is_filled", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_form_fields_id", "form_fields", ["id"])
+    op.create_index("ix_form_fields_session_id", "form_fields", ["session_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_form_fields_session_id", table_name="form_fields")
+    op.drop_index("ix_form_fields_id", table_name="form_fields")
+    op.drop_table("form_fields")
+    op.drop_index("ix_form_sessions_session_id", table_name="form_sessions")
+    op.drop_index("ix_form_sessions_id", table_name="form_sessions")
+    op.drop_table("form_sessions")
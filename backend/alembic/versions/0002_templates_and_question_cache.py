@@ -0,0 +1,67 @@
+"""Form templates, question cache and pre-generated questions
+
+Revision ID: 0002_templates_and_questions
+Revises: 0001_initial_schema
+Create Date: 2026-10-17 00:00:01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_templates_and_questions"
+down_revision: Union[str, None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "form_templates",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("file_size", sa.Integer(), nullable=False),
+        sa.Column("field_schema", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_form_templates_id", "form_templates", ["id"])
+    op.create_index("ix_form_templates_content_hash", "form_templates", ["content_hash"], unique=True)
+
+    op.create_table(
+        "question_cache",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("field_name", sa.String(), nullable=False),
+        sa.Column("field_type", sa.String(), nullable=False),
+        sa.Column("prompt_version", sa.String(), nullable=False),
+        sa.Column("question", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_question_cache_id", "question_cache", ["id"])
+    op.create_index("ix_question_cache_cache_key", "question_cache", ["cache_key"], unique=True)
+
+    op.add_column("form_sessions", sa.Column("template_id", sa.Integer(), nullable=True))
+    op.create_index("ix_form_sessions_template_id", "form_sessions", ["template_id"])
+
+    op.add_column("form_fields", sa.Column("question", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("form_fields", "question")
+
+    op.drop_index("ix_form_sessions_template_id", table_name="form_sessions")
+    op.drop_column("form_sessions", "template_id")
+
+    op.drop_index("ix_question_cache_cache_key", table_name="question_cache")
+    op.drop_index("ix_question_cache_id", table_name="question_cache")
+    op.drop_table("question_cache")
+
+    op.drop_index("ix_form_templates_content_hash", table_name="form_templates")
+    op.drop_index("ix_form_templates_id", table_name="form_templates")
+    op.drop_table("form_templates")
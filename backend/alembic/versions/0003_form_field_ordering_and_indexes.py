@@ -0,0 +1,54 @@
+"""Field ordinal, (session_id, is_filled, ordinal) index and unique (session_id, field_name)
+
+Revision ID: 0003_form_field_indexes
+Revises: 0002_templates_and_questions
+Create Date: 2026-10-17 00:00:02
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_form_field_indexes"
+down_revision: Union[str, None] = "0002_templates_and_questions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("form_fields") as batch_op:
+        batch_op.add_column(sa.Column("ordinal", sa.Integer(), server_default="0", nullable=False))
+
+    # Existing rows keep their insertion order
+    op.execute(
+        """
+        UPDATE form_fields
+        SET ordinal = ranked.position
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY id) - 1 AS position
+            FROM form_fields
+        ) AS ranked
+        WHERE form_fields.id = ranked.id
+        """
+    )
+
+    op.drop_index("ix_form_fields_session_id", table_name="form_fields")
+    op.create_index(
+        "ix_form_fields_session_filled_ordinal",
+        "form_fields",
+        ["session_id", "is_filled", "ordinal"],
+    )
+    with op.batch_alter_table("form_fields") as batch_op:
+        batch_op.create_unique_constraint("uq_form_fields_session_field", ["session_id", "field_name"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("form_fields") as batch_op:
+        batch_op.drop_constraint("uq_form_fields_session_field", type_="unique")
+    op.drop_index("ix_form_fields_session_filled_ordinal", table_name="form_fields")
+    op.create_index("ix_form_fields_session_id", "form_fields", ["session_id"])
+    with op.batch_alter_table("form_fields") as batch_op:
+        batch_op.drop_column("ordinal")
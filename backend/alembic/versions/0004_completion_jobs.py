@@ -0,0 +1,57 @@
+"""Completion job queue
+
+Revision ID: 0004_completion_jobs
+Revises: 0003_form_field_indexes
+Create Date: 2026-10-17 00:00:03
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_completion_jobs"
+down_revision: Union[str, None] = "0003_form_field_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "completion_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.String(length=36), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("input_hash", sa.String(length=64), nullable=True),
+        sa.Column("output_path", sa.String(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_completion_jobs_id", "completion_jobs", ["id"])
+    op.create_index("ix_completion_jobs_job_id", "completion_jobs", ["job_id"], unique=True)
+    op.create_index("ix_completion_jobs_session_id", "completion_jobs", ["session_id"])
+    op.create_index("ix_completion_jobs_status_id", "completion_jobs", ["status", "id"])
+    op.create_index(
+        "uq_completion_jobs_active_session",
+        "completion_jobs",
+        ["session_id"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+        sqlite_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_completion_jobs_active_session", table_name="completion_jobs")
+    op.drop_index("ix_completion_jobs_status_id", table_name="completion_jobs")
+    op.drop_index("ix_completion_jobs_session_id", table_name="completion_jobs")
+    op.drop_index("ix_completion_jobs_job_id", table_name="completion_jobs")
+    op.drop_index("ix_completion_jobs_id", table_name="completion_jobs")
+    op.drop_table("completion_jobs")
@@ -0,0 +1,26 @@
+"""Output fingerprint on form sessions
+
+Revision ID: 0005_output_fingerprint
+Revises: 0004_completion_jobs
+Create Date: 2026-10-17 00:00:04
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_output_fingerprint"
+down_revision: Union[str, None] = "0004_completion_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("form_sessions", sa.Column("output_fingerprint", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("form_sessions", "output_fingerprint")
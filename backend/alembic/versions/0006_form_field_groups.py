@@ -0,0 +1,26 @@
+"""Multi-field question groups on form fields
+
+Revision ID: 0006_form_field_groups
+Revises: 0005_output_fingerprint
+Create Date: 2026-10-17 00:00:05
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_form_field_groups"
+down_revision: Union[str, None] = "0005_output_fingerprint"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("form_fields", sa.Column("group_key", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("form_fields", "group_key")
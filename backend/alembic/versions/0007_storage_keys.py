@@ -0,0 +1,49 @@
+"""Store file locations as storage keys relative to UPLOAD_DIR
+
+Revision ID: 0007_storage_keys
+Revises: 0006_form_field_groups
+Create Date: 2026-10-17 00:00:06
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_storage_keys"
+down_revision: Union[str, None] = "0006_form_field_groups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PATH_COLUMNS = [
+    ("form_templates", "file_path"),
+    ("form_sessions", "file_path"),
+    ("form_sessions", "output_path"),
+    ("completion_jobs", "output_path"),
+]
+
+
+def _upload_prefix() -> str:
+    return os.getenv("UPLOAD_DIR", "uploads").rstrip("/") + "/"
+
+
+def upgrade() -> None:
+    # uploads/templates/<sha256>.pdf becomes templates/<sha256>.pdf
+    prefix = _upload_prefix()
+    for table, column in PATH_COLUMNS:
+        op.execute(
+            sa.text(f"UPDATE {table} SET {column} = substr({column}, :start) WHERE {column} LIKE :pattern")
+            .bindparams(start=len(prefix) + 1, pattern=prefix + "%")
+        )
+
+
+def downgrade() -> None:
+    prefix = _upload_prefix()
+    for table, column in PATH_COLUMNS:
+        op.execute(
+            sa.text(f"UPDATE {table} SET {column} = :prefix || {column} WHERE {column} NOT LIKE '/%'")
+            .bindparams(prefix=prefix)
+        )
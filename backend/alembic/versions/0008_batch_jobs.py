@@ -0,0 +1,51 @@
+"""Batch fill jobs
+
+Revision ID: 0008_batch_jobs
+Revises: 0007_storage_keys
+Create Date: 2026-10-17 00:00:07
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_batch_jobs"
+down_revision: Union[str, None] = "0007_storage_keys"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "batch_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.String(length=36), nullable=False),
+        sa.Column("template_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("rows_path", sa.String(), nullable=False),
+        sa.Column("output_path", sa.String(), nullable=True),
+        sa.Column("total_rows", sa.Integer(), nullable=False),
+        sa.Column("filled_rows", sa.Integer(), nullable=False),
+        sa.Column("failed_rows", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_batch_jobs_id", "batch_jobs", ["id"])
+    op.create_index("ix_batch_jobs_job_id", "batch_jobs", ["job_id"], unique=True)
+    op.create_index("ix_batch_jobs_template_id", "batch_jobs", ["template_id"])
+    op.create_index("ix_batch_jobs_status_id", "batch_jobs", ["status", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_batch_jobs_status_id", table_name="batch_jobs")
+    op.drop_index("ix_batch_jobs_template_id", table_name="batch_jobs")
+    op.drop_index("ix_batch_jobs_job_id", table_name="batch_jobs")
+    op.drop_index("ix_batch_jobs_id", table_name="batch_jobs")
+    op.drop_table("batch_jobs")
@@ -0,0 +1,33 @@
+"""Last use of form templates, for reaping unused ones
+
+Revision ID: 0009_template_last_used
+Revises: 0008_batch_jobs
+Create Date: 2026-10-17 00:00:08
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_template_last_used"
+down_revision: Union[str, None] = "0008_batch_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "form_templates",
+        sa.Column("last_used_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    # Existing templates count as used when they were registered
+    op.execute("UPDATE form_templates SET last_used_at = created_at WHERE created_at IS NOT NULL")
+    op.create_index("ix_form_templates_last_used_at", "form_templates", ["last_used_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_form_templates_last_used_at", table_name="form_templates")
+    op.drop_column("form_templates", "last_used_at")
@@ -0,0 +1,57 @@
+"""
+Compare AcroForm tree extraction with the page scan on a large, mostly scanned form
+Run from the backend directory:
+    python -m benchmarks.bench_extract --form-pages 20 --scanned-pages 480
+"""
+import os
+import logging
+import argparse
+import tempfile
+
+import fitz  # PyMuPDF
+
+from benchmarks.bench_fill import time_runs
+from benchmarks.synthetic_forms import generate_form
+from services.pdf_service import PDFService
+
+
+def extract(service: PDFService, path: str, mode: str):
+    doc = fitz.open(path)
+    if mode == "acroform":
+        service._schema_from_acroform(doc)
+    else:
+        service._schema_from_pages(doc)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--form-pages", type=int, default=20)
+    parser.add_argument("--fields-per-page", type=int, default=10)
+    parser.add_argument("--scanned-pages", type=int, default=480)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("services").setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="bench_extract_")
+    form_path = os.path.join(workdir, "form.pdf")
+    answers = generate_form(form_path, args.form_pages, args.fields_per_page, args.scanned_pages)
+
+    service = PDFService()
+    results = {
+        "page scan": time_runs(lambda: extract(service, form_path, "scan"), args.repeat),
+        "acroform tree": time_runs(lambda: extract(service, form_path, "acroform"), args.repeat),
+    }
+
+    baseline = results["page scan"]["median"]
+    print(f"{args.form_pages + args.scanned_pages} pages, {len(answers)} fields, {args.repeat} runs")
+    for name, timing in results.items():
+        print(
+            f"{name:<14} median {timing['median'] * 1000:8.1f} ms"
+            f"  min {timing['min'] * 1000:8.1f} ms  speedup {baseline / timing['median']:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
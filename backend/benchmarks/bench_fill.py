@@ -0,0 +1,113 @@
+"""
+Compare the single-pass fill engine with the previous three-pass implementation
+
+Run from the backend directory:
+    python -m benchmarks.bench_fill --pages 120 --fields-per-page 10
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+from typing import Callable, Dict
+
+import fitz  # PyMuPDF
+
+from benchmarks.synthetic_forms import generate_form
+from services.pdf_service import PDFService
+
+
+def legacy_fill(input_path: str, field_values: Dict[str, str], output_path: str):
+    """
+    The three-pass fill, draw and delete implementation the engine replaced
+    """
+    doc = fitz.open(input_path)
+    for page in doc:
+        for widget in list(page.widgets()):
+            if widget.field_name in field_values:
+                value = field_values[widget.field_name]
+                if widget.field_type in [3] and not widget.choice_values:
+                    widget.field_value = value.lower() in ["yes", "true", "1", "on", "checked"]
+                else:
+                    widget.field_value = value
+                widget.update()
+
+    for page in doc:
+        for widget in list(page.widgets()):
+            value = field_values.get(widget.field_name)
+            if not value:
+                continue
+            rect = widget.rect
+            text_rect = fitz.Rect(rect.x0 + 2, rect.y0 + 1, rect.x1 - 2, rect.y1 - 1)
+            if widget.field_type in [1, 7, 4] or (widget.field_type == 3 and widget.choice_values):
+                page.insert_textbox(text_rect, str(value), fontsize=10, color=(0, 0, 0))
+            elif widget.field_type == 3:
+                if value.lower() in ["yes", "true", "1", "on", "checked"]:
+                    page.insert_textbox(rect, "✓", fontsize=12, color=(0, 0, 0), align=1)
+            elif widget.field_type == 2:
+                if str(value).lower() not in ["no", "false", "0", "off", ""]:
+                    center = fitz.Point((rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2)
+                    page.draw_circle(center, min(rect.width, rect.height) / 4, color=(0, 0, 0), fill=(0, 0, 0))
+
+    for page in doc:
+        page.clean_contents()
+        for annot in [annot for annot in page.annots() if annot.type[0] == 2]:
+            page.delete_annot(annot)
+
+    doc.save(output_path, incremental=False, deflate=True)
+    doc.close()
+
+
+def time_runs(fn: Callable[[], None], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--fields-per-page", type=int, default=10)
+    parser.add_argument("--filled-ratio", type=float, default=1.0, help="fraction of fields that get a value")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("services").setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="bench_fill_")
+    os.environ["UPLOAD_DIR"] = workdir
+
+    form_path = os.path.join(workdir, "form.pdf")
+    answers = generate_form(form_path, args.pages, args.fields_per_page)
+    names = list(answers)
+    field_values = {name: answers[name] for name in names[:int(len(names) * args.filled_ratio)]}
+
+    service = PDFService()
+    schema = service.extract_field_schema(form_path)
+
+    results = {
+        "legacy three-pass": time_runs(
+            lambda: legacy_fill(form_path, field_values, os.path.join(workdir, "legacy.pdf")), args.repeat
+        ),
+        "engine, schema extracted": time_runs(
+            lambda: service.fill_pdf_form(form_path, field_values, "engine_cold"), args.repeat
+        ),
+        "engine, cached schema": time_runs(
+            lambda: service.fill_pdf_form(form_path, field_values, "engine_warm", schema), args.repeat
+        ),
+    }
+
+    baseline = results["legacy three-pass"]["median"]
+    print(f"{args.pages} pages, {len(names)} fields, {len(field_values)} values, {args.repeat} runs")
+    for name, timing in results.items():
+        print(
+            f"{name:<26} median {timing['median'] * 1000:8.1f} ms"
+            f"  min {timing['min'] * 1000:8.1f} ms  speedup {baseline / timing['median']:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
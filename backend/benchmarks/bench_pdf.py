@@ -0,0 +1,63 @@
+"""
+Latency percentiles for field extraction and filling on a synthetic form
+
+Run from the backend directory:
+    python -m benchmarks.bench_pdf --pages 20 --fields-per-page 10 --repeat 50
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+from typing import Callable, List
+
+from benchmarks.stats import format_row, summarize
+from benchmarks.synthetic_forms import generate_form
+from services.pdf_service import PDFService
+
+
+def sample(fn: Callable[[], None], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--fields-per-page", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("services").setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+    os.environ["UPLOAD_DIR"] = workdir
+
+    form_path = os.path.join(workdir, "form.pdf")
+    field_values = generate_form(form_path, args.pages, args.fields_per_page)
+    service = PDFService()
+    schema = service.extract_field_schema(form_path)
+    output_path = os.path.join(workdir, "filled.pdf")
+
+    cases = {
+        "extract_form_fields": lambda: service.extract_form_fields(form_path),
+        "fill_pdf_form": lambda: service.fill_pdf_form(form_path, field_values, "bench", None, output_path),
+        "fill_pdf_form, cached schema": lambda: service.fill_pdf_form(
+            form_path, field_values, "bench", schema, output_path
+        ),
+    }
+
+    print(f"{args.pages} pages, {len(field_values)} fields, {args.repeat} runs")
+    for name, fn in cases.items():
+        sample(fn, args.warmup)
+        start = time.perf_counter()
+        timings = sample(fn, args.repeat)
+        print(format_row(name, summarize(timings, time.perf_counter() - start)))
+
+
+if __name__ == "__main__":
+    main()
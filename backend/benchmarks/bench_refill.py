@@ -0,0 +1,77 @@
+"""
+Compare an incremental re-fill of a few changed fields with rewriting the whole filled form
+Run from the backend directory:
+    python -m benchmarks.bench_refill --pages 120 --changed 1
+"""
+import os
+import logging
+import argparse
+import tempfile
+
+from benchmarks.bench_fill import time_runs
+from benchmarks.synthetic_forms import generate_form
+from services.pdf_service import PDFService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--fields-per-page", type=int, default=10)
+    parser.add_argument("--changed", type=int, default=1, help="number of text fields edited after completion")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("services").setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="bench_refill_")
+    form_path = os.path.join(workdir, "form.pdf")
+    answers = generate_form(form_path, args.pages, args.fields_per_page)
+
+    flattening = PDFService(flatten_output=True)
+    interactive = PDFService(flatten_output=False)
+    schema = interactive.extract_field_schema(form_path)
+
+    # The previous output, then the same answers with a few text fields edited
+    base_path = interactive.fill_pdf_form(form_path, answers, "base", schema, os.path.join(workdir, "base.pdf"))
+    edited = dict(answers)
+    text_fields = [name for name in answers if "_text_" in name]
+    for name in text_fields[:args.changed]:
+        edited[name] = f"{answers[name]} (corrected)"
+
+    outputs = {
+        "flattened rewrite": os.path.join(workdir, "flattened.pdf"),
+        "interactive rewrite": os.path.join(workdir, "rewrite.pdf"),
+        "incremental update": os.path.join(workdir, "incremental.pdf"),
+    }
+    results = {
+        "flattened rewrite": time_runs(
+            lambda: flattening.fill_pdf_form(form_path, edited, "flat", schema, outputs["flattened rewrite"]),
+            args.repeat,
+        ),
+        "interactive rewrite": time_runs(
+            lambda: interactive.fill_pdf_form(form_path, edited, "full", schema, outputs["interactive rewrite"]),
+            args.repeat,
+        ),
+        "incremental update": time_runs(
+            lambda: interactive.fill_pdf_form(
+                form_path, edited, "incr", schema, outputs["incremental update"], base_path
+            ),
+            args.repeat,
+        ),
+    }
+
+    base_size = os.path.getsize(base_path)
+    baseline = results["interactive rewrite"]["median"]
+    print(f"{args.pages} pages, {len(answers)} fields, {args.changed} changed, {args.repeat} runs")
+    for name, timing in results.items():
+        size = os.path.getsize(outputs[name])
+        # The incremental path copies the base and serializes only the appended update
+        serialized = size - base_size if name == "incremental update" else size
+        print(
+            f"{name:<20} median {timing['median'] * 1000:8.1f} ms  speedup {baseline / timing['median']:5.1f}x"
+            f"  file {size / 1024:8.1f} KiB  serialized {serialized / 1024:8.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
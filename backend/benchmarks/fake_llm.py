@@ -0,0 +1,189 @@
+"""
+Local stand-in for the Azure OpenAI chat completions API with configurable latency
+Answers the question, batch question, answer and batch answer prompts AIService sends
+
+Run from the backend directory:
+    python -m benchmarks.fake_llm --port 8100 --latency-ms 400 --jitter-ms 100
+and point the backend at it:
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8100 OPENAI_API_KEY=bench API_VERSION=2024-02-01
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+USER_INPUT = re.compile(r"^Input: (.*)$", re.M | re.S)
+
+
+class LatencyModel:
+    def __init__(
+        self,
+        latency_ms: float,
+        jitter_ms: float,
+        token_ms: float,
+        error_rate: float,
+        throttle_rate: float = 0.0,
+        retry_after_ms: float = 1000,
+    ):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.token_delay = token_ms / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after_ms = retry_after_ms
+
+    async def wait(self):
+        await asyncio.sleep(max(random.gauss(self.latency, self.jitter), 0.0))
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+    def should_throttle(self) -> bool:
+        return random.random() < self.throttle_rate
+
+
+def json_payload(prompt: str) -> object:
+    """
+    Find the JSON list or object sent on its own line in a batch prompt
+    """
+    for line in prompt.splitlines():
+        line = line.strip()
+        if line.startswith(("[", "{")) and not line.startswith("{{"):
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+    return None
+
+
+def reply_for(prompt: str, json_mode: bool) -> str:
+    if json_mode and '"values"' in prompt:
+        payload = json_payload(prompt) or {}
+        names = [field["name"] for field in payload.get("fields", [])]
+        parts = [part.strip() for part in payload.get("input", "").split(",")]
+        return json.dumps({"values": dict(zip(names, parts))})
+    if json_mode and '"questions"' in prompt:
+        fields = json_payload(prompt) or []
+        return json.dumps({"questions": {
+            field["name"]: f"What should we enter for {field['name'].replace('_', ' ')}?" for field in fields
+        }})
+    if json_mode and '"answers"' in prompt:
+        items = json_payload(prompt) or {}
+        return json.dumps({"answers": {key: item["input"].strip() for key, item in items.items()}})
+
+    match = USER_INPUT.search(prompt)
+    if match:
+        return match.group(1).strip()
+    return "What value should we enter for this field?"
+
+
+def usage_for(prompt: str, content: str) -> dict:
+    # Roughly four characters per token, close enough for load shaping
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = max(len(content) // 4, 1)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def create_app(latency: LatencyModel) -> FastAPI:
+    app = FastAPI(title="Fake Azure OpenAI")
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        prompt = "\n".join(message["content"] for message in body["messages"])
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        content = reply_for(prompt, json_mode)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", deployment)
+
+        if latency.should_throttle():
+            # Rejected before any work, with the headers Azure OpenAI sends on 429s
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit exceeded", "type": "rate_limit_exceeded"}},
+                headers={
+                    "retry-after-ms": str(int(latency.retry_after_ms)),
+                    "retry-after": str(max(int(latency.retry_after_ms // 1000), 1)),
+                },
+            )
+
+        await latency.wait()
+        if latency.should_fail():
+            return JSONResponse(status_code=500, content={"error": {"message": "Injected failure", "type": "server_error"}})
+
+        if body.get("stream"):
+            async def chunks():
+                for word in re.findall(r"\S+\s*", content):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(latency.token_delay)
+                done = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage_for(prompt, content),
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=400, help="mean time to a response or first token")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="standard deviation of the latency")
+    parser.add_argument("--token-ms", type=float, default=20, help="delay between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument("--retry-after-ms", type=float, default=1000, help="Retry-After sent with 429s")
+    args = parser.parse_args()
+
+    latency = LatencyModel(
+        args.latency_ms, args.jitter_ms, args.token_ms, args.error_rate, args.throttle_rate, args.retry_after_ms
+    )
+    uvicorn.run(create_app(latency), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
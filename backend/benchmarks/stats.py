@@ -0,0 +1,40 @@
+"""
+Latency percentiles and throughput for benchmark reports
+"""
+import math
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], q: float) -> float:
+    """
+    Nearest-rank percentile of already sorted samples
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_samples)), 1)
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Summarize latencies in seconds measured over a wall-clock window of `elapsed` seconds
+    Returns: Dict with count, p50, p95, p99, max and throughput per second
+    """
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+        "throughput": len(ordered) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def format_row(name: str, summary: Dict[str, float], width: int = 28) -> str:
+    return (
+        f"{name:<{width}} n={summary['count']:<6}"
+        f" p50 {summary['p50'] * 1000:8.1f} ms  p95 {summary['p95'] * 1000:8.1f} ms"
+        f"  p99 {summary['p99'] * 1000:8.1f} ms  max {summary['max'] * 1000:8.1f} ms"
+        f"  {summary['throughput']:8.1f}/s"
+    )
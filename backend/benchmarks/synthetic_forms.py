@@ -0,0 +1,72 @@
+"""
+Generate synthetic fillable PDFs for benchmarks
+"""
+import argparse
+from typing import Dict
+
+import fitz  # PyMuPDF
+
+FIELD_KINDS = ["text", "text", "text", "checkbox", "combobox"]
+
+
+def generate_form(
+    output_path: str,
+    pages: int = 100,
+    fields_per_page: int = 10,
+    scanned_pages: int = 0,
+) -> Dict[str, str]:
+    """
+    Write a fillable PDF with the given number of pages and widgets per page
+    Optionally append image-only pages without widgets, like a scanned attachment
+    Returns: Dict mapping field names to a sample answer for each
+    """
+    doc = fitz.open()
+    answers = {}
+    for page_num in range(pages):
+        page = doc.new_page()
+        # Some body text so pages are not empty, as on real forms
+        page.insert_text((50, 40), f"Synthetic form - page {page_num + 1}", fontsize=14)
+        for index in range(fields_per_page):
+            kind = FIELD_KINDS[index % len(FIELD_KINDS)]
+            y = 70 + index * (700 / max(fields_per_page, 1))
+            name = f"p{page_num}_{kind}_{index}"
+            page.insert_text((50, y + 12), name, fontsize=9)
+
+            widget = fitz.Widget()
+            widget.field_name = name
+            if kind == "checkbox":
+                widget.field_type = fitz.PDF_WIDGET_TYPE_CHECKBOX
+                widget.rect = fitz.Rect(250, y, 264, y + 14)
+                answers[name] = "yes"
+            elif kind == "combobox":
+                widget.field_type = fitz.PDF_WIDGET_TYPE_COMBOBOX
+                widget.rect = fitz.Rect(250, y, 450, y + 16)
+                widget.choice_values = ["Alpha", "Beta", "Gamma"]
+                answers[name] = "Beta"
+            else:
+                widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+                widget.rect = fitz.Rect(250, y, 550, y + 16)
+                answers[name] = f"Answer for field {index} on page {page_num + 1}"
+            page.add_widget(widget)
+
+    if scanned_pages:
+        scan = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 850, 1100))
+        scan.clear_with(235)
+        image = scan.tobytes("png")
+        for _ in range(scanned_pages):
+            page = doc.new_page()
+            page.insert_image(page.rect, stream=image)
+
+    doc.save(output_path, deflate=True)
+    doc.close()
+    return answers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--fields-per-page", type=int, default=10)
+    parser.add_argument("--scanned-pages", type=int, default=0)
+    args = parser.parse_args()
+    generate_form(args.output, args.pages, args.fields_per_page, args.scanned_pages)
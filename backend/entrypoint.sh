@@ -0,0 +1,18 @@
+#!/bin/sh
+# Migrate the schema once, before any worker starts, then run the server
+set -e
+
+if [ "${RUN_MIGRATIONS:-true}" = "true" ]; then
+    # The database may still be starting when the container comes up
+    attempts=0
+    until alembic upgrade head; do
+        attempts=$((attempts + 1))
+        if [ "$attempts" -ge "${MIGRATION_ATTEMPTS:-10}" ]; then
+            echo "Migrations failed after $attempts attempts" >&2
+            exit 1
+        fi
+        sleep 3
+    done
+fi
+
+exec "$@"
@@ -0,0 +1,42 @@
+# Production server: gunicorn supervising uvicorn workers, started by entrypoint.sh after the migrations
+# Each worker runs its own event loop, PDF worker pool, completion queue workers and database pool,
+# so PDF_WORKER_PROCESSES and DB_POOL_SIZE apply per worker
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Workers import the app themselves; the process pools and asyncio tasks it starts cannot be shared across a fork
+preload_app = False
+
+# Completions run in the background, so requests are short, but startup warmup and uploads of large forms are not
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Restart workers now and then to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+
+accesslog = None
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+# Workers write their metrics here so that /metrics on any worker reports all of them; set before workers start
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus-multiproc"))
+
+
+def on_starting(server):
+    # Samples left by a previous run would be reported as if they came from live workers
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    # Drop the gauges of a dead worker, e.g. its requests and PDF jobs in progress
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import uuid
+import random
+import logging
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Fraction of requests whose debug and info events are kept; warnings and errors always are
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_context", default=None)
+
+
+def request_sampled() -> bool:
+    """
+    Whether the current request's low-level events are kept; work outside a request always is
+    """
+    context = _request_context.get()
+    return context is None or context["sampled"]
+
+
+def clear_request_context():
+    """
+    Forget the request a forked process happened to be created in
+    """
+    _request_context.set(None)
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """
+    Emit a structured event; nothing is formatted unless it will actually be written
+    Callable field values are only evaluated then, so expensive detail costs nothing when dropped
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING and not request_sampled():
+        return
+    fields = {key: value() if callable(value) else value for key, value in fields.items()}
+    logger.log(level, event, extra={"fields": fields})
+
+
+def duration_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Tag records with the current request id and drop low-level records of unsampled requests
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get()
+        if context is None:
+            return True
+        record.request_id = context["request_id"]
+        return context["sampled"] or record.levelno >= logging.WARNING
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, event, request id and event fields
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Human-readable lines for local development, with event fields as key=value pairs
+    """
+
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def configure_logging():
+    """
+    Install the structured handler on the root logger; safe to call more than once
+    """
+    root = logging.getLogger()
+    if any(getattr(handler, "_structured", False) for handler in root.handlers):
+        return
+    handler = logging.StreamHandler()
+    handler._structured = True
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    handler.addFilter(RequestContextFilter())
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    # The OpenAI client logs every HTTP request at INFO; the gateway records what matters
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware giving each request an id and a sampling decision for its log events
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = _request_context.set({
+            "request_id": request_id,
+            "sampled": LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE,
+        })
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_context.reset(token)
@@ -1,41 +1,98 @@
 import os
+import json
+import time
 import uuid
+import asyncio
 import logging
-from typing import List
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+import aiofiles
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import case, func, select, text, update
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
-from database import SessionLocal, engine
-from models import Base, FormSession, FormField
+from database import DB_POOL_SIZE, SessionLocal, engine
+from logging_config import RequestContextMiddleware, configure_logging, duration_ms, log_event
+from metrics import (
+    BATCH_JOB_SECONDS, CACHE_LOOKUPS, DB_POOL_CHECKOUT_SECONDS, DB_POOL_CHECKOUT_TIMEOUTS, MetricsMiddleware,
+    metrics_registry,
+)
+from models import BatchJob, CompletionJob, FormSession, FormField
 from schemas import (
     FormSessionResponse, 
     FormFieldResponse, 
     QuestionResponse, 
     AnswerRequest, 
-    FormCompletionResponse
+    BulkAnswerRequest,
+    BulkAnswerResponse,
+    CompletionJobResponse,
+    BatchJobResponse
 )
-from services.pdf_service import PDFService
+from services.pdf_service import FLATTEN_OUTPUT
+from services.llm_profiles import load_encodings
+from services.pdf_worker import PDFWorkerPool, PDFWorkerBusyError, PDFWorkerTimeoutError
 from services.ai_service import AIService
+from services.batch_fill import (
+    BatchFiller,
+    BatchRow,
+    InvalidBatchError,
+    detect_format,
+    parse_rows,
+    read_batch_upload,
+    stream_zip,
+)
+from services.template_service import TemplateInfo, TemplateRegistry
+from services.question_cache import QuestionCache
+from services.question_rules import question_for_group
+from services.completion_queue import CompletionQueue
+from services.output_cache import OutputCache
+from services.session_reaper import SessionReaper
+from services.shared_cache import create_shared_cache
+from services.storage import create_storage
+from services.upload_service import InvalidPDFError, UploadTooLargeError, discard_upload, stage_upload
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 30))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is owned by Alembic: `alembic upgrade head` runs once before the workers start (entrypoint.sh)
+    if STARTUP_WARMUP:
+        await warm_up()
+    completion_queue.start()
+    batch_queue.start()
+    session_reaper.start()
+    yield
+    await session_reaper.stop()
+    await batch_queue.stop()
+    await completion_queue.stop()
+    pdf_worker.shutdown()
+    if shared_cache is not None:
+        await shared_cache.close()
+    await engine.dispose()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI PDF Form Filler API",
     description="API for filling PDF forms using AI-guided conversations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -47,20 +104,113 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record latency for every request, keyed by route template rather than raw path
+app.add_middleware(MetricsMiddleware)
+# Tag log events with a request id and sample them per request
+app.add_middleware(RequestContextMiddleware)
+
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
+        # Check out the connection up front so pool wait time is measured
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except PoolTimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise HTTPException(status_code=503, detail="Database is busy. Please try again shortly.")
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
         yield db
-    finally:
-        db.close()
 
-# Initialize services
-pdf_service = PDFService()
-ai_service = AIService()
+ALL_FIELDS_FILLED_MESSAGE = "All fields have been filled! You can now download your completed form."
+SESSION_EXPIRED_MESSAGE = "Session has expired. Please upload the form again."
+
+# Initialize services; constructing them does no I/O, which waits for the lifespan hook
+storage = create_storage()
+shared_cache = create_shared_cache()
+pdf_worker = PDFWorkerPool()
+ai_service = AIService(question_cache=QuestionCache(SessionLocal, shared=shared_cache))
+template_registry = TemplateRegistry(storage=storage, shared=shared_cache)
+output_cache = OutputCache(storage)
+session_reaper = SessionReaper(SessionLocal, storage, template_registry=template_registry)
+batch_filler = BatchFiller(pdf_worker, storage)
+
+# Allowance for multipart boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv("BATCH_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+# Progress of a queued batch is written back at most this often
+BATCH_PROGRESS_INTERVAL = float(os.getenv("BATCH_PROGRESS_INTERVAL", 1.0))
+
+
+async def warm_db_pool(connections: Optional[int] = None) -> int:
+    """
+    Open pool connections ahead of the first requests
+    Returns: Number of connections opened
+    """
+    connections = connections or int(os.getenv("WARMUP_DB_CONNECTIONS", min(DB_POOL_SIZE, 4)))
+    async with AsyncExitStack() as stack:
+        # Hold them all at once so each is a separate connection that goes back to the pool
+        for _ in range(connections):
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.execute(text("SELECT 1"))
+    return connections
+
+
+async def warm_caches() -> Dict[str, int]:
+    async with SessionLocal() as db:
+        templates = await template_registry.warm(db)
+    questions = await ai_service.question_cache.warm(ai_service.PROMPT_VERSION)
+    return {"templates": templates, "questions": questions}
+
+
+async def warm_up():
+    """
+    Open database connections, start the PDF worker processes and load recent templates, questions
+    and token encodings, so a freshly started worker serves its first requests as fast as a warm one
+    A failed or slow step is logged and skipped; the worker then warms up on demand
+    """
+    start = time.perf_counter()
+    steps = {
+        "db_connections": warm_db_pool(),
+        "pdf_workers": pdf_worker.warm(),
+        "caches": warm_caches(),
+        "token_encodings": asyncio.to_thread(
+            load_encodings, [profile.model for profile in ai_service.profiles.values()]
+        ),
+    }
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*steps.values(), return_exceptions=True), timeout=WARMUP_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        log_event(logger, logging.WARNING, "startup.warmup_timeout", timeout_s=WARMUP_TIMEOUT)
+        return
+
+    warmed = {}
+    for step, result in zip(steps, results):
+        if isinstance(result, Exception):
+            log_event(logger, logging.WARNING, "startup.warmup_failed", step=step, error=repr(result))
+        elif isinstance(result, dict):
+            warmed.update(result)
+        else:
+            warmed[step] = result
+    log_event(logger, logging.INFO, "startup.warmup", **warmed, duration_ms=duration_ms(start))
+
+
+def pdf_worker_http_error(error: Exception) -> HTTPException:
+    """
+    Map PDF worker backpressure and timeout errors to HTTP responses
+    """
+    if isinstance(error, PDFWorkerBusyError):
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy processing other PDFs. Please try again shortly.",
+            headers={"Retry-After": str(error.retry_after)}
+        )
+    return HTTPException(status_code=504, detail=str(error))
 
-# Ensure upload directory exists
-os.makedirs(os.getenv("UPLOAD_DIR", "uploads"), exist_ok=True)
 
 @app.get("/")
 async def root():
@@ -69,8 +219,9 @@ async def root():
 
 @app.post("/upload", response_model=FormSessionResponse)
 async def upload_pdf(
+    request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Upload a PDF form and extract its fields
@@ -80,77 +231,118 @@ async def upload_pdf(
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
     max_size = int(os.getenv("MAX_FILE_SIZE", 10485760))  # 10MB default
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail="File size exceeds limit")
     if file.size and file.size > max_size:
-        raise HTTPException(status_code=400, detail="File size exceeds limit")
+        raise HTTPException(status_code=413, detail="File size exceeds limit")
+    if session_reaper.over_quota():
+        raise HTTPException(status_code=507, detail="Storage quota exceeded. Please try again later.")
     
+    staged = None
+    start = time.perf_counter()
     try:
         # Generate unique session ID
         session_id = str(uuid.uuid4())
         
-        # Save uploaded file
-        upload_dir = os.getenv("UPLOAD_DIR", "uploads")
-        file_path = os.path.join(upload_dir, f"{session_id}.pdf")
+        # Stream the upload to disk in chunks, hashing it on the way
+        staged = await stage_upload(file, max_size, storage.scratch_dir)
+        content_hash = staged.content_hash
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Reuse the stored file and field schema when this form was seen before
+        upload_size = staged.size
+        template = await template_registry.get(db, content_hash)
+        template_reused = template is not None
+        if template is None:
+            # Extract form fields from the staged copy, then store it under its content hash
+            field_schema = await pdf_worker.extract_field_schema(staged.path)
+            file_path = await template_registry.store_file(content_hash, staged.path)
+            staged = None
+            template = await template_registry.register(db, content_hash, file_path, field_schema, upload_size)
         
-        logger.info(f"PDF uploaded: {file_path}")
-
-        # Extract form fields
-        fields = pdf_service.extract_form_fields(file_path)
-        logger.info(f"Extracted fields: {fields}")
+        fields = template.fields
+        log_event(logger, logging.DEBUG, "upload.fields", session_id=session_id, field_names=lambda: list(fields))
 
         if len(fields) == 0:
             raise HTTPException(status_code=400, detail="No form fields found in PDF")
         
-
-        logger.info(f"Creating form session with ID: {session_id}")
+        # Generate every question up front; repeat templates are served from the question cache
+        questions = await ai_service.generate_questions(fields)
+        # Neighbouring related fields, like an address block, are asked for with one question
+        groups = template.field_groups
+        
         # Create form session in database
         form_session = FormSession(
             session_id=session_id,
+            template_id=template.id,
             filename=file.filename,
-            file_path=file_path,
+            file_path=template.file_path,
             total_fields=len(fields),
             filled_fields=0,
             status="active"
         )
         db.add(form_session)
-        db.flush()
-        logger.info(f"Form session created: {form_session}")
+        await db.flush()
         
-        logger.info("Saving form fields to database")
         # Save form fields to database
-        for field_name, field_type in fields.items():
+        for ordinal, (field_name, field_type) in enumerate(fields.items()):
             form_field = FormField(
                 session_id=session_id,
                 field_name=field_name,
                 field_type=field_type,
+                ordinal=ordinal,
+                question=questions.get(field_name),
+                group_key=groups.get(field_name),
                 is_filled=False
             )
             db.add(form_field)
         
-        db.commit()
-        logger.info("Form fields saved successfully")
+        await db.commit()
+        log_event(
+            logger, logging.INFO, "upload.completed",
+            session_id=session_id,
+            template_id=template.id,
+            template_reused=template_reused,
+            size_bytes=upload_size,
+            fields=len(fields),
+            questions=len(questions),
+            grouped_fields=len(groups),
+            duration_ms=duration_ms(start),
+        )
         
         return FormSessionResponse(
             session_id=session_id,
             filename=file.filename,
             total_fields=len(fields),
-            status="active"
+            status="active",
+            template_id=template.id
         )
         
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPDFError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (PDFWorkerBusyError, PDFWorkerTimeoutError) as e:
+        raise pdf_worker_http_error(e)
     except Exception as e:
-        logger.error(f"Error uploading PDF: {str(e)}")
+        log_event(logger, logging.ERROR, "upload.failed", error=str(e), duration_ms=duration_ms(start))
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    finally:
+        # A repeat upload never needs its staged copy
+        if staged is not None:
+            discard_upload(staged.path)
 
 
 @app.get("/session/{session_id}/fields", response_model=List[FormFieldResponse])
-async def get_session_fields(session_id: str, db: Session = Depends(get_db)):
+async def get_session_fields(session_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get all fields for a form session
     """
-    fields = db.query(FormField).filter(FormField.session_id == session_id).all()
+    fields = (await db.scalars(
+        select(FormField).where(FormField.session_id == session_id).order_by(FormField.ordinal)
+    )).all()
     if not fields:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -164,154 +356,620 @@ async def get_session_fields(session_id: str, db: Session = Depends(get_db)):
     ]
 
 
+async def get_next_unfilled_field(session_id: str, db: AsyncSession) -> Optional[FormField]:
+    """
+    Fetch the first unfilled field in form order with a LIMIT 1 index scan
+    Returns: The field, or None when every field is filled
+    """
+    next_field = await db.scalar(
+        select(FormField)
+        .where(FormField.session_id == session_id, FormField.is_filled == False)
+        .order_by(FormField.ordinal)
+        .limit(1)
+    )
+    if next_field is None:
+        # Only distinguish a finished form from a missing session on the rare empty result
+        session_exists = await db.scalar(select(FormSession.id).where(FormSession.session_id == session_id))
+        if not session_exists:
+            raise HTTPException(status_code=404, detail="Session not found")
+    return next_field
+
+
+async def get_unfilled_group(session_id: str, next_field: FormField, db: AsyncSession) -> List[FormField]:
+    """
+    Fetch the unfilled fields asked for together with the next field, in form order
+    Returns: The fields of its group, or just the field when it is asked on its own
+    """
+    if not next_field.group_key:
+        return [next_field]
+    return list((await db.scalars(
+        select(FormField)
+        .where(
+            FormField.session_id == session_id,
+            FormField.group_key == next_field.group_key,
+            FormField.is_filled == False
+        )
+        .order_by(FormField.ordinal)
+    )).all())
+
+
 @app.get("/session/{session_id}/question", response_model=QuestionResponse)
-async def get_next_question(session_id: str, db: Session = Depends(get_db)):
+async def get_next_question(session_id: str, db: AsyncSession = Depends(get_db)):
     """
-    Get the next question for the user to answer
+    Get the next question for the user to answer; related fields are asked for together
     """
-    # Check if session exists
-    session = db.query(FormSession).filter(FormSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Get unfilled fields
-    unfilled_fields = db.query(FormField).filter(
-        FormField.session_id == session_id,
-        FormField.is_filled == False
-    ).all()
+    next_field = await get_next_unfilled_field(session_id, db)
     
-    if not unfilled_fields:
+    if not next_field:
         return QuestionResponse(
-            question="All fields have been filled! You can now download your completed form.",
+            question=ALL_FIELDS_FILLED_MESSAGE,
             field_name=None,
             field_type=None,
             is_complete=True
         )
     
-    # Get the next field to fill
-    next_field = unfilled_fields[0]
-    
-    # Generate AI question
-    question = await ai_service.generate_question(next_field.field_name, next_field.field_type)
+    group = await get_unfilled_group(session_id, next_field, db)
+    if len(group) > 1:
+        question = question_for_group(tuple(field.field_name for field in group))
+    else:
+        # Questions are generated at upload time; only fields the batch missed go to the model here
+        question = next_field.question
+        if not question:
+            question = await ai_service.generate_question(next_field.field_name, next_field.field_type)
     
     return QuestionResponse(
         question=question,
         field_name=next_field.field_name,
         field_type=next_field.field_type,
-        is_complete=False
+        is_complete=False,
+        field_names=[field.field_name for field in group],
+        field_types=[field.field_type for field in group]
     )
 
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/session/{session_id}/question/stream")
+async def stream_next_question(session_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Stream the next question as Server-Sent Events: field, token..., done
+    """
+    next_field = await get_next_unfilled_field(session_id, db)
+    
+    # Read everything needed before streaming starts; the DB session is not used afterwards
+    field_name = next_field.field_name if next_field else None
+    field_type = next_field.field_type if next_field else None
+    stored_question = next_field.question if next_field else ALL_FIELDS_FILLED_MESSAGE
+    group = await get_unfilled_group(session_id, next_field, db) if next_field else []
+    if len(group) > 1:
+        stored_question = question_for_group(tuple(field.field_name for field in group))
+    field_names = [field.field_name for field in group] if group else None
+    field_types = [field.field_type for field in group] if group else None
+    
+    async def events():
+        yield sse_event("field", {
+            "field_name": field_name,
+            "field_type": field_type,
+            "field_names": field_names,
+            "field_types": field_types,
+            "is_complete": next_field is None
+        })
+        
+        if stored_question:
+            yield sse_event("token", {"text": stored_question})
+            yield sse_event("done", {"question": stored_question})
+            return
+        
+        fragments = []
+        async for text in ai_service.stream_question(field_name, field_type):
+            fragments.append(text)
+            yield sse_event("token", {"text": text})
+        yield sse_event("done", {"question": "".join(fragments).strip()})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def apply_answers(
+    session_id: str,
+    answers: List[AnswerRequest],
+    db: AsyncSession
+) -> Tuple[Dict[str, str], int, int]:
+    """
+    Normalize answers concurrently and write them with one bulk UPDATE
+    Answers to multi-field questions are split into a value per field first
+    Returns: Dict mapping field names to processed values, filled field count and total field count
+    """
+    raw_answers = {}
+    group_answers = []
+    requested = set()
+    for answer in answers:
+        field_names = answer.field_names or ([answer.field_name] if answer.field_name else [])
+        if not field_names:
+            raise HTTPException(status_code=400, detail="Each answer needs a field_name or field_names")
+        requested.update(field_names)
+        if len(field_names) == 1:
+            raw_answers[field_names[0]] = answer.answer
+        else:
+            group_answers.append((field_names, answer.answer))
+    
+    # Find the fields
+    rows = (await db.execute(select(FormField.id, FormField.field_name, FormField.field_type).where(
+        FormField.session_id == session_id,
+        FormField.field_name.in_(requested)
+    ))).all()
+    
+    missing = requested - {field.field_name for field in rows}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Field not found: {', '.join(sorted(missing))}")
+    
+    field_types = {field.field_name: field.field_type for field in rows}
+    unmatched = set()
+    for field_names, answer in group_answers:
+        values = await ai_service.split_group_answer(answer, {name: field_types[name] for name in field_names})
+        unmatched.update(name for name in field_names if name not in values)
+        raw_answers.update(values)
+    unmatched -= set(raw_answers)
+    if unmatched:
+        # Fields the answer did not cover are asked for one at a time from now on
+        await db.execute(
+            update(FormField)
+            .where(FormField.session_id == session_id, FormField.field_name.in_(unmatched))
+            .values(group_key=None)
+            .execution_options(synchronize_session=False)
+        )
+    
+    # Process answers with AI if needed
+    fields = [field for field in rows if field.field_name in raw_answers]
+    processed_values = await ai_service.process_answers([
+        (raw_answers[field.field_name], field.field_type, field.field_name) for field in fields
+    ])
+    
+    # Update fields
+    if fields:
+        await db.execute(update(FormField), [
+            {"id": field.id, "value": value, "is_filled": True}
+            for field, value in zip(fields, processed_values)
+        ])
+    
+    # Recompute session progress from the fields so re-answers are not double counted
+    filled_count = select(func.count(FormField.id)).where(
+        FormField.session_id == session_id,
+        FormField.is_filled == True
+    ).scalar_subquery()
+    progress = (await db.execute(
+        update(FormSession)
+        .where(FormSession.session_id == session_id, FormSession.status != "expired")
+        .values(
+            filled_fields=filled_count,
+            status=case((filled_count >= FormSession.total_fields, "completed"), else_=FormSession.status)
+        )
+        .returning(FormSession.filled_fields, FormSession.total_fields)
+        .execution_options(synchronize_session=False)
+    )).one_or_none()
+    if progress is None:
+        await db.rollback()
+        raise HTTPException(status_code=410, detail=SESSION_EXPIRED_MESSAGE)
+    
+    await db.commit()
+    
+    processed = {field.field_name: value for field, value in zip(fields, processed_values)}
+    return processed, progress.filled_fields, progress.total_fields
+
+
 @app.post("/session/{session_id}/answer")
 async def submit_answer(
     session_id: str,
     answer_data: AnswerRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Submit an answer for a specific field
+    Submit an answer for a specific field, or for every field of a multi-field question
     """
-    # Find the field
-    field = db.query(FormField).filter(
-        FormField.session_id == session_id,
-        FormField.field_name == answer_data.field_name
-    ).first()
+    processed_values, _, _ = await apply_answers(session_id, [answer_data], db)
     
-    if not field:
-        raise HTTPException(status_code=404, detail="Field not found")
-    
-    # Process answer with AI if needed
-    processed_value = ai_service.process_answer(
-        answer_data.answer, 
-        field.field_type,
-        field.field_name
-    )
+    return {
+        "message": "Answer submitted successfully",
+        "processed_value": processed_values.get(answer_data.field_name) if answer_data.field_name else None,
+        "processed_values": processed_values
+    }
+
+
+@app.post("/session/{session_id}/answers", response_model=BulkAnswerResponse)
+async def submit_answers(
+    session_id: str,
+    answer_data: BulkAnswerRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Submit answers for many fields in one request
+    """
+    if not answer_data.answers:
+        raise HTTPException(status_code=400, detail="No answers provided")
     
-    # Update field
-    field.value = processed_value
-    field.is_filled = True
+    processed_values, filled_fields, total_fields = await apply_answers(session_id, answer_data.answers, db)
     
-    # Update session progress
-    session = db.query(FormSession).filter(FormSession.session_id == session_id).first()
-    session.filled_fields += 1
+    return BulkAnswerResponse(
+        message="Answers submitted successfully",
+        processed_values=processed_values,
+        filled_fields=filled_fields,
+        total_fields=total_fields
+    )
+
+
+async def get_field_values(session_id: str, db: AsyncSession) -> Dict[str, str]:
+    field_rows = (await db.execute(select(FormField.field_name, FormField.value).where(
+        FormField.session_id == session_id,
+        FormField.value.is_not(None)
+    ))).all()
+    return {row.field_name: row.value for row in field_rows if row.value}
+
+
+async def output_fingerprint(session: FormSession, field_values: Dict[str, str], db: AsyncSession) -> Tuple[str, Optional[TemplateInfo]]:
+    """
+    Fingerprint the output of a session from its template hash and field values
+    Returns: The fingerprint and the session's template, if it has one
+    """
+    template = await template_registry.get_by_id(db, session.template_id) if session.template_id else None
+    template_key = template.content_hash if template else session.file_path
+    if not FLATTEN_OUTPUT:
+        # Interactive and flattened fills of the same values are different files
+        template_key = f"{template_key}:interactive"
+    return output_cache.fingerprint(template_key, field_values), template
+
+
+async def run_completion_job(db: AsyncSession, job: CompletionJob) -> str:
+    """
+    Generate the filled PDF for a queued completion job, reusing an identical earlier output
+    Returns: Storage key of the filled PDF
+    """
+    session = await db.scalar(select(FormSession).where(FormSession.session_id == job.session_id))
+    if not session:
+        raise Exception("Session not found")
     
-    if session.filled_fields >= session.total_fields:
-        session.status = "completed"
+    # Record the values this output is built from; answers may have changed since the job was queued
+    field_values = await get_field_values(job.session_id, db)
+    fingerprint, template = await output_fingerprint(session, field_values, db)
+    job.input_hash = fingerprint
     
-    db.commit()
+    output_path = output_cache.key_for(fingerprint)
+    if await storage.exists(output_path):
+        CACHE_LOOKUPS.labels("output", "hit").inc()
+        log_event(logger, logging.INFO, "completion.output_reused", session_id=job.session_id, fingerprint=fingerprint[:12])
+    else:
+        CACHE_LOOKUPS.labels("output", "miss").inc()
+        # The PDF workers read and write local files; the result is then stored under its fingerprint
+        input_path = await storage.local_path(session.file_path)
+        base_path = None
+        if not FLATTEN_OUTPUT and session.output_path and await storage.exists(session.output_path):
+            base_path = await storage.local_path(session.output_path)
+        local_output = storage.scratch_path(".pdf")
+        try:
+            # Fill the PDF using the cached widget geometry of its template;
+            # an interactive previous output is updated incrementally instead
+            await pdf_worker.fill_pdf_form(
+                input_path,
+                field_values,
+                job.session_id,
+                template.field_schema if template else None,
+                local_output,
+                base_path
+            )
+            await output_cache.store(output_path, local_output)
+        finally:
+            discard_upload(local_output)
     
-    return {"message": "Answer submitted successfully", "processed_value": processed_value}
+    # Update session
+    session.output_path = output_path
+    session.output_fingerprint = fingerprint
+    session.status = "completed"
+    return output_path
+
+
+completion_queue = CompletionQueue(SessionLocal, run_completion_job, storage=storage)
 
 
-@app.get("/session/{session_id}/complete", response_model=FormCompletionResponse)
-async def complete_form(session_id: str, db: Session = Depends(get_db)):
+def completion_job_response(job: CompletionJob) -> CompletionJobResponse:
+    return CompletionJobResponse(
+        job_id=job.job_id,
+        session_id=job.session_id,
+        status=job.status,
+        status_url=f"/jobs/{job.job_id}",
+        download_url=f"/download/{job.session_id}" if job.status == "succeeded" else None,
+        error=job.error
+    )
+
+
+@app.get("/session/{session_id}/complete", response_model=CompletionJobResponse, status_code=202)
+async def complete_form(session_id: str, response: Response, db: AsyncSession = Depends(get_db)):
     """
-    Complete the form filling and generate the filled PDF
+    Queue generation of the filled PDF; repeated and concurrent requests share one job
+    Returns 202 with the job to poll, or 200 when the PDF for the current answers already exists
     """
     # Get session
-    session = db.query(FormSession).filter(FormSession.session_id == session_id).first()
+    session = await db.scalar(select(FormSession).where(FormSession.session_id == session_id))
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Get all filled fields
-    fields = db.query(FormField).filter(FormField.session_id == session_id).all()
+    if session.status == "expired":
+        raise HTTPException(status_code=410, detail=SESSION_EXPIRED_MESSAGE)
     
     # Check if all fields are filled
-    unfilled_count = sum(1 for field in fields if not field.is_filled)
+    unfilled_count = await db.scalar(select(func.count(FormField.id)).where(
+        FormField.session_id == session_id,
+        FormField.is_filled == False
+    ))
     if unfilled_count > 0:
         raise HTTPException(
             status_code=400, 
             detail=f"Form incomplete. {unfilled_count} fields remaining."
         )
     
-    try:
-        # Create field mapping
-        field_values = {field.field_name: field.value for field in fields if field.value}
-        
-        # Fill the PDF
-        output_path = pdf_service.fill_pdf_form(session.file_path, field_values, session_id)
-        
-        # Update session
-        session.output_path = output_path
-        session.status = "completed"
-        db.commit()
-        
-        return FormCompletionResponse(
-            session_id=session_id,
-            download_url=f"/download/{session_id}",
-            filled_fields=len(field_values),
-            total_fields=session.total_fields
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error completing form: {str(e)}")
+    field_values = await get_field_values(session_id, db)
+    fingerprint, _ = await output_fingerprint(session, field_values, db)
+    job = await completion_queue.enqueue(db, session_id, fingerprint)
+    
+    if job.status == "succeeded":
+        response.status_code = 200
+    else:
+        response.headers["Location"] = f"/jobs/{job.job_id}"
+    return completion_job_response(job)
+
 
+@app.get("/jobs/{job_id}", response_model=CompletionJobResponse)
+async def get_completion_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Poll the status of a completion job
+    """
+    job = await completion_queue.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return completion_job_response(job)
 
-@app.get("/download/{session_id}")
-async def download_completed_form(session_id: str, db: Session = Depends(get_db)):
+
+@app.api_route("/download/{session_id}", methods=["GET", "HEAD"])
+async def download_completed_form(session_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """
-    Download the completed PDF form
+    Download the completed PDF form, honouring If-None-Match and Range requests
     """
-    session = db.query(FormSession).filter(FormSession.session_id == session_id).first()
+    session = (await db.execute(
+        select(FormSession.filename, FormSession.status, FormSession.output_path, FormSession.output_fingerprint)
+        .where(FormSession.session_id == session_id)
+    )).first()
+    # The file is streamed without the database, so hand the connection back now
+    await db.close()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    if session.status == "expired":
+        raise HTTPException(status_code=410, detail=SESSION_EXPIRED_MESSAGE)
     
-    if not session.output_path or not os.path.exists(session.output_path):
+    stored = await storage.stat(session.output_path) if session.output_path else None
+    if stored is None:
         raise HTTPException(status_code=404, detail="Completed form not found")
     
-    return FileResponse(
-        session.output_path,
-        media_type="application/pdf",
-        filename=f"completed_{session.filename}"
+    if session.output_fingerprint:
+        etag = f'"{session.output_fingerprint}"'
+    else:
+        # Outputs from before fingerprinting are identified by their size and modification time
+        etag = f'"{stored.size:x}-{int(stored.modified * 1e9):x}"'
+    
+    return await output_cache.serve(
+        request, session.output_path, etag, f"completed_{session.filename}", size=stored.size
+    )
+
+
+async def write_batch_rows(rows: List[BatchRow], key: str):
+    """
+    Store parsed rows for a queued batch as JSON lines
+    """
+    local_path = storage.scratch_path(".jsonl")
+    try:
+        async with aiofiles.open(local_path, "w") as rows_file:
+            for row in rows:
+                await rows_file.write(json.dumps({"index": row.index, "name": row.name, "values": row.values}) + "\n")
+        await storage.put_file(key, local_path)
+    finally:
+        discard_upload(local_path)
+
+
+async def read_batch_rows(key: str) -> List[BatchRow]:
+    local_path = await storage.local_path(key)
+    async with aiofiles.open(local_path, "r") as rows_file:
+        return [BatchRow(**json.loads(line)) async for line in rows_file if line.strip()]
+
+
+async def run_batch_job(db: AsyncSession, job: BatchJob) -> str:
+    """
+    Fill every row of a queued batch and store the ZIP of filled PDFs
+    Returns: Storage key of the archive
+    """
+    template = await template_registry.get_by_id(db, job.template_id)
+    if template is None:
+        raise Exception("Template not found")
+    template_path = await storage.local_path(template.file_path)
+    rows = await read_batch_rows(job.rows_path)
+
+    # A retried job starts over
+    job.filled_rows = job.failed_rows = 0
+    last_progress = time.monotonic()
+
+    async def track_progress(results):
+        nonlocal last_progress
+        async for row, path, error in results:
+            if path is None:
+                job.failed_rows += 1
+            else:
+                job.filled_rows += 1
+            if time.monotonic() - last_progress >= BATCH_PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                # Doubles as a heartbeat: the queue only requeues running jobs whose started_at is stale
+                job.started_at = datetime.now(timezone.utc)
+                await db.commit()
+            yield row, path, error
+
+    archive_path = storage.scratch_path(".zip")
+    try:
+        async with aiofiles.open(archive_path, "wb") as archive:
+            results = batch_filler.fill(template_path, template.field_schema, rows)
+            async for chunk in stream_zip(track_progress(results)):
+                await archive.write(chunk)
+        output_path = f"batches/{job.job_id}.zip"
+        await storage.put_file(output_path, archive_path)
+    finally:
+        discard_upload(archive_path)
+    return output_path
+
+
+batch_queue = CompletionQueue(
+    SessionLocal,
+    run_batch_job,
+    concurrency=int(os.getenv("BATCH_WORKERS", 1)),
+    # Progress refreshes started_at, but a chunk can wait a long time for a busy PDF pool
+    stale_after=float(os.getenv("BATCH_JOB_STALE_AFTER", 1800)),
+    storage=storage,
+    model=BatchJob,
+    name="batch",
+    job_seconds=BATCH_JOB_SECONDS,
+    log_keys=("template_id", "total_rows"),
+)
+
+
+def batch_job_response(job: BatchJob) -> BatchJobResponse:
+    return BatchJobResponse(
+        job_id=job.job_id,
+        template_id=job.template_id,
+        status=job.status,
+        total_rows=job.total_rows,
+        filled_rows=job.filled_rows or 0,
+        failed_rows=job.failed_rows or 0,
+        status_url=f"/batch-jobs/{job.job_id}",
+        download_url=f"/batch-jobs/{job.job_id}/download" if job.status == "succeeded" else None,
+        error=job.error
+    )
+
+
+@app.post("/templates/{template_id}/batch-fill", response_model=BatchJobResponse, status_code=202)
+async def batch_fill(
+    template_id: int,
+    response: Response,
+    file: UploadFile = File(...),
+    mapping: Optional[str] = Form(None),
+    mode: str = Query("zip", pattern="^(zip|job)$"),
+    rows_format: Optional[str] = Query(None, alias="format"),
+    name_column: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Fill a template once per row of a CSV or JSONL file whose columns are field names
+    mapping is an optional JSON object renaming columns to field names, or to null to ignore them;
+    name_column names the column that gives each filled PDF its file name
+    mode=zip streams a ZIP of the filled PDFs as rows finish, with errors.jsonl listing failed rows;
+    mode=job queues the batch and returns 202 with a job to poll and download when it succeeds
+    """
+    template = await template_registry.get_by_id(db, template_id)
+    if template is None or not await template_registry.touch(db, template):
+        raise HTTPException(status_code=404, detail="Template not found")
+    if not await storage.exists(template.file_path):
+        raise HTTPException(status_code=404, detail="Template file not found")
+
+    try:
+        column_mapping = json.loads(mapping) if mapping else {}
+    except json.JSONDecodeError:
+        column_mapping = None
+    if not isinstance(column_mapping, dict) or not all(
+        isinstance(field, str) or field is None for field in column_mapping.values()
+    ):
+        raise HTTPException(status_code=422, detail="mapping must be a JSON object of column names to field names")
+
+    try:
+        data = await read_batch_upload(file, BATCH_MAX_UPLOAD_BYTES)
+        rows = parse_rows(
+            data,
+            detect_format(file.filename, file.content_type, rows_format),
+            template.fields,
+            column_mapping,
+            name_column,
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidBatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if mode == "job":
+        job_id = str(uuid.uuid4())
+        rows_path = f"batches/{job_id}.jsonl"
+        await write_batch_rows(rows, rows_path)
+        job = await batch_queue.submit(db, BatchJob(
+            job_id=job_id,
+            template_id=template_id,
+            status="queued",
+            rows_path=rows_path,
+            total_rows=len(rows),
+            filled_rows=0,
+            failed_rows=0,
+            attempts=0,
+        ))
+        response.headers["Location"] = f"/batch-jobs/{job_id}"
+        return batch_job_response(job)
+
+    # The archive is streamed without the database, so hand the connection back now
+    await db.close()
+    template_path = await storage.local_path(template.file_path)
+    return StreamingResponse(
+        stream_zip(batch_filler.fill(template_path, template.field_schema, rows)),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="batch_{template_id}.zip"',
+            "X-Batch-Rows": str(len(rows)),
+        },
+    )
+
+
+@app.get("/batch-jobs/{job_id}", response_model=BatchJobResponse)
+async def get_batch_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Poll the status and progress of a queued batch fill
+    """
+    job = await batch_queue.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    return batch_job_response(job)
+
+
+@app.api_route("/batch-jobs/{job_id}/download", methods=["GET", "HEAD"])
+async def download_batch(job_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Download the ZIP of a finished batch fill, honouring If-None-Match and Range requests
+    """
+    job = await batch_queue.get(db, job_id)
+    await db.close()
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Batch job is {job.status}")
+
+    stored = await storage.stat(job.output_path)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Batch output not found")
+
+    return await output_cache.serve(
+        request, job.output_path, f'"{job.job_id}"', f"batch_{job.template_id}.zip",
+        media_type="application/zip", size=stored.size,
     )
 
 
 @app.get("/session/{session_id}/status")
-async def get_session_status(session_id: str, db: Session = Depends(get_db)):
+async def get_session_status(session_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get session status and progress
     """
-    session = db.query(FormSession).filter(FormSession.session_id == session_id).first()
+    session = await db.scalar(select(FormSession).where(FormSession.session_id == session_id))
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -324,6 +982,13 @@ async def get_session_status(session_id: str, db: Session = Depends(get_db)):
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    async with SessionLocal() as db:
+        await completion_queue.record_depth(db)
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,292 @@
+import os
+import time
+import threading
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from sqlalchemy import event
+
+from database import DB_MAX_OVERFLOW, DB_POOL_SIZE, engine
+
+SQL_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK", "PRAGMA"}
+
+# Under gunicorn every worker writes its samples here and a scrape of any worker reports them all;
+# gauges then need a multiprocess_mode saying how the workers' values combine, and must be set explicitly
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Database connection checkouts that gave up waiting for the pool",
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections currently checked out of the pools of all workers",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity",
+    "Maximum number of database connections the pools of all workers will open",
+    multiprocess_mode="livesum",
+)
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation_ratio",
+    "Checked-out connections as a fraction of pool capacity, in the most saturated worker",
+    multiprocess_mode="livemax",
+)
+DB_POOL_CAPACITY.set(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+_pool_lock = threading.Lock()
+_pool_in_use = 0
+
+
+def _count_pool_checkout(delta: int):
+    global _pool_in_use
+    with _pool_lock:
+        _pool_in_use += delta
+        DB_POOL_IN_USE.set(_pool_in_use)
+        DB_POOL_SATURATION.set(_pool_in_use / (DB_POOL_SIZE + DB_MAX_OVERFLOW))
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    _count_pool_checkout(1)
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_pool_checkin(dbapi_connection, connection_record):
+    _count_pool_checkout(-1)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds",
+    "Time from receiving a request to sending the response headers, by route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Database statement execution time, by statement type",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+PDF_STAGE_SECONDS = Histogram(
+    "pdf_stage_seconds",
+    "Time spent in each stage of a PDF operation inside the worker processes",
+    ["operation", "stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+PDF_JOB_SECONDS = Histogram(
+    "pdf_job_seconds",
+    "End-to-end time of a PDF worker job, including time waiting for a process",
+    ["operation"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+PDF_JOBS_REJECTED = Counter(
+    "pdf_jobs_rejected_total",
+    "PDF worker jobs rejected because the queue was full or that timed out",
+    ["reason"],
+)
+PDF_WORKER_PENDING = Gauge(
+    "pdf_worker_pending_jobs",
+    "PDF worker jobs running or waiting for a process",
+    multiprocess_mode="livesum",
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds",
+    "Chat completion latency, by operation and outcome",
+    ["operation", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60),
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until the first streamed question fragment arrives",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the chat completion API, by operation and kind",
+    ["operation", "kind"],
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "Model calls that failed and were answered with a local fallback",
+    ["operation"],
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens",
+    "Prompt tokens per model call, counted locally before sending",
+    ["operation"],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+LLM_UNUSED_ALLOWANCE_TOKENS = Counter(
+    "llm_unused_allowance_tokens_total",
+    "max_tokens reserved against the quota but not generated",
+    ["operation"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Model calls retried by the gateway, by error",
+    ["operation", "reason"],
+)
+LLM_COALESCED = Counter(
+    "llm_coalesced_requests_total",
+    "Model calls served by an identical request already in flight",
+    ["operation"],
+)
+LLM_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "llm_rate_limit_wait_seconds",
+    "Time model calls waited for the tokens-per-minute limiter",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "1 while the model circuit breaker of any worker is open and fallbacks are served",
+    multiprocess_mode="livemax",
+)
+ANSWERS_PROCESSED = Counter(
+    "answers_processed_total",
+    "Answers processed, by whether they were normalized locally, passed through or cleaned by the model",
+    ["path"],
+)
+GROUP_ANSWERS_SPLIT = Counter(
+    "group_answers_split_total",
+    "Answers to multi-field questions, by whether they arrived as JSON, were split locally, "
+    "were split by the model or could not be split",
+    ["path"],
+)
+QUESTIONS_GENERATED = Counter(
+    "questions_generated_total",
+    "Questions served, by whether they came from the local rules, the question cache or the model; "
+    "the rule share is the LLM bypass rate",
+    ["source"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by cache and result; hit ratio is hits over all lookups",
+    ["cache", "result"],
+)
+
+COMPLETION_QUEUE_DEPTH = Gauge(
+    "completion_queue_depth",
+    "Completion jobs by status, refreshed on each scrape",
+    ["status"],
+    multiprocess_mode="livemostrecent",
+)
+COMPLETION_JOB_SECONDS = Histogram(
+    "completion_job_seconds",
+    "Time a completion job spends running, by outcome",
+    ["outcome"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+BATCH_JOB_SECONDS = Histogram(
+    "batch_job_seconds",
+    "Time a queued batch fill spends running, by outcome",
+    ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+BATCH_ROWS = Counter(
+    "batch_rows_total",
+    "Rows of batch fills by outcome",
+    ["outcome"],
+)
+
+STORAGE_BYTES = Gauge(
+    "storage_bytes",
+    "Bytes in storage by area: templates, outputs, batches, tmp or other, refreshed by the session reaper",
+    ["area"],
+    multiprocess_mode="livemostrecent",
+)
+STORAGE_FILES = Gauge(
+    "storage_files",
+    "Files in storage by area, refreshed by the session reaper",
+    ["area"],
+    multiprocess_mode="livemostrecent",
+)
+REAPER_ITEMS = Counter(
+    "reaper_items_total",
+    "Sessions expired, rows and files deleted and cached copies evicted by the session reaper",
+    ["kind"],
+)
+REAPER_RUN_SECONDS = Histogram(
+    "reaper_run_seconds",
+    "Time a session reaper pass takes",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Registry for the /metrics endpoint: with PROMETHEUS_MULTIPROC_DIR set, one collecting the samples of every worker
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if starts:
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(verb if verb in SQL_VERBS else "OTHER").observe(time.perf_counter() - starts.pop())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status: int):
+            # The matched route is only known once routing has run
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
+        async def send_wrapper(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                record(message["status"])
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not recorded:
+                recorded = True
+                record(500)
+            raise
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
@@ -1,17 +1,32 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, Index, UniqueConstraint, text
 from sqlalchemy.sql import func
 
 from database import Base
 
 
+class FormTemplate(Base):
+    __tablename__ = "form_templates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)  # SHA-256 of the upload bytes
+    file_path = Column(String, nullable=False)  # storage key, e.g. templates/<sha256>.pdf
+    file_size = Column(Integer, nullable=False)
+    field_schema = Column(JSON, nullable=False)  # widget names, types, rects, choice values, page index
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Refreshed at most every TEMPLATE_TOUCH_INTERVAL while uploads and batches use it; the reaper deletes stale ones
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
 class FormSession(Base):
     __tablename__ = "form_sessions"
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, unique=True, index=True, nullable=False)
+    template_id = Column(Integer, index=True, nullable=True)
     filename = Column(String, nullable=False)
-    file_path = Column(String, nullable=False)
-    output_path = Column(String, nullable=True)
+    file_path = Column(String, nullable=False)  # storage key of the template
+    output_path = Column(String, nullable=True)  # storage key of the latest filled PDF
+    output_fingerprint = Column(String(64), nullable=True)  # SHA-256 of template hash + field values, served as the ETag
     total_fields = Column(Integer, default=0)
     filled_fields = Column(Integer, default=0)
     status = Column(String, default="active")  # active, completed, expired
@@ -21,12 +36,79 @@ class FormSession(Base):
 
 class FormField(Base):
     __tablename__ = "form_fields"
+    __table_args__ = (
+        UniqueConstraint("session_id", "field_name", name="uq_form_fields_session_field"),
+        Index("ix_form_fields_session_filled_ordinal", "session_id", "is_filled", "ordinal"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, index=True, nullable=False)
+    session_id = Column(String, nullable=False)
     field_name = Column(String, nullable=False)
     field_type = Column(String, nullable=False)
+    ordinal = Column(Integer, nullable=False, default=0)  # position of the field in the form
+    question = Column(Text, nullable=True)  # pre-generated at upload time
+    group_key = Column(String, nullable=True)  # name of the first field of its multi-field question, if any
     value = Column(Text, nullable=True)
     is_filled = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class QuestionCacheEntry(Base):
+    __tablename__ = "question_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)  # SHA-256 of field identity + prompt version
+    field_name = Column(String, nullable=False)
+    field_type = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    question = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CompletionJob(Base):
+    __tablename__ = "completion_jobs"
+    __table_args__ = (
+        # At most one queued or running job per session; concurrent requests share it
+        Index(
+            "uq_completion_jobs_active_session", "session_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+        Index("ix_completion_jobs_status_id", "status", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(36), unique=True, index=True, nullable=False)
+    session_id = Column(String, index=True, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    input_hash = Column(String(64), nullable=True)  # output fingerprint of the template and field values
+    output_path = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+    __table_args__ = (
+        Index("ix_batch_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(36), unique=True, index=True, nullable=False)
+    template_id = Column(Integer, index=True, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    rows_path = Column(String, nullable=False)  # storage key of the parsed rows, batches/<job_id>.jsonl
+    output_path = Column(String, nullable=True)  # storage key of the ZIP of filled PDFs
+    total_rows = Column(Integer, nullable=False)
+    filled_rows = Column(Integer, nullable=False, default=0)
+    failed_rows = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
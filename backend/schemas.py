@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 from pydantic import BaseModel
 
@@ -7,6 +7,7 @@ class FormSessionResponse(BaseModel):
     filename: str
     total_fields: int
     status: str
+    template_id: Optional[int] = None
 
 
 class FormFieldResponse(BaseModel):
@@ -21,15 +22,45 @@ class QuestionResponse(BaseModel):
     field_name: Optional[str]
     field_type: Optional[str]
     is_complete: bool
+    # Every field the question asks for; more than one when related fields are asked together
+    field_names: Optional[List[str]] = None
+    field_types: Optional[List[str]] = None
 
 
 class AnswerRequest(BaseModel):
-    field_name: str
+    # field_names answers a multi-field question; the answer is split into a value per field
+    field_name: Optional[str] = None
+    field_names: Optional[List[str]] = None
     answer: str
 
 
-class FormCompletionResponse(BaseModel):
-    session_id: str
-    download_url: str
+class BulkAnswerRequest(BaseModel):
+    answers: List[AnswerRequest]
+
+
+class BulkAnswerResponse(BaseModel):
+    message: str
+    processed_values: Dict[str, str]
     filled_fields: int
-    total_fields: int
\ No newline at end of file
+    total_fields: int
+
+
+class CompletionJobResponse(BaseModel):
+    job_id: str
+    session_id: str
+    status: str  # queued, running, succeeded, failed
+    status_url: str
+    download_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    template_id: int
+    status: str  # queued, running, succeeded, failed
+    total_rows: int
+    filled_rows: int
+    failed_rows: int
+    status_url: str
+    download_url: Optional[str] = None
+    error: Optional[str] = None
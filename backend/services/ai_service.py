@@ -1,151 +1,479 @@
 import os
+import json
+import time
+import asyncio
 import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 from openai.lib.azure import AsyncAzureOpenAI
 
+from logging_config import duration_ms, log_event
+from metrics import (
+    ANSWERS_PROCESSED,
+    GROUP_ANSWERS_SPLIT,
+    LLM_FALLBACKS,
+    LLM_PROMPT_TOKENS,
+    LLM_REQUEST_SECONDS,
+    LLM_TIME_TO_FIRST_TOKEN_SECONDS,
+    LLM_TOKENS,
+    LLM_UNUSED_ALLOWANCE_TOKENS,
+    QUESTIONS_GENERATED,
+)
+from services.answer_normalizer import normalize_answer, normalize_yes_no
+from services.llm_gateway import LLMGateway
+from services.llm_profiles import LLMProfile, count_tokens, load_profiles
+from services.question_cache import QuestionCache
+from services.question_rules import question_for_field
+
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AIService:
 
-    def __init__(self):
-        self.client = AsyncAzureOpenAI(
+    # Bump when the question prompt changes so cached questions are regenerated
+    PROMPT_VERSION = "v2"
+
+    def __init__(self, question_cache: Optional[QuestionCache] = None):
+        self.question_cache = question_cache
+        self.answer_timeout = float(os.getenv("ANSWER_LLM_TIMEOUT", 10))
+        self.profiles = load_profiles()
+        self.client = self._create_client(os.getenv("AZURE_OPENAI_DEPLOYMENT"))
+        self.gateway = LLMGateway(self.client)
+        # Deployments have their own quotas, so each gets its own gateway
+        self._gateways: Dict[str, LLMGateway] = {}
+
+    @staticmethod
+    def _create_client(deployment: Optional[str]) -> AsyncAzureOpenAI:
+        return AsyncAzureOpenAI(
             api_version=os.getenv("API_VERSION"),
             api_key=os.getenv("OPENAI_API_KEY"),
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT")
+            azure_deployment=deployment,
+            # Retries, backoff and rate limiting are handled by the gateway
+            max_retries=0
         )
 
+    def _gateway_for(self, profile: LLMProfile) -> LLMGateway:
+        if not profile.deployment or profile.deployment == os.getenv("AZURE_OPENAI_DEPLOYMENT"):
+            return self.gateway
+        if profile.deployment not in self._gateways:
+            self._gateways[profile.deployment] = LLMGateway(self._create_client(profile.deployment))
+        return self._gateways[profile.deployment]
+
+    def _request(self, operation: str, prompt: str, items: int = 1, **kwargs) -> Dict[str, Any]:
+        """
+        Build a chat request from the operation's profile: its system prompt, model and token allowance
+        """
+        profile = self.profiles[operation]
+        return {
+            "model": profile.model,
+            "messages": [
+                {"role": "system", "content": profile.system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            "max_tokens": profile.max_tokens_for(items),
+            "temperature": profile.temperature,
+            **kwargs,
+        }
+
+    async def _create_completion(self, operation: str, request: Dict[str, Any], timeout: Optional[float] = None):
+        """
+        Call the chat completions API, recording latency, outcome and token usage
+        """
+        profile = self.profiles[operation]
+        prompt_tokens = count_tokens(request["messages"], profile.model)
+        LLM_PROMPT_TOKENS.labels(operation).observe(prompt_tokens)
+
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._gateway_for(profile).create(
+                operation, timeout=timeout, token_cost=prompt_tokens + request["max_tokens"], **request
+            )
+            outcome = "success"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.labels(operation, outcome).observe(time.perf_counter() - start)
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            LLM_TOKENS.labels(operation, "prompt").inc(usage.prompt_tokens or 0)
+            LLM_TOKENS.labels(operation, "completion").inc(usage.completion_tokens or 0)
+            # Allowance reserved against the quota but never generated
+            LLM_UNUSED_ALLOWANCE_TOKENS.labels(operation).inc(
+                max(request["max_tokens"] - (usage.completion_tokens or 0), 0)
+            )
+        return response
+
+    @staticmethod
+    def _question_prompt(field_name: str, field_type: str) -> str:
+        return f"Field: {field_name}\nType: {field_type}"
+
+    @staticmethod
+    def _fallback_question(field_name: str) -> str:
+        return f"Please provide a value for {field_name.replace('_', ' ').title()}:"
+
     async def generate_question(self, field_name: str, field_type: str) -> str:
         """
         Generate a user-friendly question for a form field
+        Well-known fields are answered by the local rules; only the rest go to the model
         """
-        try:
-            prompt = f"""
-            You are helping a user fill out a PDF form. Generate a clear, friendly question to ask the user for the following form field:
-
-            Field Name: {field_name}
-            Field Type: {field_type}
-
-            Make the question:
-            1. Easy to understand and conversational
-            2. Specific about what information is needed
-            3. Include any relevant context or examples if helpful
-            4. Keep it concise but informative
-
-            Just return the question text, nothing else.
-            """
-
-            request_body = {
-                "temperature": 0.7,     # Adjust temperature for creativity
-                "top_p": 1,             # Use top-p 1 as default - Do not change
-                "stream": False,
-                "stop": None,
-                "max_tokens": 4096,     # Limit to 4096 tokens - Default for gpt-4o
-                "presence_penalty": 0,  # Default presence penalty
-                "frequency_penalty": 0, # Default frequency penalty
-                "logit_bias": {},
-                "user": "STEDSOU",      # User ID for tracking
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "data_sources": [
-                    "string"
-                ],
-                "n": 1,
-                "seed": 0,
-                "response_format": {
-                    "type": "text"
-                },
-                "tools": [
-                    "string"
-                ],
-                "tool_choice": "string",
-                "functions": [
-                    "string"
-                ],
-                "function_call": "none"
-            }
+        question = question_for_field(field_name, field_type)
+        if question:
+            QUESTIONS_GENERATED.labels("rule").inc()
+            return question
+
+        if self.question_cache:
+            cached = await self.question_cache.get(field_name, field_type, self.PROMPT_VERSION)
+            if cached:
+                QUESTIONS_GENERATED.labels("cache").inc()
+                return cached
 
-            logger.info(f"Sending request to AI service for field: {field_name}")
-
-            response = await self.client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="gpt-4o",
-                frequency_penalty=request_body["frequency_penalty"],
-                logit_bias=request_body["logit_bias"],
-                max_tokens=request_body["max_tokens"],
-                n=request_body["n"],
-                presence_penalty=request_body["presence_penalty"],
-                response_format=request_body["response_format"],
-                seed=request_body["seed"],
-                stop=request_body["stop"],
-                stream=request_body["stream"],
-                temperature=request_body["temperature"],
-                top_p=request_body["top_p"],
-                user=request_body["user"],
+        try:
+            response = await self._create_completion(
+                "question",
+                self._request("question", self._question_prompt(field_name, field_type), user="STEDSOU"),
             )
 
-            logger.info(f"Received response from AI service for field: {field_name}")
             content =  response.choices[0].message.content
             if not content:
                 raise ValueError("AI response was empty")
-            logger.info(f"Generated question for field {field_name}: {content}")
+            log_event(logger, logging.DEBUG, "llm.question", field=field_name, question=content)
 
-            return content.strip()
+            question = content.strip()
+            QUESTIONS_GENERATED.labels("llm").inc()
+            if self.question_cache:
+                await self.question_cache.set(field_name, field_type, self.PROMPT_VERSION, question)
+            return question
 
         except Exception as e:
-            logger.error(f"Error generating question for field {field_name}: {e}")
+            log_event(logger, logging.ERROR, "llm.question_failed", field=field_name, error=repr(e))
             # Fallback to basic question if AI fails
-            return f"Please provide a value for {field_name.replace('_', ' ').title()}:"
+            LLM_FALLBACKS.labels("question").inc()
+            return self._fallback_question(field_name)
+
+    async def stream_question(self, field_name: str, field_type: str) -> AsyncIterator[str]:
+        """
+        Stream a question for a form field token by token
+        Yields: Text fragments; a rule-based or cached question is yielded whole
+        """
+        question = question_for_field(field_name, field_type)
+        if question:
+            QUESTIONS_GENERATED.labels("rule").inc()
+            yield question
+            return
+
+        if self.question_cache:
+            cached = await self.question_cache.get(field_name, field_type, self.PROMPT_VERSION)
+            if cached:
+                QUESTIONS_GENERATED.labels("cache").inc()
+                yield cached
+                return
+
+        fragments = []
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            request = self._request("question", self._question_prompt(field_name, field_type), stream=True)
+            LLM_PROMPT_TOKENS.labels("question_stream").observe(count_tokens(request["messages"], request["model"]))
+            stream = await self._gateway_for(self.profiles["question"]).stream("question_stream", **request)
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    # Drop leading whitespace so the question starts cleanly
+                    if not fragments:
+                        text = text.lstrip()
+                        if not text:
+                            continue
+                        LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start)
+                    fragments.append(text)
+                    yield text
+
+            outcome = "success"
+
+        except Exception as e:
+            log_event(logger, logging.ERROR, "llm.question_stream_failed", field=field_name, error=repr(e))
+            if not fragments:
+                # Fallback to basic question if AI fails before any output
+                LLM_FALLBACKS.labels("question_stream").inc()
+                yield self._fallback_question(field_name)
+            return
+        finally:
+            LLM_REQUEST_SECONDS.labels("question_stream", outcome).observe(time.perf_counter() - start)
+
+        question = "".join(fragments).strip()
+        if not question:
+            LLM_FALLBACKS.labels("question_stream").inc()
+            yield self._fallback_question(field_name)
+            return
+        QUESTIONS_GENERATED.labels("llm").inc()
+        if self.question_cache:
+            await self.question_cache.set(field_name, field_type, self.PROMPT_VERSION, question)
     
-    def process_answer(self, answer: str, field_type: str, field_name: str) -> str:
+    async def generate_questions(self, fields: Dict[str, str]) -> Dict[str, str]:
+        """
+        Generate questions for every field of a form, batching fields the rules and the cache
+        do not cover into JSON completions
+        Returns: Dict mapping field names to questions; fields the model failed on are omitted
+        """
+        questions = {}
+        missing = {}
+        ruled = 0
+        for field_name, field_type in fields.items():
+            question = question_for_field(field_name, field_type)
+            if question:
+                questions[field_name] = question
+                ruled += 1
+                continue
+            cached = None
+            if self.question_cache:
+                cached = await self.question_cache.get(field_name, field_type, self.PROMPT_VERSION)
+            if cached:
+                questions[field_name] = cached
+            else:
+                missing[field_name] = field_type
+
+        QUESTIONS_GENERATED.labels("rule").inc(ruled)
+        QUESTIONS_GENERATED.labels("cache").inc(len(questions) - ruled)
+        if not missing:
+            return questions
+
+        semaphore = asyncio.Semaphore(int(os.getenv("QUESTION_BATCH_CONCURRENCY", 4)))
+
+        async def run_chunk(chunk: Dict[str, str]) -> Dict[str, str]:
+            async with semaphore:
+                return await self._generate_question_batch(chunk)
+
+        chunks = self._chunk_fields(missing)
+        start = time.perf_counter()
+        batches = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        log_event(
+            logger, logging.INFO, "llm.question_batches",
+            fields=len(fields),
+            ruled=ruled,
+            cached=len(fields) - len(missing) - ruled,
+            generated=sum(len(generated) for generated in batches),
+            batches=len(chunks),
+            duration_ms=duration_ms(start),
+        )
+        QUESTIONS_GENERATED.labels("llm").inc(sum(len(generated) for generated in batches))
+        for generated in batches:
+            for field_name, question in generated.items():
+                questions[field_name] = question
+                if self.question_cache:
+                    await self.question_cache.set(field_name, missing[field_name], self.PROMPT_VERSION, question)
+
+        return questions
+
+    def _chunk_fields(self, fields: Dict[str, str]) -> List[Dict[str, str]]:
+        """
+        Split fields into batches that fit the context window
+        """
+        max_fields = int(os.getenv("QUESTION_BATCH_MAX_FIELDS", 40))
+        # Rough budget of four characters per token for the field list
+        max_prompt_chars = int(os.getenv("QUESTION_BATCH_MAX_PROMPT_TOKENS", 6000)) * 4
+
+        chunks = []
+        current = {}
+        current_chars = 0
+        for field_name, field_type in fields.items():
+            entry_chars = len(field_name) + len(field_type) + 16
+            if current and (len(current) >= max_fields or current_chars + entry_chars > max_prompt_chars):
+                chunks.append(current)
+                current = {}
+                current_chars = 0
+            current[field_name] = field_type
+            current_chars += entry_chars
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _generate_question_batch(self, fields: Dict[str, str]) -> Dict[str, str]:
+        """
+        Generate questions for a batch of fields with a single structured completion
+        """
+        try:
+            field_list = json.dumps(
+                [{"name": name, "type": field_type} for name, field_type in fields.items()], separators=(",", ":")
+            )
+            response = await self._create_completion(
+                "question_batch",
+                self._request("question_batch", field_list, len(fields), response_format={"type": "json_object"}),
+            )
+
+            content = response.choices[0].message.content
+            if not content:
+                raise ValueError("AI response was empty")
+            generated = json.loads(content).get("questions", {})
+
+            return {
+                field_name: question.strip()
+                for field_name, question in generated.items()
+                if field_name in fields and isinstance(question, str) and question.strip()
+            }
+
+        except Exception as e:
+            log_event(logger, logging.ERROR, "llm.question_batch_failed", fields=len(fields), error=repr(e))
+            LLM_FALLBACKS.labels("question_batch").inc()
+            return {}
+    
+    async def process_answer(self, answer: str, field_type: str, field_name: str) -> str:
         """
         Process and format user answers based on field type
         """
+        # Dates, phone numbers, emails, numbers and yes/no never need the model
+        normalized = normalize_answer(answer, field_type, field_name)
+        if normalized is not None:
+            ANSWERS_PROCESSED.labels("local").inc()
+            return normalized
+
+        if field_type not in ["text", "combobox", "listbox", "checkbox", "radiobutton"]:
+            # For other field types, return as-is
+            ANSWERS_PROCESSED.labels("passthrough").inc()
+            return answer.strip()
+
+        ANSWERS_PROCESSED.labels("llm").inc()
         try:
-            if field_type in ["checkbox", "radiobutton"]:
-                # Convert natural language to boolean/selection
-                answer_lower = answer.lower().strip()
-                yes_words = ["yes", "y", "true", "1", "on", "checked", "check", "selected", "select"]
-                return "yes" if any(word in answer_lower for word in yes_words) else "no"
-            
-            elif field_type in ["text", "combobox", "listbox"]:
-                # For text fields, clean up the answer
-                prompt = f"""
-                Clean up and format this user input for a form field named "{field_name}":
-                
-                User input: "{answer}"
-                Field type: {field_type}
-                
-                Return a clean, properly formatted version suitable for a PDF form. 
-                Keep it concise and remove any unnecessary words.
-                Just return the cleaned text, nothing else.
-                """
-                
-                response = self.client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=100,
-                    temperature=0.3
-                )
-                
-                return response.choices[0].message.content.strip()
+            # For free-form text fields, clean up the answer
+            prompt = f"Field: {field_name}\nType: {field_type}\nInput: {answer}"
+            response = await self._create_completion(
+                "answer", self._request("answer", prompt), timeout=self.answer_timeout
+            )
             
-            else:
-                # For other field types, return as-is
-                return answer.strip()
+            content = response.choices[0].message.content
+            if not content:
+                raise ValueError("AI response was empty")
+            return self._cleaned_answer(content.strip(), field_type)
                 
         except Exception as e:
             # Fallback to basic processing if AI fails
-            if field_type in ["checkbox", "radiobutton"]:
-                answer_lower = answer.lower().strip()
-                yes_words = ["yes", "y", "true", "1", "on", "checked", "check", "selected", "select"]
-                return "yes" if any(word in answer_lower for word in yes_words) else "no"
-            return answer.strip()
\ No newline at end of file
+            log_event(logger, logging.ERROR, "llm.answer_failed", field=field_name, error=repr(e))
+            LLM_FALLBACKS.labels("answer").inc()
+            return self._cleaned_answer(answer.strip(), field_type)
+
+    @staticmethod
+    def _cleaned_answer(value: str, field_type: str) -> str:
+        """
+        Checkboxes take yes or no; one the model could not settle stays unchecked
+        """
+        if field_type in ["checkbox", "radiobutton"]:
+            return normalize_yes_no(value) or "no"
+        return value
+
+    async def process_answers(self, answers: List[Tuple[str, str, str]]) -> List[str]:
+        """
+        Process many (answer, field_type, field_name) tuples, cleaning all free-form text in one call
+        Returns: Processed values in the same order as the input
+        """
+        results: List[Optional[str]] = []
+        free_form = {}
+        for index, (answer, field_type, field_name) in enumerate(answers):
+            normalized = normalize_answer(answer, field_type, field_name)
+            if normalized is not None:
+                ANSWERS_PROCESSED.labels("local").inc()
+            elif field_type not in ["text", "combobox", "listbox", "checkbox", "radiobutton"]:
+                ANSWERS_PROCESSED.labels("passthrough").inc()
+                normalized = answer.strip()
+            results.append(normalized)
+            if normalized is None:
+                free_form[str(index)] = {"field": field_name, "type": field_type, "input": answer}
+
+        if len(free_form) == 1:
+            index = int(next(iter(free_form)))
+            answer, field_type, field_name = answers[index]
+            results[index] = await self.process_answer(answer, field_type, field_name)
+        elif free_form:
+            ANSWERS_PROCESSED.labels("llm").inc(len(free_form))
+            cleaned = await self._process_answer_batch(free_form)
+            for key in free_form:
+                answer, field_type, _ = answers[int(key)]
+                results[int(key)] = self._cleaned_answer(cleaned.get(key) or answer.strip(), field_type)
+
+        return results
+
+    async def _process_answer_batch(self, items: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+        """
+        Clean up a batch of free-form answers with a single structured completion
+        """
+        try:
+            response = await self._create_completion(
+                "answer_batch",
+                self._request(
+                    "answer_batch",
+                    json.dumps(items, separators=(",", ":"), ensure_ascii=False),
+                    len(items),
+                    response_format={"type": "json_object"},
+                ),
+                timeout=self.answer_timeout * 2,
+            )
+
+            content = response.choices[0].message.content
+            if not content:
+                raise ValueError("AI response was empty")
+            cleaned = json.loads(content).get("answers", {})
+            return {key: value.strip() for key, value in cleaned.items() if isinstance(value, str)}
+
+        except Exception as e:
+            log_event(logger, logging.ERROR, "llm.answer_batch_failed", answers=len(items), error=repr(e))
+            LLM_FALLBACKS.labels("answer_batch").inc()
+            return {}
+
+    async def split_group_answer(self, answer: str, fields: Dict[str, str]) -> Dict[str, str]:
+        """
+        Split the answer to a multi-field question into a raw value per field
+        Clients may send a JSON object keyed by field name; values given in the order asked are split locally
+        Returns: Dict mapping field names to values; fields the answer could not be matched to are omitted
+        """
+        try:
+            structured = json.loads(answer)
+        except ValueError:
+            structured = None
+        if isinstance(structured, dict):
+            GROUP_ANSWERS_SPLIT.labels("json").inc()
+            return {
+                field_name: str(value).strip()
+                for field_name, value in structured.items()
+                if field_name in fields and value is not None and str(value).strip()
+            }
+
+        # Group questions ask for the values in order, separated by commas
+        text = answer.strip()
+        parts = [part.strip() for part in text.split("\n" if "\n" in text else ",")]
+        if len(parts) == len(fields) and all(parts):
+            GROUP_ANSWERS_SPLIT.labels("local").inc()
+            return dict(zip(fields, parts))
+
+        try:
+            payload = json.dumps(
+                {"fields": [{"name": name, "type": field_type} for name, field_type in fields.items()], "input": text},
+                separators=(",", ":"),
+                ensure_ascii=False,
+            )
+            response = await self._create_completion(
+                "group_answer",
+                self._request("group_answer", payload, len(fields), response_format={"type": "json_object"}),
+                timeout=self.answer_timeout,
+            )
+
+            content = response.choices[0].message.content
+            if not content:
+                raise ValueError("AI response was empty")
+            values = json.loads(content).get("values", {})
+            GROUP_ANSWERS_SPLIT.labels("llm").inc()
+            return {
+                field_name: value.strip()
+                for field_name, value in values.items()
+                if field_name in fields and isinstance(value, str) and value.strip()
+            }
+
+        except Exception as e:
+            log_event(logger, logging.ERROR, "llm.group_answer_failed", fields=len(fields), error=repr(e))
+            LLM_FALLBACKS.labels("group_answer").inc()
+            GROUP_ANSWERS_SPLIT.labels("failed").inc()
+            return {}
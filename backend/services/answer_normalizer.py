@@ -0,0 +1,174 @@
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from services.question_rules import tokenize_field_name
+
+YES_WORDS = {"yes", "y", "yeah", "yep", "true", "1", "on", "checked", "check", "selected", "select", "x"}
+NO_WORDS = {"no", "n", "nope", "not", "false", "0", "off", "unchecked", "none", "never"}
+
+DATE_INPUT_FORMATS = [
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+    "%m-%d-%Y",
+    "%d.%m.%Y",
+    "%B %d %Y",
+    "%b %d %Y",
+    "%d %B %Y",
+    "%d %b %Y",
+]
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+_EMAIL_SEARCH_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_PHONE_CHARS_RE = re.compile(r"^\+?[\d\s().-]{7,}$")
+_NUMBER_RE = re.compile(r"^[-+]?(\d{1,3}(,\d{3})+|\d+)(\.\d+)?$")
+_CURRENCY_RE = re.compile(r"[$€£¥\s]")
+_ORDINAL_RE = re.compile(r"(\d+)(st|nd|rd|th)\b", re.IGNORECASE)
+_SIMPLE_TEXT_RE = re.compile(r"^[\w\s.,'&/#-]+$")
+
+# Whole words of a field name that hint at its value; substrings would match "Language" as an age
+DATE_NAME_TOKENS = {"date", "dob", "birth", "birthday", "birthdate", "expiry", "expiration", "expires", "issued"}
+BIRTH_NAME_TOKENS = {"dob", "birth", "birthday", "birthdate"}
+PHONE_NAME_TOKENS = {"phone", "telephone", "tel", "mobile", "cell", "fax"}
+EMAIL_NAME_TOKENS = {"email"}
+NUMBER_NAME_TOKENS = {
+    "age", "amount", "qty", "quantity", "count", "total", "income", "salary", "zip", "zipcode", "postal", "postcode",
+}
+
+# Short plain answers are already form-ready; longer text goes to the model
+SIMPLE_TEXT_MAX_WORDS = int(os.getenv("ANSWER_SIMPLE_TEXT_MAX_WORDS", 3))
+
+
+def normalize_yes_no(answer: str) -> Optional[str]:
+    """
+    Convert a natural-language answer to "yes" or "no"
+    Returns: None when the answer has no yes/no word or has both, like "yes, not a problem"
+    """
+    words = set(_WORD_RE.findall(answer.lower()))
+    if not words:
+        return "no"
+    is_yes = bool(words & YES_WORDS)
+    is_no = bool(words & NO_WORDS)
+    if is_yes == is_no:
+        return None
+    return "yes" if is_yes else "no"
+
+
+def normalize_date(answer: str, past_only: bool = False) -> Optional[str]:
+    cleaned = _ORDINAL_RE.sub(r"\1", answer.strip()).replace(",", " ")
+    cleaned = " ".join(cleaned.split())
+    for date_format in DATE_INPUT_FORMATS:
+        try:
+            parsed = datetime.strptime(cleaned, date_format)
+        except ValueError:
+            continue
+        if past_only and parsed > datetime.now():
+            return None
+        return parsed.strftime(os.getenv("ANSWER_DATE_FORMAT", "%m/%d/%Y"))
+    return None
+
+
+def normalize_phone(answer: str) -> Optional[str]:
+    candidate = answer.strip()
+    if not _PHONE_CHARS_RE.match(candidate):
+        return None
+    digits = re.sub(r"\D", "", candidate)
+    if len(digits) == 10:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    if len(digits) == 11 and digits.startswith("1"):
+        return f"+1 ({digits[1:4]}) {digits[4:7]}-{digits[7:]}"
+    if candidate.startswith("+") and 8 <= len(digits) <= 15:
+        return f"+{digits}"
+    return None
+
+
+def normalize_email(answer: str, search: bool = False) -> Optional[str]:
+    candidate = answer.strip()
+    if _EMAIL_RE.match(candidate):
+        return candidate.lower()
+    if search:
+        matches = _EMAIL_SEARCH_RE.findall(candidate)
+        if len(matches) == 1:
+            return matches[0].lower()
+    return None
+
+
+def normalize_number(answer: str, search: bool = False) -> Optional[str]:
+    candidate = answer.strip()
+    if _NUMBER_RE.match(candidate):
+        return candidate
+    if search:
+        # Only currency symbols and spaces may surround the number; "Apt 4B" or "50k" is not a number
+        bare = _CURRENCY_RE.sub("", candidate)
+        if bare != candidate and _NUMBER_RE.match(bare):
+            return bare
+    return None
+
+
+def _name_hints(field_name: str) -> List[str]:
+    tokens = tokenize_field_name(field_name)
+    words = set(tokens)
+    # Two-word spellings: "EMail" and "NumberOfChildren"; a bare "number" is often an ID like a policy number
+    pairs = set(zip(tokens, tokens[1:]))
+    if ("e", "mail") in pairs:
+        words.add("email")
+    if ("number", "of") in pairs:
+        words.add("count")
+    return [
+        hint
+        for hint, names in (
+            ("email", EMAIL_NAME_TOKENS),
+            ("date", DATE_NAME_TOKENS),
+            ("birth", BIRTH_NAME_TOKENS),
+            ("phone", PHONE_NAME_TOKENS),
+            ("number", NUMBER_NAME_TOKENS),
+        )
+        if words & names
+    ]
+
+
+def normalize_answer(answer: str, field_type: str, field_name: str) -> Optional[str]:
+    """
+    Normalize an answer deterministically without the LLM
+    Returns: The normalized value, or None when the answer needs free-form cleanup
+    """
+    if field_type in ["checkbox", "radiobutton"]:
+        return normalize_yes_no(answer)
+
+    stripped = answer.strip()
+    if not stripped:
+        return ""
+
+    # Field-name hints allow pulling a value out of a short sentence
+    hints = _name_hints(field_name)
+    if "email" in hints:
+        value = normalize_email(stripped, search=True)
+        if value:
+            return value
+    if "date" in hints:
+        # A date field's answer that does not parse, or a future birth date, is left to the model
+        return normalize_date(stripped, past_only="birth" in hints)
+    if "phone" in hints:
+        value = normalize_phone(stripped)
+        if value:
+            return value
+    if "number" in hints:
+        value = normalize_number(stripped, search=True)
+        if value:
+            return value
+
+    # Otherwise recognise values by their shape alone
+    for normalizer in (normalize_email, normalize_date, normalize_number, normalize_phone):
+        value = normalizer(stripped)
+        if value:
+            return value
+
+    words = stripped.split()
+    if len(words) == 1 and words[0].lower() in ["yes", "no", "true", "false"]:
+        return normalize_yes_no(stripped).capitalize()
+    if len(words) <= SIMPLE_TEXT_MAX_WORDS and _SIMPLE_TEXT_RE.match(stripped):
+        return " ".join(words)
+
+    return None
@@ -0,0 +1,317 @@
+import io
+import os
+import re
+import csv
+import json
+import time
+import shutil
+import asyncio
+import logging
+import zipfile
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from logging_config import duration_ms, log_event
+from metrics import BATCH_ROWS
+from services.answer_normalizer import normalize_answer
+from services.pdf_worker import PDFWorkerBusyError, PDFWorkerPool
+from services.storage import Storage
+from services.upload_service import UploadTooLargeError
+
+logger = logging.getLogger(__name__)
+
+BATCH_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._ -]+")
+
+
+class InvalidBatchError(Exception):
+    """
+    Raised when batch rows cannot be read or name fields the template does not have
+    """
+
+
+@dataclass(frozen=True)
+class BatchRow:
+    index: int  # 1-based position among the data rows
+    name: str  # file name of the filled PDF in the archive
+    values: Dict[str, str]
+
+
+# A filled row: the row, and either the path of its PDF or why it failed
+BatchResult = Tuple[BatchRow, Optional[str], Optional[str]]
+
+
+async def read_batch_upload(file: UploadFile, max_size: int) -> bytes:
+    """
+    Read a rows file into memory, rejecting it as soon as it crosses the size limit
+    """
+    chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLargeError(f"File size exceeds limit of {max_size} bytes")
+        chunks.append(chunk)
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str], requested: Optional[str] = None) -> str:
+    """
+    Rows format from the explicit format parameter, the file extension or the content type
+    Returns: csv or jsonl
+    """
+    if requested:
+        if requested.lower() not in ("csv", "jsonl"):
+            raise InvalidBatchError(f"Unsupported format: {requested}; use csv or jsonl")
+        return requested.lower()
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in BATCH_FORMATS:
+        return BATCH_FORMATS[extension]
+    if content_type and ("json" in content_type):
+        return "jsonl"
+    if content_type and "csv" in content_type:
+        return "csv"
+    raise InvalidBatchError("Could not tell the rows format; upload a .csv or .jsonl file or pass format")
+
+
+def _records(data: bytes, fmt: str) -> List[Dict[str, Any]]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise InvalidBatchError("Rows file must be UTF-8 encoded")
+
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text, newline=""))
+        if not reader.fieldnames:
+            raise InvalidBatchError("CSV file has no header row")
+        try:
+            # Cells beyond the header land under None; blank lines are skipped by the reader
+            return [{column: value for column, value in row.items() if column is not None} for row in reader]
+        except csv.Error as e:
+            raise InvalidBatchError(f"Line {reader.line_num}: {e}")
+
+    records = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise InvalidBatchError(f"Line {line_number}: {e.msg}")
+        if not isinstance(record, dict):
+            raise InvalidBatchError(f"Line {line_number}: each line must be a JSON object")
+        records.append(record)
+    return records
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    return str(value).strip()
+
+
+def _output_name(row: Dict[str, Any], index: int, name_column: Optional[str], used: set) -> str:
+    base = _UNSAFE_NAME_RE.sub("_", _cell(row.get(name_column))).strip(" ._") if name_column else ""
+    if base.lower().endswith(".pdf"):
+        base = base[:-4]
+    name = f"{base or f'row-{index:05d}'}.pdf"
+    if name in used:
+        name = f"{base or 'row'}-{index:05d}.pdf"
+    used.add(name)
+    return name
+
+
+def parse_rows(
+    data: bytes,
+    fmt: str,
+    fields: Dict[str, str],
+    mapping: Optional[Dict[str, Optional[str]]] = None,
+    name_column: Optional[str] = None,
+    max_rows: Optional[int] = None,
+) -> List[BatchRow]:
+    """
+    Turn CSV or JSONL rows into field values of a template
+    Columns are field names unless mapping renames them; a column mapped to null is ignored.
+    Values are normalized like conversational answers, without the model
+    """
+    mapping = mapping or {}
+    max_rows = max_rows or int(os.getenv("BATCH_MAX_ROWS", 1000))
+    records = _records(data, fmt)
+    if not records:
+        raise InvalidBatchError("Rows file contains no rows")
+    if len(records) > max_rows:
+        raise InvalidBatchError(f"Too many rows: {len(records)}; the limit is {max_rows}")
+
+    columns = {column for record in records for column in record}
+    if name_column and name_column not in columns:
+        raise InvalidBatchError(f"Name column {name_column!r} is not in the rows")
+    field_by_column = {}
+    unknown = []
+    for column in sorted(columns):
+        if column == name_column:
+            continue
+        field_name = mapping.get(column, column)
+        if field_name is None:
+            continue
+        if field_name not in fields:
+            unknown.append(column)
+            continue
+        field_by_column[column] = field_name
+    if unknown:
+        raise InvalidBatchError(f"Columns do not match any form field: {', '.join(unknown[:10])}")
+
+    rows = []
+    used_names = set()
+    for index, record in enumerate(records, start=1):
+        values = {}
+        for column, field_name in field_by_column.items():
+            value = _cell(record.get(column))
+            if value:
+                field_type = fields[field_name]
+                normalized = normalize_answer(value, field_type, field_name)
+                if normalized is None and field_type in ["checkbox", "radiobutton"]:
+                    # There is no model to settle a mixed answer, so the box stays unchecked
+                    normalized = "no"
+                values[field_name] = normalized or value
+        rows.append(BatchRow(index, _output_name(record, index, name_column, used_names), values))
+    return rows
+
+
+class BatchFiller:
+    """
+    Fills one template with many rows on the PDF worker pool, a chunk of rows per job,
+    leaving room in the pool for interactive fills
+    """
+
+    def __init__(
+        self,
+        pdf_worker: PDFWorkerPool,
+        storage: Storage,
+        chunk_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        busy_wait: Optional[float] = None,
+    ):
+        self.pdf_worker = pdf_worker
+        self.storage = storage
+        self.chunk_size = chunk_size or int(os.getenv("BATCH_FILL_CHUNK_SIZE", 8))
+        self.concurrency = concurrency or int(os.getenv("BATCH_FILL_CONCURRENCY", pdf_worker.max_workers))
+        # How long a chunk waits for a saturated pool before its rows are given up as failed
+        self.busy_wait = busy_wait or float(os.getenv("BATCH_FILL_BUSY_WAIT", pdf_worker.job_timeout))
+
+    async def _fill_chunk(
+        self,
+        semaphore: asyncio.Semaphore,
+        template_path: str,
+        field_schema: List[Dict[str, Any]],
+        chunk: List[BatchRow],
+        output_dir: str,
+    ) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        async with semaphore:
+            deadline = time.monotonic() + self.busy_wait
+            while True:
+                try:
+                    return await self.pdf_worker.fill_batch(
+                        template_path, field_schema, [(row.index, row.values) for row in chunk], output_dir
+                    )
+                except PDFWorkerBusyError as e:
+                    if time.monotonic() + e.retry_after > deadline:
+                        error = f"PDF workers stayed busy for {self.busy_wait:g}s"
+                        return [(row.index, None, error) for row in chunk]
+                    # Interactive users come first; wait for the pool to drain
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    return [(row.index, None, str(e)) for row in chunk]
+
+    async def fill(
+        self,
+        template_path: str,
+        field_schema: List[Dict[str, Any]],
+        rows: List[BatchRow],
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Fill every row, yielding results as their chunks finish; output files are removed once the iteration ends
+        """
+        start = time.perf_counter()
+        counts = {"filled": 0, "failed": 0}
+        output_dir = self.storage.scratch_path()
+        os.makedirs(output_dir)
+        rows_by_index = {row.index: row for row in rows}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            asyncio.create_task(
+                self._fill_chunk(semaphore, template_path, field_schema, rows[start:start + self.chunk_size], output_dir)
+            )
+            for start in range(0, len(rows), self.chunk_size)
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                for index, path, error in await finished:
+                    outcome = "failed" if path is None else "filled"
+                    counts[outcome] += 1
+                    BATCH_ROWS.labels(outcome).inc()
+                    yield rows_by_index[index], path, error
+        finally:
+            # Also reached when the client of a streamed batch goes away
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.to_thread(shutil.rmtree, output_dir, True)
+            log_event(
+                logger, logging.INFO, "batch.fill",
+                rows=len(rows), **counts, duration_ms=duration_ms(start),
+            )
+
+
+class _ZipBuffer(io.RawIOBase):
+    """
+    Write-only sink that hands zipfile's output over piece by piece
+    It cannot seek, so zipfile writes each entry's sizes after its data
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_zip(results: AsyncIterator[BatchResult]) -> AsyncIterator[bytes]:
+    """
+    Archive filled PDFs as they arrive, with errors.jsonl listing the rows that failed
+    PDFs are already compressed, so entries are stored as they are
+    """
+    buffer = _ZipBuffer()
+    errors = []
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for row, path, error in results:
+            if path is None:
+                errors.append({"row": row.index, "name": row.name, "error": error})
+                continue
+            await asyncio.to_thread(archive.write, path, row.name)
+            os.remove(path)
+            yield buffer.take()
+        if errors:
+            archive.writestr("errors.jsonl", "".join(json.dumps(error) + "\n" for error in errors))
+    yield buffer.take()
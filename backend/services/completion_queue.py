@@ -0,0 +1,252 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+from prometheus_client import Histogram
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from logging_config import duration_ms, log_event
+from metrics import COMPLETION_JOB_SECONDS, COMPLETION_QUEUE_DEPTH
+from models import CompletionJob
+from services.pdf_worker import PDFWorkerBusyError
+from services.storage import Storage, create_storage
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class CompletionQueue:
+    """
+    Database-backed queue of PDF completion jobs, drained by in-process asyncio workers
+    Works on SQLite and Postgres without an external broker
+    Other job tables with the same status, attempts and timing columns, such as batch fills, reuse it through model
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        handler: Callable[[AsyncSession, Any], Awaitable[str]],
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        stale_after: Optional[float] = None,
+        storage: Optional[Storage] = None,
+        model: Any = CompletionJob,
+        name: str = "completion",
+        job_seconds: Histogram = COMPLETION_JOB_SECONDS,
+        log_keys: Sequence[str] = ("session_id",),
+    ):
+        self.session_factory = session_factory
+        self.storage = storage or create_storage()
+        self.handler = handler
+        self.model = model
+        # Prefix of log events and name of the queue in messages
+        self.name = name
+        self.job_seconds = job_seconds
+        # Job columns that go into each job's log event
+        self.log_keys = log_keys
+        self.concurrency = concurrency or int(os.getenv("COMPLETION_WORKERS", 2))
+        self.poll_interval = poll_interval or float(os.getenv("COMPLETION_POLL_INTERVAL", 1.0))
+        # Running jobs older than this are assumed lost with their process and requeued
+        self.stale_after = stale_after or float(os.getenv("COMPLETION_JOB_STALE_AFTER", 600))
+        self.max_attempts = int(os.getenv("COMPLETION_JOB_MAX_ATTEMPTS", 3))
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_recovery = 0.0
+
+    def start(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"{self.name.capitalize()} queue started with {self.concurrency} workers")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def get(self, db: AsyncSession, job_id: str) -> Optional[Any]:
+        return await db.scalar(select(self.model).where(self.model.job_id == job_id))
+
+    async def enqueue(self, db: AsyncSession, session_id: str, input_hash: str) -> CompletionJob:
+        """
+        Return the session's active job, a finished job for the same output fingerprint, or a newly queued job
+        """
+        job = await self._active_job(db, session_id)
+        if job is not None:
+            return job
+
+        done = await db.scalar(
+            select(CompletionJob)
+            .where(
+                CompletionJob.session_id == session_id,
+                CompletionJob.status == "succeeded",
+                CompletionJob.input_hash == input_hash,
+            )
+            .order_by(CompletionJob.id.desc())
+            .limit(1)
+        )
+        if done is not None and done.output_path and await self.storage.exists(done.output_path):
+            return done
+
+        job = CompletionJob(job_id=str(uuid.uuid4()), session_id=session_id, status="queued", attempts=0)
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request queued a job for this session first
+            await db.rollback()
+            return await self._active_job(db, session_id) or await self.enqueue(db, session_id, input_hash)
+
+        log_event(logger, logging.DEBUG, "completion.job_queued", job_id=job.job_id, session_id=session_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def submit(self, db: AsyncSession, job: Any) -> Any:
+        """
+        Queue a new job row and wake a worker
+        """
+        db.add(job)
+        await db.commit()
+        log_event(logger, logging.DEBUG, f"{self.name}.job_queued", job_id=job.job_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def record_depth(self, db: AsyncSession):
+        """
+        Publish the number of queued and running jobs
+        """
+        counts = dict((await db.execute(
+            select(CompletionJob.status, func.count())
+            .where(CompletionJob.status.in_(ACTIVE_STATUSES))
+            .group_by(CompletionJob.status)
+        )).all())
+        for status in ACTIVE_STATUSES:
+            COMPLETION_QUEUE_DEPTH.labels(status).set(counts.get(status, 0))
+
+    async def _active_job(self, db: AsyncSession, session_id: str) -> Optional[CompletionJob]:
+        return await db.scalar(
+            select(CompletionJob).where(
+                CompletionJob.session_id == session_id,
+                CompletionJob.status.in_(ACTIVE_STATUSES),
+            )
+        )
+
+    async def _worker(self):
+        while True:
+            try:
+                job_pk = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error claiming completion job: {e}")
+                job_pk = None
+
+            if job_pk is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job_pk)
+
+    async def _claim(self) -> Optional[int]:
+        """
+        Atomically move the oldest queued job to running
+        Returns: The job's primary key, or None when the queue is empty
+        """
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as db:
+            loop_time = asyncio.get_running_loop().time()
+            if loop_time - self._last_recovery >= self.stale_after / 2:
+                self._last_recovery = loop_time
+                await self._recover_stale(db, now)
+
+            candidate = (
+                select(self.model.id)
+                .where(self.model.status == "queued")
+                .order_by(self.model.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            job_pk = await db.scalar(
+                update(self.model)
+                .where(self.model.id == candidate, self.model.status == "queued")
+                .values(status="running", started_at=now, attempts=self.model.attempts + 1)
+                .returning(self.model.id)
+            )
+            await db.commit()
+            return job_pk
+
+    async def _recover_stale(self, db: AsyncSession, now: datetime):
+        stale = (
+            (self.model.status == "running")
+            & (self.model.started_at < now - timedelta(seconds=self.stale_after))
+        )
+        await db.execute(
+            update(self.model)
+            .where(stale, self.model.attempts >= self.max_attempts)
+            .values(status="failed", error="Job was lost too many times", finished_at=now)
+        )
+        result = await db.execute(update(self.model).where(stale).values(status="queued"))
+        if result.rowcount:
+            logger.warning(f"Requeued {result.rowcount} stale {self.name} jobs")
+        await db.commit()
+
+    async def _run(self, job_pk: int):
+        async with self.session_factory() as db:
+            job = await db.get(self.model, job_pk)
+            job_id, attempts = job.job_id, job.attempts
+            context = {key: getattr(job, key) for key in self.log_keys}
+            start = time.perf_counter()
+            try:
+                output_path = await self.handler(db, job)
+                job.status = "succeeded"
+                job.output_path = output_path
+                job.error = None
+                job.finished_at = datetime.now(timezone.utc)
+                await db.commit()
+                self.job_seconds.labels("succeeded").observe(time.perf_counter() - start)
+                log_event(
+                    logger, logging.INFO, f"{self.name}.job",
+                    job_id=job_id, **context, outcome="succeeded",
+                    attempts=attempts, duration_ms=duration_ms(start),
+                )
+            except PDFWorkerBusyError as e:
+                # Not a failure: hand the job back and let the PDF pool drain first
+                self.job_seconds.labels("requeued").observe(time.perf_counter() - start)
+                await db.rollback()
+                await db.execute(
+                    update(self.model)
+                    .where(self.model.id == job_pk)
+                    .values(status="queued", attempts=self.model.attempts - 1)
+                )
+                await db.commit()
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                log_event(
+                    logger, logging.ERROR, f"{self.name}.job",
+                    job_id=job_id, **context, outcome="failed",
+                    attempts=attempts, duration_ms=duration_ms(start), error=str(e),
+                )
+                self.job_seconds.labels("failed").observe(time.perf_counter() - start)
+                await db.rollback()
+                await db.execute(
+                    update(self.model)
+                    .where(self.model.id == job_pk)
+                    .values(status="failed", error=str(e), finished_at=datetime.now(timezone.utc))
+                )
+                await db.commit()
@@ -0,0 +1,91 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Set
+
+from services.question_rules import FIELD_FAMILIES, describe_field, tokenize_field_name
+
+FIELD_GROUPING = os.getenv("FIELD_GROUPING", "true").lower() == "true"
+
+# Free text and dropdowns can share one answer; checkboxes and signatures are always asked on their own
+GROUPABLE_TYPES = {"text", "combobox"}
+
+# Intermediate nodes of generated field names that say nothing about what the fields mean
+_CONTAINER_RE = re.compile(r"^(#?subform|topmostsubform|form|page)\d*$", re.IGNORECASE)
+_INDEX_RE = re.compile(r"\[\d*\]")
+
+_FAMILY_BY_NOUN = {noun: family for family, nouns in FIELD_FAMILIES.items() for noun in nouns}
+
+
+def _prefix_keys(field_name: str) -> Set[str]:
+    """
+    Name prefixes a field shares with its neighbours: its parent in a hierarchical name,
+    the owner of a name or address part, and a leading word such as "employer" in "employer_phone"
+    """
+    keys = set()
+    path = _INDEX_RE.sub("", field_name).split(".")
+    if len(path) > 1 and not _CONTAINER_RE.match(path[-2]):
+        keys.add("path:" + ".".join(path[:-1]))
+
+    described = describe_field(field_name)
+    if described and described[1] in _FAMILY_BY_NOUN:
+        keys.add(f"family:{_FAMILY_BY_NOUN[described[1]]}:{described[0]}")
+
+    tokens = tokenize_field_name(field_name)
+    if len(tokens) > 1 and len(tokens[0]) >= 3 and not tokens[0].isdigit():
+        keys.add("word:" + tokens[0])
+    return keys
+
+
+def _gap(rect: List[float], other: List[float]) -> float:
+    """
+    Distance in points between two widget rects; 0 when they touch or overlap
+    """
+    dx = max(other[0] - rect[2], rect[0] - other[2], 0)
+    dy = max(other[1] - rect[3], rect[1] - other[3], 0)
+    return max(dx, dy)
+
+
+def group_fields(
+    field_schema: List[Dict[str, Any]],
+    max_gap: Optional[float] = None,
+    max_size: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Cluster neighbouring fields that share a name prefix and sit close together on the same page,
+    like the parts of an address block, so they can be asked for with one question
+    Returns: Dict mapping each grouped field name to its group key, the name of the group's first field;
+    fields asked on their own are omitted
+    """
+    if not FIELD_GROUPING:
+        return {}
+    max_gap = max_gap if max_gap is not None else float(os.getenv("FIELD_GROUP_MAX_GAP", 36))
+    max_size = max_size or int(os.getenv("FIELD_GROUP_MAX_SIZE", 6))
+
+    # A field's first widget places it on the form
+    widgets = {}
+    for widget in field_schema:
+        widgets.setdefault(widget["name"], widget)
+
+    groups: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    shared: Set[str] = set()
+    for widget in widgets.values():
+        keys = _prefix_keys(widget["name"]) if widget["type"] in GROUPABLE_TYPES else set()
+        joins = (
+            current
+            and len(current) < max_size
+            and widget["page"] == current[-1]["page"]
+            and shared & keys
+            and min(_gap(member["rect"], widget["rect"]) for member in current) <= max_gap
+        )
+        if joins:
+            current.append(widget)
+            shared &= keys
+            continue
+        if len(current) > 1:
+            groups.append(current)
+        current, shared = ([widget], keys) if keys else ([], set())
+    if len(current) > 1:
+        groups.append(current)
+
+    return {member["name"]: group[0]["name"] for group in groups for member in group}
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+import openai
+
+from logging_config import log_event
+from metrics import LLM_CIRCUIT_OPEN, LLM_COALESCED, LLM_RATE_LIMIT_WAIT_SECONDS, LLM_RETRIES
+from services.llm_profiles import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Errors worth another attempt; anything else (bad request, auth) fails straight away
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised without calling the API while the circuit breaker is open
+    """
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute limiter; callers wait for their estimated token cost in arrival order
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Wait until the bucket holds the cost of a request and take it
+        Returns: Seconds spent waiting
+        """
+        if self.capacity <= 0:
+            return 0.0
+        cost = min(float(tokens), self.capacity)
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.resume_at:
+                    await asyncio.sleep(self.resume_at - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return time.monotonic() - start
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """
+        Hold every caller back after the API asked us to slow down
+        """
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent requests so a struggling API is not hit with a retry storm
+    """
+
+    def __init__(self, ratio: float, min_retries: int = 10):
+        self.ratio = ratio
+        self.max_balance = float(min_retries)
+        self.balance = float(min_retries)
+
+    def deposit(self):
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures and lets a single probe through once the cool-down has passed
+    """
+
+    def __init__(self, failure_threshold: int, reset_after: float):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_after:
+            return False
+        self.probing = True
+        return True
+
+    def release_probe(self):
+        """
+        Let another probe through after one ended without a verdict: cancelled, timed out or rejected as invalid
+        """
+        self.probing = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            log_event(logger, logging.WARNING, "llm.circuit_closed")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                log_event(logger, logging.WARNING, "llm.circuit_opened", failures=self.failures)
+            self.opened_at = time.monotonic()
+            LLM_CIRCUIT_OPEN.set(1)
+
+
+class LLMGateway:
+    """
+    Single entry point to the chat completions API with a concurrency cap, a tokens-per-minute limiter,
+    coalescing of identical in-flight requests, jittered retries within a budget and a circuit breaker
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", 3))
+        self.backoff_base = float(os.getenv("LLM_RETRY_BACKOFF", 0.5))
+        self.backoff_max = float(os.getenv("LLM_RETRY_BACKOFF_MAX", 8))
+        self.semaphore = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", 8)))
+        # 0 disables the limiter; set it to the deployment's quota
+        self.bucket = TokenBucket(int(os.getenv("LLM_TOKENS_PER_MINUTE", 0)))
+        self.retry_budget = RetryBudget(float(os.getenv("LLM_RETRY_BUDGET_RATIO", 0.2)))
+        self.breaker = CircuitBreaker(
+            int(os.getenv("LLM_CIRCUIT_FAILURES", 5)),
+            float(os.getenv("LLM_CIRCUIT_RESET_AFTER", 30)),
+        )
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def estimate_tokens(kwargs: Dict[str, Any]) -> int:
+        """
+        Request cost for the limiter: prompt tokens plus the completion allowance, as the API counts it
+        """
+        prompt_tokens = count_tokens(kwargs.get("messages", []), kwargs.get("model") or "")
+        return prompt_tokens + int(kwargs.get("max_tokens") or 0)
+
+    @staticmethod
+    def request_key(kwargs: Dict[str, Any]) -> str:
+        payload = json.dumps(kwargs, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def create(
+        self,
+        operation: str,
+        timeout: Optional[float] = None,
+        token_cost: Optional[int] = None,
+        **kwargs,
+    ):
+        """
+        Create a chat completion; identical requests already in flight share one API call
+        timeout bounds the whole call, retries included; token_cost skips re-counting the prompt
+        """
+        if kwargs.get("stream"):
+            return await self.stream(operation, timeout=timeout, token_cost=token_cost, **kwargs)
+
+        key = self.request_key(kwargs)
+        task = self._inflight.get(key)
+        if task is not None:
+            LLM_COALESCED.labels(operation).inc()
+        else:
+            task = asyncio.create_task(self._call(operation, timeout, token_cost, kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # One caller giving up must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    async def stream(
+        self,
+        operation: str,
+        timeout: Optional[float] = None,
+        token_cost: Optional[int] = None,
+        **kwargs,
+    ):
+        """
+        Open a streaming completion; retries only cover opening the stream, never a partial answer
+        """
+        return await self._call(operation, timeout, token_cost, kwargs)
+
+    async def _call(
+        self,
+        operation: str,
+        timeout: Optional[float],
+        token_cost: Optional[int],
+        kwargs: Dict[str, Any],
+    ):
+        if not self.breaker.allow():
+            raise LLMUnavailableError("LLM circuit breaker is open")
+        is_probe = self.breaker.probing
+        try:
+            return await self._call_with_retries(operation, timeout, token_cost, kwargs)
+        finally:
+            if is_probe:
+                # Also reached on cancellation, which would otherwise leave the circuit waiting on this probe forever
+                self.breaker.release_probe()
+
+    async def _call_with_retries(
+        self,
+        operation: str,
+        timeout: Optional[float],
+        token_cost: Optional[int],
+        kwargs: Dict[str, Any],
+    ):
+        deadline = time.monotonic() + timeout if timeout else None
+        if token_cost is None:
+            token_cost = self.estimate_tokens(kwargs)
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            waited = await self.bucket.acquire(token_cost)
+            if waited:
+                LLM_RATE_LIMIT_WAIT_SECONDS.observe(waited)
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError()
+
+            try:
+                async with self.semaphore:
+                    request = self.client.chat.completions.create(**kwargs)
+                    response = await (asyncio.wait_for(request, timeout=remaining) if remaining else request)
+                self.breaker.record_success()
+                return response
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                delay = self._backoff(attempt, e)
+                if (
+                    attempt >= self.max_retries
+                    or self.breaker.is_open
+                    or (deadline is not None and time.monotonic() + delay >= deadline)
+                    or not self.retry_budget.withdraw()
+                ):
+                    raise
+                attempt += 1
+                reason = type(e).__name__
+                LLM_RETRIES.labels(operation, reason).inc()
+                log_event(
+                    logger, logging.INFO, "llm.retry",
+                    operation=operation, attempt=attempt, reason=reason, delay_s=round(delay, 3),
+                )
+                await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Full-jitter exponential backoff, or the server's Retry-After on 429s, which also pauses the limiter
+        """
+        if isinstance(error, openai.RateLimitError):
+            retry_after = self._retry_after(error)
+            if retry_after is not None:
+                self.bucket.pause(retry_after)
+                return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(error: openai.APIStatusError) -> Optional[float]:
+        headers = error.response.headers
+        for header, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+            try:
+                return float(headers[header]) / scale
+            except (KeyError, TypeError, ValueError):
+                continue
+        return None
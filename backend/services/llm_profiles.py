@@ -0,0 +1,186 @@
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional; token counts fall back to a character estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Chat format overhead per message and for priming the reply, as documented for OpenAI chat models
+MESSAGE_OVERHEAD_TOKENS = 3
+REPLY_PRIMING_TOKENS = 3
+
+# An encoding that failed to load (its file is downloaded on first use) is retried after this long
+ENCODING_RETRY_AFTER = float(os.getenv("TOKEN_ENCODING_RETRY_AFTER", 300))
+
+QUESTION_SYSTEM_PROMPT = (
+    "You write the question a form assistant asks to fill in one PDF form field. "
+    "Reply with one short, friendly question only; add a brief example only when it helps."
+)
+QUESTION_BATCH_SYSTEM_PROMPT = (
+    "You write the questions a form assistant asks to fill in PDF form fields. "
+    "Write one short, friendly question per field. "
+    'Reply with JSON {"questions": {"<field name>": "<question>"}} using the exact field names given.'
+)
+ANSWER_SYSTEM_PROMPT = (
+    "You clean up a user's answer for a PDF form field: fix formatting, drop filler words, keep it concise. "
+    "Reply with the cleaned value only."
+)
+ANSWER_BATCH_SYSTEM_PROMPT = (
+    "You clean up users' answers for PDF form fields: fix formatting, drop filler words, keep each concise. "
+    'Reply with JSON {"answers": {"<key>": "<cleaned value>"}} using the keys given.'
+)
+GROUP_ANSWER_SYSTEM_PROMPT = (
+    "You split a user's answer to a multi-part question into the values of the PDF form fields it covers. "
+    'Reply with JSON {"values": {"<field name>": "<value>"}} using the exact field names given; '
+    "leave out fields the answer does not cover."
+)
+
+
+@dataclass(frozen=True)
+class LLMProfile:
+    """
+    Request settings for one kind of model call
+    On Azure the deployment decides which model answers; model only names it for token counting
+    max_tokens is per request, or per item for batch calls on top of batch_overhead
+    """
+    operation: str
+    model: str
+    deployment: Optional[str]
+    max_tokens: int
+    temperature: float
+    system_prompt: str
+    batch_overhead: int = 0
+
+    def max_tokens_for(self, items: int = 1) -> int:
+        return min(4096, self.max_tokens * items + self.batch_overhead)
+
+
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "question": {
+        "model": "gpt-4o", "max_tokens": 64, "temperature": 0.7, "system_prompt": QUESTION_SYSTEM_PROMPT,
+    },
+    "question_batch": {
+        "model": "gpt-4o", "max_tokens": 48, "temperature": 0.7, "system_prompt": QUESTION_BATCH_SYSTEM_PROMPT,
+        "batch_overhead": 32,
+    },
+    # Answer cleanup is simple rewriting; a smaller deployment is faster and cheaper.
+    # Set LLM_ANSWER_DEPLOYMENT (and LLM_ANSWER_MODEL) to use one; until then answers go to AZURE_OPENAI_DEPLOYMENT
+    "answer": {
+        "model": "gpt-4o", "max_tokens": 64, "temperature": 0.0, "system_prompt": ANSWER_SYSTEM_PROMPT,
+    },
+    "answer_batch": {
+        "model": "gpt-4o", "max_tokens": 48, "temperature": 0.0, "system_prompt": ANSWER_BATCH_SYSTEM_PROMPT,
+        "batch_overhead": 32,
+    },
+    "group_answer": {
+        "model": "gpt-4o", "max_tokens": 32, "temperature": 0.0, "system_prompt": GROUP_ANSWER_SYSTEM_PROMPT,
+        "batch_overhead": 32,
+    },
+}
+
+# Batch and split calls use the model and deployment of their single-call profile unless set explicitly
+PARENT_PROFILES = {"question_batch": "question", "answer_batch": "answer", "group_answer": "answer"}
+
+
+def _setting(operation: str, key: str) -> Optional[str]:
+    value = os.getenv(f"LLM_{operation.upper()}_{key}")
+    if value is None and key in ("MODEL", "DEPLOYMENT") and operation in PARENT_PROFILES:
+        value = os.getenv(f"LLM_{PARENT_PROFILES[operation].upper()}_{key}")
+    return value
+
+
+def load_profiles() -> Dict[str, LLMProfile]:
+    """
+    Build the request profile of every operation from the defaults and LLM_<OPERATION>_<SETTING> overrides
+    e.g. LLM_ANSWER_DEPLOYMENT=gpt-4o-mini LLM_ANSWER_MODEL=gpt-4o-mini, LLM_QUESTION_MAX_TOKENS=48
+    """
+    profiles = {}
+    for operation, defaults in DEFAULT_PROFILES.items():
+        profiles[operation] = LLMProfile(
+            operation=operation,
+            model=_setting(operation, "MODEL") or defaults["model"],
+            # None sends the request to AZURE_OPENAI_DEPLOYMENT
+            deployment=_setting(operation, "DEPLOYMENT"),
+            max_tokens=int(_setting(operation, "MAX_TOKENS") or defaults["max_tokens"]),
+            temperature=float(_setting(operation, "TEMPERATURE") or defaults["temperature"]),
+            system_prompt=defaults["system_prompt"],
+            batch_overhead=defaults.get("batch_overhead", 0),
+        )
+    return profiles
+
+
+_encodings: Dict[str, Any] = {}
+_encoding_failed_at: Dict[str, float] = {}
+_encodings_loading = set()
+_encodings_lock = threading.Lock()
+
+
+def load_encoding(model: str):
+    """
+    Load the tiktoken encoding of a model; blocks on a download the first time, so keep it off the event loop
+    Returns: The encoding, or None when tiktoken is missing or the encoding could not be loaded
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Token counting falls back to an estimate for {model}: {e}")
+        with _encodings_lock:
+            _encoding_failed_at[model] = time.monotonic()
+            _encodings_loading.discard(model)
+        return None
+    with _encodings_lock:
+        _encodings[model] = encoding
+        _encodings_loading.discard(model)
+    return encoding
+
+
+def load_encodings(models: Iterable[str]) -> int:
+    """
+    Load the encodings of several models, e.g. during startup warm-up
+    Returns: Number of encodings available
+    """
+    return sum(load_encoding(model) is not None for model in set(models))
+
+
+def _encoding(model: str):
+    """
+    The model's encoding if it is loaded; otherwise start loading it in the background and return None
+    """
+    encoding = _encodings.get(model)
+    if encoding is not None or tiktoken is None:
+        return encoding
+    with _encodings_lock:
+        failed_at = _encoding_failed_at.get(model)
+        if model in _encodings_loading:
+            return None
+        if failed_at is not None and time.monotonic() - failed_at < ENCODING_RETRY_AFTER:
+            return None
+        _encodings_loading.add(model)
+    threading.Thread(target=load_encoding, args=(model,), name="tiktoken-load", daemon=True).start()
+    return None
+
+
+def count_tokens(messages: List[Dict[str, str]], model: str) -> int:
+    """
+    Count the prompt tokens of a chat request locally
+    Uses tiktoken once the model's encoding is loaded and about four characters per token until then
+    """
+    encoding = _encoding(model)
+    total = REPLY_PRIMING_TOKENS
+    for message in messages:
+        content = message.get("content") or ""
+        total += MESSAGE_OVERHEAD_TOKENS
+        total += len(encoding.encode(content)) if encoding else (len(content) + 3) // 4
+    return total
@@ -0,0 +1,192 @@
+import os
+import gzip
+import json
+import shutil
+import asyncio
+import hashlib
+import logging
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from services.storage import Storage, content_key, create_storage
+
+logger = logging.getLogger(__name__)
+
+
+class RangeNotSatisfiableError(Exception):
+    """
+    Raised when a Range header lies entirely outside the file
+    """
+
+
+class OutputCache:
+    """
+    Content-addressed store of filled PDFs, keyed by the template hash and the field values
+    Identical fills share one file and are never regenerated
+    """
+
+    def __init__(self, storage: Optional[Storage] = None):
+        self.storage = storage or create_storage()
+        self.gzip_enabled = os.getenv("OUTPUT_GZIP", "false").lower() == "true"
+        self.chunk_size = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 256 * 1024))
+
+    @staticmethod
+    def fingerprint(template_hash: str, field_values: dict) -> str:
+        """
+        Fingerprint the inputs a filled PDF is built from
+        """
+        payload = json.dumps([template_hash, field_values], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def key_for(fingerprint: str) -> str:
+        return content_key("outputs", fingerprint)
+
+    async def store(self, key: str, local_path: str):
+        """
+        Store a freshly filled output, with its pre-compressed variant when enabled
+        """
+        if self.gzip_enabled:
+            await asyncio.to_thread(self._write_gzip, local_path)
+            await self.storage.put_file(f"{key}.gz", f"{local_path}.gz")
+        await self.storage.put_file(key, local_path)
+
+    @staticmethod
+    def _write_gzip(output_path: str):
+        tmp_path = f"{output_path}.gz.{os.getpid()}.tmp"
+        with open(output_path, "rb") as source, gzip.open(tmp_path, "wb", compresslevel=6) as target:
+            shutil.copyfileobj(source, target)
+        os.replace(tmp_path, f"{output_path}.gz")
+
+    async def serve(
+        self,
+        request: Request,
+        key: str,
+        etag: str,
+        filename: str,
+        media_type: str = "application/pdf",
+        size: Optional[int] = None,
+    ) -> Response:
+        """
+        Serve a stored file with a strong ETag, If-None-Match, single byte ranges and the gzip variant,
+        or redirect to the storage backend when it can serve the file itself
+        """
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": content_disposition(filename),
+            "Cache-Control": "private, no-cache",
+        }
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if if_range is not None and if_range != etag:
+            # The client holds a different version; send the whole current file
+            range_header = None
+
+        # Byte ranges always address the identity encoding
+        if self.gzip_enabled:
+            headers["Vary"] = "Accept-Encoding"
+            if range_header is None and accepts_gzip(request.headers.get("accept-encoding", "")):
+                gzip_object = await self.storage.stat(f"{key}.gz")
+                if gzip_object is not None:
+                    key, size = gzip_object.key, gzip_object.size
+                    etag = f'{etag[:-1]}-gzip"'
+                    headers["Content-Encoding"] = "gzip"
+
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={
+                name: value for name, value in headers.items() if name in ("ETag", "Cache-Control", "Vary")
+            })
+
+        if "Content-Encoding" not in headers:
+            url = await self.storage.download_url(key, headers["Content-Disposition"], media_type)
+            if url is not None:
+                # The storage backend serves the bytes, ranges included; the API only authorizes
+                return RedirectResponse(url, status_code=307, headers={"ETag": etag, "Cache-Control": "private, no-store"})
+
+        if size is None:
+            stored = await self.storage.stat(key)
+            if stored is None:
+                return Response(status_code=404)
+            size = stored.size
+        status_code = 200
+        start, end = 0, size - 1
+        if range_header is not None:
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiableError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        headers["Content-Length"] = str(max(end - start + 1, 0))
+        if request.method == "HEAD":
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+        return StreamingResponse(
+            self.storage.read_range(key, start, end, self.chunk_size),
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+        )
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag, as RFC 9110 requires
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return etag.removeprefix("W/") in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range against a file size
+    Returns: Inclusive (start, end), or None when the header should be ignored
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        # Multiple ranges are rare for downloads; answering with the whole file is allowed
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiableError()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiableError()
+    if start > end:
+        return None
+    return start, min(end, size - 1)
@@ -1,39 +1,398 @@
 import os
+import re
+import time
+import shutil
 import logging
-from typing import Dict
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import fitz  # PyMuPDF
 
-logging.basicConfig(level=logging.INFO)
+from logging_config import duration_ms, log_event
+
 logger = logging.getLogger(__name__)
 
+MIN_FLATTEN_FONT_SIZE = 4
+
+# Flattened outputs render everywhere; interactive outputs can be re-filled incrementally
+FLATTEN_OUTPUT = os.getenv("FLATTEN_OUTPUT", "true").lower() == "true"
+
+# Height of one line of Helvetica per point of font size, as measured by insert_textbox
+_HELV = fitz.Font("helv")
+_SINGLE_LINE_HEIGHT = _HELV.ascender - 2 * _HELV.descender
+
+_XREF_RE = re.compile(r"(\d+)\s+\d+\s+R")
+
+_PDF_ESCAPES = {"n": b"\n", "r": b"\r", "t": b"\t", "b": b"\b", "f": b"\f"}
+
+
+def _decode_pdf_bytes(raw: bytes) -> str:
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="replace")
+    return raw.decode("latin-1")
+
+
+def _parse_pdf_array(text: str) -> List[Any]:
+    """
+    Parse a PDF array of strings such as a choice field's /Opt, with [export display] pairs as tuples
+    """
+    stack: List[List[Any]] = [[]]
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "[":
+            stack.append([])
+        elif char == "]":
+            if len(stack) > 1:
+                items = stack.pop()
+                stack[-1].append(tuple(items) if len(stack) > 1 else items)
+        elif char == "(":
+            # Literal string with escapes and balanced parentheses
+            raw = bytearray()
+            depth = 1
+            i += 1
+            while i < len(text) and depth:
+                char = text[i]
+                if char == "\\" and i + 1 < len(text):
+                    i += 1
+                    escaped = text[i]
+                    if escaped in _PDF_ESCAPES:
+                        raw += _PDF_ESCAPES[escaped]
+                    elif escaped.isdigit():
+                        digits = escaped
+                        while len(digits) < 3 and i + 1 < len(text) and text[i + 1] in "01234567":
+                            i += 1
+                            digits += text[i]
+                        raw.append(int(digits, 8) & 0xFF)
+                    elif escaped not in "\r\n":
+                        raw += escaped.encode("latin-1", errors="replace")
+                else:
+                    if char == "(":
+                        depth += 1
+                    elif char == ")":
+                        depth -= 1
+                    if depth:
+                        raw += char.encode("latin-1", errors="replace")
+                i += 1
+            stack[-1].append(_decode_pdf_bytes(bytes(raw)))
+            continue
+        elif char == "<":
+            end = text.find(">", i)
+            end = len(text) if end < 0 else end
+            digits = "".join(text[i + 1:end].split())
+            if len(digits) % 2:
+                digits += "0"
+            stack[-1].append(_decode_pdf_bytes(bytes.fromhex(digits)))
+            i = end
+        i += 1
+    result = stack[0]
+    return result[0] if len(result) == 1 and isinstance(result[0], list) else result
+
+
+@dataclass(frozen=True)
+class BatchTemplate:
+    """
+    A template read and indexed once, for filling many rows
+    """
+    data: bytes
+    widget_index: Dict[str, List[Dict[str, Any]]]
+    widget_pages: Set[int]
+
+
 class PDFService:
+    def __init__(self, flatten_output: Optional[bool] = None):
+        self.flatten_output = FLATTEN_OUTPUT if flatten_output is None else flatten_output
+        # Seconds spent per stage since the caller last reset it
+        self.stage_timings: Dict[str, float] = {}
+        self.batch_template_cache_size = int(os.getenv("BATCH_TEMPLATE_CACHE_SIZE", 4))
+        self._batch_templates: "OrderedDict[str, BatchTemplate]" = OrderedDict()
+
+    @contextmanager
+    def _stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_timings[name] = self.stage_timings.get(name, 0.0) + time.perf_counter() - start
+
     def extract_form_fields(self, pdf_path: str) -> Dict[str, str]:
         """
         Extract form fields from a PDF
         Returns: Dict mapping field names to field types
         """
+        return self.fields_from_schema(self.extract_field_schema(pdf_path))
+
+    def extract_field_schema(self, pdf_path: str) -> List[Dict[str, Any]]:
+        """
+        Extract the widget schema of a PDF form
+        Reads the AcroForm field tree when present and scans every page only as a fallback
+        Returns: List of widgets with name, type, raw widget type, page index, rect and choice values
+        """
+        start = time.perf_counter()
+        stages_before = dict(self.stage_timings)
         try:
-            doc = fitz.open(pdf_path)
-            fields = {}
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Get form fields (widgets)
-                for widget in page.widgets():
-                    field_name = widget.field_name
-                    field_type = self._get_field_type(widget.field_type)
-                    
-                    if field_name and field_name not in fields:
-                        fields[field_name] = field_type
-            
+            with self._stage("open"):
+                doc = fitz.open(pdf_path)
+            with self._stage("extract"):
+                schema = None
+                source = "acroform"
+                if os.getenv("PDF_FIELD_EXTRACTION", "acroform") == "acroform":
+                    schema = self._schema_from_acroform(doc)
+                if schema is None:
+                    source = "scan"
+                    schema = self._schema_from_pages(doc)
+            log_event(
+                logger, logging.INFO, "pdf.extract",
+                source=source,
+                pages=len(doc),
+                widgets=len(schema),
+                duration_ms=duration_ms(start),
+                stages_ms=lambda: self._stage_delta(stages_before),
+            )
             doc.close()
-            return fields
+            return schema
             
         except Exception as e:
             logger.error(f"Error extracting PDF fields: {str(e)}")
             raise Exception(f"Error extracting PDF fields: {str(e)}")
+
+    def _schema_from_pages(self, doc: "fitz.Document") -> List[Dict[str, Any]]:
+        """
+        Build the widget schema by loading every page and iterating its widgets
+        """
+        schema = []
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            
+            # Get form fields (widgets)
+            for widget in page.widgets():
+                if not widget.field_name:
+                    continue
+                rect = widget.rect
+                schema.append({
+                    "name": widget.field_name,
+                    "type": self._get_field_type(widget.field_type),
+                    "widget_type": widget.field_type,
+                    "page": page_num,
+                    "rect": [rect.x0, rect.y0, rect.x1, rect.y1],
+                    "choice_values": list(widget.choice_values) if widget.choice_values else None,
+                })
+        return schema
+
+    def _schema_from_acroform(self, doc: "fitz.Document") -> Optional[List[Dict[str, Any]]]:
+        """
+        Build the widget schema from the AcroForm /Fields tree through the xref table
+        No page is loaded, so the cost follows the field count rather than the page count
+        Returns: None when the document has no usable field tree
+        """
+        widgets = self._acroform_widgets(doc)
+        if not widgets:
+            return None
+
+        page_numbers = {doc.page_xref(page_num): page_num for page_num in range(len(doc))}
+        annot_positions = {}
+        annot_pages = None
+        page_matrices = {}
+        located = []
+        for xref, name, attributes in widgets:
+            page_type, page_ref = doc.xref_get_key(xref, "P")
+            page_num = page_numbers.get(int(page_ref.split()[0])) if page_type == "xref" else None
+            if page_num is None:
+                # No usable /P entry: find the page through the /Annots arrays of all pages once
+                if annot_pages is None:
+                    annot_pages = {
+                        annot: page_num
+                        for page_xref, page_num in page_numbers.items()
+                        for annot in self._xref_array(doc, page_xref, "Annots")
+                    }
+                page_num = annot_pages.get(xref)
+                if page_num is None:
+                    continue
+
+            if page_num not in annot_positions:
+                annots = self._xref_array(doc, doc.page_xref(page_num), "Annots")
+                annot_positions[page_num] = {annot: position for position, annot in enumerate(annots)}
+            position = annot_positions[page_num].get(xref)
+            if position is None:
+                # Widgets missing from their page's /Annots are never displayed
+                continue
+
+            if page_num not in page_matrices:
+                page_matrices[page_num] = self._page_matrix(doc, doc.page_xref(page_num))
+            rect = self._widget_rect(doc, xref, page_matrices[page_num])
+            if rect is None:
+                continue
+
+            widget_type = self._widget_type_code(attributes.get("FT"), int(attributes.get("Ff", 0) or 0))
+            choice_values = None
+            if widget_type in (fitz.PDF_WIDGET_TYPE_COMBOBOX, fitz.PDF_WIDGET_TYPE_LISTBOX) and "Opt" in attributes:
+                choice_values = _parse_pdf_array(attributes["Opt"]) or None
+            located.append(((page_num, position), {
+                "name": name,
+                "type": self._get_field_type(widget_type),
+                "widget_type": widget_type,
+                "page": page_num,
+                "rect": [rect.x0, rect.y0, rect.x1, rect.y1],
+                "choice_values": choice_values,
+            }))
+
+        if not located:
+            return None
+
+        # Keep the page scan order so question ordering does not depend on the extraction mode
+        located.sort(key=lambda item: item[0])
+        return [widget for _, widget in located]
+
+    def _acroform_widgets(
+        self,
+        doc: "fitz.Document",
+        inherited_keys: Tuple[str, ...] = ("FT", "Ff", "Opt"),
+    ) -> Optional[List[Tuple[int, str, Dict[str, str]]]]:
+        """
+        Walk the AcroForm field tree, carrying qualified names and inheritable attributes down to the widgets
+        Returns: (widget xref, field name, attributes) per widget, or None without a field tree
+        """
+        if not doc.is_pdf:
+            return None
+        fields_type, fields_value = doc.xref_get_key(doc.pdf_catalog(), "AcroForm/Fields")
+        if fields_type == "xref":
+            fields_value = doc.xref_object(int(fields_value.split()[0]), compressed=True)
+        elif fields_type != "array":
+            return None
+
+        widgets = []
+        seen = set()
+        stack = [(int(ref), "", {}) for ref in reversed(_XREF_RE.findall(fields_value))]
+        while stack:
+            xref, parent_name, inherited = stack.pop()
+            if xref in seen:
+                continue
+            seen.add(xref)
+
+            partial_type, partial_name = doc.xref_get_key(xref, "T")
+            name = parent_name
+            if partial_type == "string" and partial_name:
+                name = f"{parent_name}.{partial_name}" if parent_name else partial_name
+
+            attributes = dict(inherited)
+            for key in inherited_keys:
+                value_type, value = doc.xref_get_key(xref, key)
+                if value_type == "xref" and key == "Opt":
+                    value_type, value = "array", doc.xref_object(int(value.split()[0]), compressed=True)
+                if value_type != "null":
+                    attributes[key] = value
+
+            kids = self._xref_array(doc, xref, "Kids")
+            if kids:
+                stack.extend((kid, name, attributes) for kid in reversed(kids))
+            elif name and doc.xref_get_key(xref, "Subtype")[1] == "/Widget":
+                widgets.append((xref, name, attributes))
+        return widgets
+
+    @staticmethod
+    def _xref_array(doc: "fitz.Document", xref: int, key: str) -> List[int]:
+        """
+        Read an array of indirect references, following an indirect array object
+        """
+        value_type, value = doc.xref_get_key(xref, key)
+        if value_type == "xref":
+            value = doc.xref_object(int(value.split()[0]), compressed=True)
+        elif value_type != "array":
+            return []
+        return [int(ref) for ref in _XREF_RE.findall(value)]
+
+    @staticmethod
+    def _inherited_page_key(doc: "fitz.Document", page_xref: int, key: str):
+        """
+        Read an inheritable page attribute, walking up the page tree when the page does not set it
+        """
+        xref = page_xref
+        for _ in range(32):
+            value = doc.xref_get_key(xref, key)
+            if value[0] != "null":
+                return value
+            parent_type, parent_value = doc.xref_get_key(xref, "Parent")
+            if parent_type != "xref":
+                break
+            xref = int(parent_value.split()[0])
+        return ("null", "null")
+
+    def _page_box(self, doc: "fitz.Document", page_xref: int, key: str) -> Optional["fitz.Rect"]:
+        box_type, box_value = self._inherited_page_key(doc, page_xref, key)
+        if box_type != "array":
+            return None
+        coords = [float(value) for value in box_value.strip("[]").split()]
+        return fitz.Rect(coords).normalize() if len(coords) == 4 else None
+
+    def _page_matrix(self, doc: "fitz.Document", page_xref: int) -> "fitz.Matrix":
+        """
+        Compute page.transformation_matrix from the page dictionary without loading the page
+        """
+        mediabox = self._page_box(doc, page_xref, "MediaBox") or fitz.paper_rect("letter")
+        cropbox = self._page_box(doc, page_xref, "CropBox")
+        box = fitz.Rect(mediabox) & cropbox if cropbox else mediabox
+        if box.is_empty:
+            box = mediabox
+
+        rotation_type, rotation = self._inherited_page_key(doc, page_xref, "Rotate")
+        if rotation_type == "int" and int(rotation) % 360:
+            return fitz.Matrix(1, 0, 0, -1, 0, box.height)
+        return fitz.Matrix(1, 0, 0, -1, -box.x0, box.y1)
+
+    @staticmethod
+    def _widget_rect(doc: "fitz.Document", xref: int, matrix: "fitz.Matrix") -> Optional["fitz.Rect"]:
+        """
+        Convert a widget's /Rect from PDF space to page coordinates, as page.widgets() reports it
+        """
+        rect_type, rect_value = doc.xref_get_key(xref, "Rect")
+        if rect_type != "array":
+            return None
+        coords = [float(value) for value in rect_value.strip("[]").split()]
+        if len(coords) != 4:
+            return None
+        return (fitz.Rect(coords) * matrix).normalize()
+
+    @staticmethod
+    def _widget_type_code(field_type: Optional[str], flags: int) -> int:
+        """
+        Map a field's /FT and /Ff to PyMuPDF's widget type codes
+        """
+        if field_type == "/Tx":
+            return fitz.PDF_WIDGET_TYPE_TEXT
+        if field_type == "/Ch":
+            return fitz.PDF_WIDGET_TYPE_COMBOBOX if flags & (1 << 17) else fitz.PDF_WIDGET_TYPE_LISTBOX
+        if field_type == "/Btn":
+            if flags & (1 << 16):
+                return fitz.PDF_WIDGET_TYPE_BUTTON
+            if flags & (1 << 15):
+                return fitz.PDF_WIDGET_TYPE_RADIOBUTTON
+            return fitz.PDF_WIDGET_TYPE_CHECKBOX
+        if field_type == "/Sig":
+            return fitz.PDF_WIDGET_TYPE_SIGNATURE
+        return fitz.PDF_WIDGET_TYPE_UNKNOWN
+
+    @staticmethod
+    def fields_from_schema(schema: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Collapse a widget schema into a mapping of field names to field types
+        """
+        fields = {}
+        for widget in schema:
+            if widget["name"] not in fields:
+                fields[widget["name"]] = widget["type"]
+        return fields
+    
+    @staticmethod
+    def index_widgets(schema: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Index a widget schema by field name; each widget carries its page number
+        """
+        index = defaultdict(list)
+        for widget in schema:
+            index[widget["name"]].append(widget)
+        return index
     
     def _get_field_type(self, widget_type: int) -> str:
         """
@@ -50,110 +409,377 @@ class PDFService:
         }
         return type_mapping.get(widget_type, "text")
     
-    def fill_pdf_form(self, input_path: str, field_values: Dict[str, str], session_id: str) -> str:
+    def fill_pdf_form(
+        self,
+        input_path: str,
+        field_values: Dict[str, str],
+        session_id: str,
+        field_schema: Optional[List[Dict[str, Any]]] = None,
+        output_path: Optional[str] = None,
+        base_path: Optional[str] = None,
+    ) -> str:
         """
         Fill PDF form with provided values and flatten the result for universal visibility
+        With FLATTEN_OUTPUT=false the form stays interactive, and given the previous output as
+        base_path only the changed widgets are rewritten in an incremental update
         Returns: Path to the filled PDF
         """
+        start = time.perf_counter()
+        stages_before = dict(self.stage_timings)
         try:
-            doc = fitz.open(input_path)
-            logger.info(f"Filling PDF: {input_path}")
-            logger.info(f"Field values to set: {field_values}")
-            
-            # First pass: Fill all the form fields
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                widgets = list(page.widgets())  # Convert generator to list
-                logger.info(f"Page {page_num} widgets: {[w.field_name for w in widgets]}")
-                
-                for widget in widgets:
-                    field_name = widget.field_name
-                    logger.info(f"Widget: {field_name}, type: {widget.field_type}, value to set: {field_values.get(field_name)}")
-                    if field_name in field_values:
-                        value = field_values[field_name]
-                        # Set field value based on type
-                        if widget.field_type in [1, 7]:  # Text field (both old and new type codes)
-                            widget.field_value = value
-                            widget.update()
-                        elif widget.field_type in [3]:  # Combobox (can be checkbox-like)
-                            # Check if it's actually a checkbox by examining existing value
-                            if hasattr(widget, 'choice_values') and widget.choice_values:
-                                # It's a dropdown/combobox
-                                widget.field_value = value
-                            else:
-                                # Treat as checkbox
-                                is_checked = value.lower() in ["yes", "true", "1", "on", "checked"]
-                                widget.field_value = is_checked
-                            widget.update()
-                        elif widget.field_type in [2]:  # Radio button
-                            widget.field_value = value
-                            widget.update()
-                        elif widget.field_type in [4]:  # Listbox
-                            widget.field_value = value
-                            widget.update()
-                        logger.info(f"Set value for {field_name}: {value}")
-                    else:
-                        logger.info(f"No value to set for {field_name}")
-
-            # Second pass: Flatten the form by drawing text over fields and removing form interactivity
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                widgets_to_process = list(page.widgets())  # Get current widgets
-                
-                for widget in widgets_to_process:
-                    field_name = widget.field_name
-                    value = field_values.get(field_name)
-                    if value:
-                        rect = widget.rect
-                        logger.info(f"Flattening {field_name} at {rect}")
-                        
-                        # Draw text/symbols over the field area
-                        if widget.field_type in [1, 7]:  # Text field
-                            # Create a slightly smaller rect to avoid overlapping borders
-                            text_rect = fitz.Rect(rect.x0 + 2, rect.y0 + 1, rect.x1 - 2, rect.y1 - 1)
-                            page.insert_textbox(text_rect, str(value), fontsize=10, color=(0, 0, 0))
-                        elif widget.field_type in [3]:  # Combobox/Checkbox
-                            if hasattr(widget, 'choice_values') and widget.choice_values:
-                                # It's a dropdown - show the selected value
-                                text_rect = fitz.Rect(rect.x0 + 2, rect.y0 + 1, rect.x1 - 2, rect.y1 - 1)
-                                page.insert_textbox(text_rect, str(value), fontsize=10, color=(0, 0, 0))
-                            else:
-                                # It's a checkbox - show checkmark if checked
-                                if value.lower() in ["yes", "true", "1", "on", "checked"]:
-                                    page.insert_textbox(rect, "✓", fontsize=12, color=(0, 0, 0), align=1)
-                        elif widget.field_type in [2]:  # Radio button
-                            if str(value).lower() not in ["no", "false", "0", "off", ""]:
-                                # Draw a filled circle or dot for selected radio button
-                                center_x = (rect.x0 + rect.x1) / 2
-                                center_y = (rect.y0 + rect.y1) / 2
-                                radius = min(rect.width, rect.height) / 4
-                                page.draw_circle(fitz.Point(center_x, center_y), radius, color=(0, 0, 0), fill=(0, 0, 0))
-                        elif widget.field_type in [4]:  # Listbox
-                            text_rect = fitz.Rect(rect.x0 + 2, rect.y0 + 1, rect.x1 - 2, rect.y1 - 1)
-                            page.insert_textbox(text_rect, str(value), fontsize=10, color=(0, 0, 0))
-
-            # Remove all form fields to flatten the document
-            # This needs to be done after drawing the content
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                # Remove widgets by clearing the page's form fields
-                page.clean_contents()  # Clean up any redundant content
-                # Note: In PyMuPDF 1.23+, we need to remove annotations that represent form fields
-                annots_to_remove = []
-                for annot in page.annots():
-                    if annot.type[0] == 2:  # Widget annotation (form field)
-                        annots_to_remove.append(annot)
-                
-                for annot in annots_to_remove:
-                    page.delete_annot(annot)
-
-            # Save filled and flattened PDF
-            upload_dir = os.getenv("UPLOAD_DIR", "uploads")
-            output_path = os.path.join(upload_dir, f"{session_id}_filled.pdf")
-            doc.save(output_path, incremental=False, deflate=True)
-            doc.close()
-            logger.info(f"Filled and flattened PDF saved to: {output_path}")
+            if field_schema is None:
+                field_schema = self.extract_field_schema(input_path)
+
+            values_by_page = self._values_by_page(self.index_widgets(field_schema), field_values)
+
+            if output_path is None:
+                upload_dir = os.getenv("UPLOAD_DIR", "uploads")
+                output_path = os.path.join(upload_dir, f"{session_id}_filled.pdf")
+            # Write beside the target and swap it in so readers never see a partial file
+            tmp_path = f"{output_path}.{os.getpid()}.tmp"
+
+            if not self.flatten_output and base_path and os.path.exists(base_path):
+                updated = self._refill_incremental(base_path, values_by_page, tmp_path)
+                if updated is not None:
+                    os.replace(tmp_path, output_path)
+                    self._log_fill(
+                        "incremental", session_id, field_values, values_by_page, updated, start, stages_before
+                    )
+                    return output_path
+
+            with self._stage("open"):
+                doc = fitz.open(input_path)
+            self._fill_document(doc, values_by_page, {widget["page"] for widget in field_schema})
+
+            with self._stage("save"):
+                doc.save(tmp_path, garbage=1, deflate=True)
+                doc.close()
+                os.replace(tmp_path, output_path)
+            self._log_fill(
+                "flatten" if self.flatten_output else "interactive",
+                session_id,
+                field_values,
+                values_by_page,
+                sum(len(values) for values in values_by_page.values()),
+                start,
+                stages_before,
+            )
             return output_path
         except Exception as e:
-            logger.error(f"Error filling PDF: {str(e)}")
+            log_event(logger, logging.ERROR, "pdf.fill_failed", session_id=session_id, error=str(e))
             raise Exception(f"Error filling PDF: {str(e)}")
+
+    def fill_batch(
+        self,
+        template_path: str,
+        field_schema: List[Dict[str, Any]],
+        rows: List[Tuple[int, Dict[str, str]]],
+        output_dir: str,
+    ) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        """
+        Fill one template with many rows of values; the template is read and indexed once per process
+        and every row is parsed from the in-memory copy, since a filled document cannot be reset
+        Returns: (row index, output path, error) per row, with either the path or the error set
+        """
+        start = time.perf_counter()
+        stages_before = dict(self.stage_timings)
+        template = self._batch_template(template_path, field_schema)
+        results = []
+        for index, field_values in rows:
+            output_path = os.path.join(output_dir, f"{index}.pdf")
+            try:
+                with self._stage("open"):
+                    doc = fitz.open("pdf", template.data)
+                try:
+                    values_by_page = self._values_by_page(template.widget_index, field_values)
+                    self._fill_document(doc, values_by_page, template.widget_pages)
+                    with self._stage("save"):
+                        doc.save(output_path, garbage=1, deflate=True)
+                finally:
+                    doc.close()
+            except Exception as e:
+                results.append((index, None, str(e)))
+                continue
+            results.append((index, output_path, None))
+
+        log_event(
+            logger, logging.INFO, "pdf.batch_fill",
+            mode="flatten" if self.flatten_output else "interactive",
+            rows=len(rows),
+            failed=sum(1 for _, path, _ in results if path is None),
+            duration_ms=duration_ms(start),
+            stages_ms=lambda: self._stage_delta(stages_before),
+        )
+        return results
+
+    def _batch_template(self, template_path: str, field_schema: List[Dict[str, Any]]) -> BatchTemplate:
+        # Template paths are content-addressed, so a cached entry never goes stale
+        template = self._batch_templates.get(template_path)
+        if template is None:
+            with self._stage("read"):
+                with open(template_path, "rb") as source:
+                    data = source.read()
+            template = BatchTemplate(
+                data, self.index_widgets(field_schema), {widget["page"] for widget in field_schema}
+            )
+            self._batch_templates[template_path] = template
+            while len(self._batch_templates) > self.batch_template_cache_size:
+                self._batch_templates.popitem(last=False)
+        self._batch_templates.move_to_end(template_path)
+        return template
+
+    @staticmethod
+    def _values_by_page(
+        widget_index: Dict[str, List[Dict[str, Any]]],
+        field_values: Dict[str, str],
+    ) -> Dict[int, List[Tuple[Dict[str, Any], str]]]:
+        """
+        Jump from each answered field straight to its widgets and group them by page
+        """
+        values_by_page = defaultdict(list)
+        for field_name, value in field_values.items():
+            if not value:
+                continue
+            for widget in widget_index.get(field_name, ()):
+                values_by_page[widget["page"]].append((widget, value))
+        return values_by_page
+
+    def _fill_document(
+        self,
+        doc: "fitz.Document",
+        values_by_page: Dict[int, List[Tuple[Dict[str, Any], str]]],
+        widget_pages: Iterable[int],
+    ):
+        if self.flatten_output:
+            self._flatten_values(doc, values_by_page, widget_pages)
+        else:
+            with self._stage("fill"):
+                self._set_widget_values(doc, values_by_page)
+
+    def _stage_delta(self, before: Dict[str, float]) -> Dict[str, float]:
+        return {
+            name: round((seconds - before.get(name, 0.0)) * 1000, 2)
+            for name, seconds in self.stage_timings.items()
+            if seconds != before.get(name)
+        }
+
+    def _log_fill(
+        self,
+        mode: str,
+        session_id: str,
+        field_values: Dict[str, str],
+        values_by_page: Dict[int, List[Tuple[Dict[str, Any], str]]],
+        widgets: int,
+        start: float,
+        stages_before: Dict[str, float],
+    ):
+        """
+        One summary event per fill with counts and stage durations; values are never logged
+        """
+        log_event(
+            logger, logging.INFO, "pdf.fill",
+            session_id=session_id,
+            mode=mode,
+            values=len(field_values),
+            pages=len(values_by_page),
+            widgets=widgets,
+            duration_ms=duration_ms(start),
+            stages_ms=lambda: self._stage_delta(stages_before),
+        )
+
+    def _flatten_values(
+        self,
+        doc: "fitz.Document",
+        values_by_page: Dict[int, List[Tuple[Dict[str, Any], str]]],
+        widget_pages: Iterable[int],
+    ):
+        """
+        Draw every value as page content and remove the form
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        # Draw every value on a page with a single content stream insertion
+        with self._stage("fill"):
+            for page_num in sorted(values_by_page):
+                page = doc[page_num]
+                shape = page.new_shape()
+                for widget, value in values_by_page[page_num]:
+                    if debug:
+                        log_event(
+                            logger, logging.DEBUG, "pdf.flatten_widget",
+                            field=widget["name"], rect=widget["rect"], page=page_num,
+                        )
+                    self._draw_widget_value(shape, widget, value)
+                shape.commit()
+
+        # Remove form interactivity from every page that carries widgets
+        with self._stage("flatten"):
+            self._remove_widgets(doc, widget_pages)
+
+    def _set_widget_values(
+        self,
+        doc: "fitz.Document",
+        values_by_page: Dict[int, List[Tuple[Dict[str, Any], str]]],
+        only_changed: bool = False,
+    ) -> int:
+        """
+        Set field values on the widgets of the given pages, keeping the form interactive
+        Returns: Number of widgets updated
+        """
+        updated = 0
+        for page_num in sorted(values_by_page):
+            page_values = {widget["name"]: value for widget, value in values_by_page[page_num]}
+            page = doc[page_num]
+            for widget in list(page.widgets()):
+                if widget.field_name not in page_values:
+                    continue
+                field_value = self._widget_field_value(widget, page_values[widget.field_name])
+                if only_changed and self._same_field_value(widget.field_value, field_value):
+                    continue
+                widget.field_value = field_value
+                widget.update()
+                updated += 1
+        return updated
+
+    def _refill_incremental(
+        self,
+        base_path: str,
+        values_by_page: Dict[int, List[Tuple[Dict[str, Any], str]]],
+        tmp_path: str,
+    ) -> Optional[int]:
+        """
+        Copy a previous interactive output and append an incremental update for the changed widgets
+        Returns: Number of widgets updated, or None when the base is not an interactive form and a full fill is needed
+        """
+        with self._stage("open"):
+            shutil.copyfile(base_path, tmp_path)
+            doc = fitz.open(tmp_path)
+        try:
+            if not doc.is_form_pdf or doc.needs_pass:
+                os.remove(tmp_path)
+                return None
+            base_size = os.path.getsize(tmp_path)
+            with self._stage("compare"):
+                changed = self._changed_values(doc, values_by_page)
+            with self._stage("fill"):
+                updated = self._set_widget_values(doc, changed, only_changed=True)
+            if updated:
+                with self._stage("save"):
+                    doc.save(tmp_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            log_event(
+                logger, logging.DEBUG, "pdf.incremental_update",
+                widgets=updated, appended_bytes=os.path.getsize(tmp_path) - base_size,
+            )
+            return updated
+        finally:
+            doc.close()
+
+    def _changed_values(
+        self,
+        doc: "fitz.Document",
+        values_by_page: Dict[int, List[Tuple[Dict[str, Any], str]]],
+    ) -> Dict[int, List[Tuple[Dict[str, Any], str]]]:
+        """
+        Compare the wanted values with the field tree of a filled form, so only pages with edits are loaded
+        """
+        widgets = self._acroform_widgets(doc, inherited_keys=("FT", "V"))
+        if not widgets:
+            return values_by_page
+        current = defaultdict(list)
+        for xref, name, attributes in widgets:
+            current[name].append((xref, attributes))
+
+        changed = defaultdict(list)
+        for page_num, items in values_by_page.items():
+            for widget, value in items:
+                held = current.get(widget["name"])
+                if not held or not all(self._holds_value(doc, xref, attributes, value) for xref, attributes in held):
+                    changed[page_num].append((widget, value))
+        return changed
+
+    @staticmethod
+    def _holds_value(doc: "fitz.Document", xref: int, attributes: Dict[str, str], value: str) -> bool:
+        if attributes.get("FT") == "/Btn":
+            # A button's appearance state is its on-state name or /Off
+            checked = doc.xref_get_key(xref, "AS")[1] not in ("null", "/Off")
+            return checked == (str(value).lower() not in ["no", "false", "0", "off", ""])
+        return attributes.get("V") == str(value)
+
+    @staticmethod
+    def _widget_field_value(widget: "fitz.Widget", value: str):
+        """
+        Convert an answer to the value PyMuPDF expects for the widget's type
+        """
+        if widget.field_type in (fitz.PDF_WIDGET_TYPE_CHECKBOX, fitz.PDF_WIDGET_TYPE_RADIOBUTTON):
+            checked = str(value).lower() not in ["no", "false", "0", "off", ""]
+            return widget.on_state() if checked else "Off"
+        return str(value)
+
+    @staticmethod
+    def _same_field_value(current: Any, target: Any) -> bool:
+        if isinstance(current, bool):
+            current = "Off" if not current else current
+        return str(current) == str(target)
+
+    def _draw_widget_value(self, shape: "fitz.Shape", widget: Dict[str, Any], value: str):
+        """
+        Draw text/symbols over a field area
+        """
+        rect = fitz.Rect(widget["rect"])
+        widget_type = widget["widget_type"]
+        # Create a slightly smaller rect to avoid overlapping borders
+        text_rect = fitz.Rect(rect.x0 + 2, rect.y0 + 1, rect.x1 - 2, rect.y1 - 1)
+
+        if widget_type in [1, 7, 4]:  # Text field (old and new type codes) and listbox
+            self._insert_fitting_text(shape, text_rect, str(value), fontsize=10)
+        elif widget_type in [3]:  # Combobox (can be checkbox-like)
+            if widget.get("choice_values"):
+                # It's a dropdown - show the selected value
+                self._insert_fitting_text(shape, text_rect, str(value), fontsize=10)
+            elif value.lower() in ["yes", "true", "1", "on", "checked"]:
+                # It's a checkbox - show checkmark if checked
+                self._insert_fitting_text(shape, rect, "✓", fontsize=12, align=1)
+        elif widget_type in [2]:  # Radio button
+            if str(value).lower() not in ["no", "false", "0", "off", ""]:
+                # Draw a filled dot for the selected button
+                radius = min(rect.width, rect.height) / 4
+                shape.draw_circle(fitz.Point((rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2), radius)
+                shape.finish(color=(0, 0, 0), fill=(0, 0, 0))
+
+    @staticmethod
+    def _insert_fitting_text(shape: "fitz.Shape", rect: "fitz.Rect", text: str, fontsize: float, align: int = 0):
+        """
+        Insert text into a rect, shrinking the font until it fits instead of silently dropping it
+        """
+        # Start from the largest size at which a single line fits the rect height
+        fontsize = max(MIN_FLATTEN_FONT_SIZE, min(fontsize, rect.height / _SINGLE_LINE_HEIGHT))
+        for _ in range(4):
+            deficit = shape.insert_textbox(rect, text, fontsize=fontsize, color=(0, 0, 0), align=align)
+            if deficit >= 0 or fontsize <= MIN_FLATTEN_FONT_SIZE:
+                return
+            # Text height scales linearly with the font size; leave slack for rounding
+            fontsize = max(MIN_FLATTEN_FONT_SIZE, fontsize * rect.height / (rect.height - deficit) * 0.99)
+
+    def _remove_widgets(self, doc: "fitz.Document", pages: Iterable[int]):
+        """
+        Drop widget annotations and the AcroForm through the xref table, keeping other annotations
+        """
+        for page_num in pages:
+            page_xref = doc.page_xref(page_num)
+            annots_type, annots_value = doc.xref_get_key(page_xref, "Annots")
+            if annots_type == "xref":
+                # The annotation array is an indirect object
+                annots_value = doc.xref_object(int(annots_value.split()[0]), compressed=True)
+            elif annots_type != "array":
+                continue
+
+            kept = [
+                xref for xref in (int(ref) for ref in _XREF_RE.findall(annots_value))
+                if doc.xref_get_key(xref, "Subtype")[1] != "/Widget"
+            ]
+            if kept:
+                doc.xref_set_key(page_xref, "Annots", "[" + " ".join(f"{xref} 0 R" for xref in kept) + "]")
+            else:
+                doc.xref_set_key(page_xref, "Annots", "null")
+
+        doc.xref_set_key(doc.pdf_catalog(), "AcroForm", "null")
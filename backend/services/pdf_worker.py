@@ -0,0 +1,296 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from logging_config import clear_request_context, configure_logging, log_event
+from metrics import PDF_JOB_SECONDS, PDF_JOBS_REJECTED, PDF_STAGE_SECONDS, PDF_WORKER_PENDING
+from services.pdf_service import PDFService
+
+logger = logging.getLogger(__name__)
+
+# How often a queued job checks whether a worker has picked it up
+START_POLL_INTERVAL = 0.05
+
+# Per-process PDFService instance, created by the pool initializer
+_worker_pdf_service: Optional[PDFService] = None
+# Shared with the parent: when each job slot's current job started running, 0 while it is queued
+_job_started = None
+
+
+def _init_worker(job_started):
+    global _worker_pdf_service, _job_started
+    # Forked workers inherit the handler and the context of the request that started the pool
+    configure_logging()
+    clear_request_context()
+    _worker_pdf_service = PDFService()
+    _job_started = job_started
+
+
+def _run_job(slot: int, fn, *args):
+    # time.monotonic() is system-wide, so the parent can compare it with its own clock
+    _job_started[slot] = time.monotonic()
+    return fn(*args)
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+def _timed(method, *args) -> Tuple[Any, Dict[str, float]]:
+    """
+    Run a PDFService method and return its result with the stage timings it recorded
+    Metrics live in the parent process, so the timings travel back with the result
+    """
+    _worker_pdf_service.stage_timings = {}
+    return method(*args), _worker_pdf_service.stage_timings
+
+
+def _extract_form_fields(pdf_path: str) -> Tuple[Dict[str, str], Dict[str, float]]:
+    return _timed(_worker_pdf_service.extract_form_fields, pdf_path)
+
+
+def _extract_field_schema(pdf_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    return _timed(_worker_pdf_service.extract_field_schema, pdf_path)
+
+
+def _fill_pdf_form(
+    input_path: str,
+    field_values: Dict[str, str],
+    session_id: str,
+    field_schema: Optional[List[Dict[str, Any]]],
+    output_path: Optional[str],
+    base_path: Optional[str],
+) -> Tuple[str, Dict[str, float]]:
+    return _timed(
+        _worker_pdf_service.fill_pdf_form, input_path, field_values, session_id, field_schema, output_path, base_path
+    )
+
+
+def _fill_batch(
+    template_path: str,
+    field_schema: List[Dict[str, Any]],
+    rows: List[Tuple[int, Dict[str, str]]],
+    output_dir: str,
+) -> Tuple[List[Tuple[int, Optional[str], Optional[str]]], Dict[str, float]]:
+    return _timed(_worker_pdf_service.fill_batch, template_path, field_schema, rows, output_dir)
+
+
+class PDFWorkerBusyError(Exception):
+    """
+    Raised when the PDF worker queue is full
+    """
+    def __init__(self, retry_after: int):
+        super().__init__("PDF worker queue is full")
+        self.retry_after = retry_after
+
+
+class PDFWorkerTimeoutError(Exception):
+    """
+    Raised when a PDF job exceeds its timeout
+    """
+
+
+class PDFWorkerPool:
+    """
+    Runs PyMuPDF work in a bounded process pool so the event loop only does I/O
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        job_timeout: Optional[float] = None,
+    ):
+        self.max_workers = max_workers or int(os.getenv("PDF_WORKER_PROCESSES", os.cpu_count() or 1))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv("PDF_WORKER_QUEUE_SIZE", 16))
+        self.job_timeout = job_timeout or float(os.getenv("PDF_WORKER_JOB_TIMEOUT", 120))
+        self.retry_after = int(os.getenv("PDF_WORKER_RETRY_AFTER", 5))
+        # A job that has not reached a worker by then is given up as busy, without touching the pool
+        self.queue_timeout = float(os.getenv("PDF_WORKER_QUEUE_TIMEOUT", self.job_timeout))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        # The job timeout counts from when a worker starts a job, not from when it was queued
+        self._free_slots = list(range(self.max_workers + self.queue_size))
+        self._job_started = multiprocessing.RawArray("d", len(self._free_slots))
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of jobs running or waiting for a worker
+        """
+        return self._pending
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self._job_started,),
+            )
+            logger.info(f"PDF worker pool started with {self.max_workers} processes")
+
+    async def warm(self) -> int:
+        """
+        Start the pool and wait until its processes are up with PyMuPDF loaded, so the first upload does not pay for it
+        Returns: Number of worker processes that answered
+        """
+        self.start()
+        pids = await asyncio.gather(*(
+            asyncio.wrap_future(self._executor.submit(_warm)) for _ in range(self.max_workers)
+        ))
+        return len(set(pids))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _release(self, slot: int, _future=None):
+        with self._lock:
+            self._pending -= 1
+            self._free_slots.append(slot)
+            PDF_WORKER_PENDING.dec()
+
+    def _recycle(self, executor: ProcessPoolExecutor, reason: str):
+        """
+        Replace a pool that has a hung or dead worker; the next job starts a fresh one
+        Jobs still running in the old pool fail, which frees their slots
+        """
+        if self._executor is not executor:
+            # Another job already replaced it
+            return
+        self._executor = None
+        # shutdown() forgets the processes, so collect them first
+        processes = list((executor._processes or {}).values())
+        # Queued jobs are not cancelled: they fail as broken along with the running ones and get resubmitted
+        executor.shutdown(wait=False)
+        for process in processes:
+            process.terminate()
+        log_event(logger, logging.WARNING, "pdf_worker.recycled", reason=reason, processes=len(processes))
+
+    async def submit(self, fn, *args):
+        """
+        Run fn(*args) in the pool, rejecting the job when the queue is full
+        fn returns its result with stage timings, which are recorded here
+        A job whose pool was recycled because of another job is resubmitted once
+        """
+        return await self._submit(fn, args, resubmit=True)
+
+    async def _submit(self, fn, args: Tuple[Any, ...], resubmit: bool):
+        self.start()
+        operation = fn.__name__.lstrip("_")
+        with self._lock:
+            # A job keeps its slot until its process finishes or is terminated
+            if self._pending >= self.max_workers + self.queue_size:
+                PDF_JOBS_REJECTED.labels("busy").inc()
+                raise PDFWorkerBusyError(self.retry_after)
+            self._pending += 1
+            slot = self._free_slots.pop()
+            PDF_WORKER_PENDING.inc()
+        self._job_started[slot] = 0
+
+        executor = self._executor
+        try:
+            future = executor.submit(_run_job, slot, fn, *args)
+        except BrokenProcessPool:
+            self._release(slot)
+            self._recycle(executor, "broken")
+            raise
+        except Exception:
+            self._release(slot)
+            raise
+        future.add_done_callback(partial(self._release, slot))
+
+        start = time.perf_counter()
+        waiter = asyncio.wrap_future(future)
+        recycled = False
+        try:
+            result, stage_timings = await self._wait(waiter, future, slot, operation, executor)
+        except BrokenProcessPool:
+            if self._executor is executor:
+                # A worker process died
+                self._recycle(executor, "broken")
+                raise
+            if not resubmit:
+                raise
+            # Another job's timeout recycled the pool under this one
+            recycled = True
+        finally:
+            if not waiter.done():
+                # The caller went away; a job still in the queue gives its slot back
+                waiter.cancel()
+            PDF_JOB_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+        if recycled:
+            return await self._submit(fn, args, resubmit=False)
+        for stage, seconds in stage_timings.items():
+            PDF_STAGE_SECONDS.labels(operation, stage).observe(seconds)
+        return result
+
+    async def _wait(self, waiter: asyncio.Future, future, slot: int, operation: str, executor: ProcessPoolExecutor):
+        """
+        Wait for a job, timing it out job_timeout after a worker started it
+        A job still queued after queue_timeout is withdrawn and reported as busy; a running one that overruns
+        gets its pool recycled, as a stuck process is only freed by terminating it
+        """
+        queued_until = time.monotonic() + self.queue_timeout
+        while True:
+            started_at = self._job_started[slot]
+            if started_at:
+                wait = started_at + self.job_timeout - time.monotonic()
+            else:
+                wait = min(START_POLL_INTERVAL, queued_until - time.monotonic())
+            done, _ = await asyncio.wait({waiter}, timeout=max(wait, 0))
+            if done:
+                return waiter.result()
+
+            now = time.monotonic()
+            if started_at and now >= started_at + self.job_timeout:
+                PDF_JOBS_REJECTED.labels("timeout").inc()
+                log_event(logger, logging.ERROR, "pdf_worker.timeout", operation=operation, timeout_s=self.job_timeout)
+                self._recycle(executor, "timeout")
+                raise PDFWorkerTimeoutError(f"PDF processing timed out after {self.job_timeout:g}s")
+            # cancel() fails once the job is handed to a worker; its start time shows up on the next pass
+            if not started_at and now >= queued_until and future.cancel():
+                PDF_JOBS_REJECTED.labels("queue_timeout").inc()
+                log_event(
+                    logger, logging.WARNING, "pdf_worker.queue_timeout",
+                    operation=operation, queue_timeout_s=self.queue_timeout,
+                )
+                raise PDFWorkerBusyError(self.retry_after)
+
+    async def extract_form_fields(self, pdf_path: str) -> Dict[str, str]:
+        return await self.submit(_extract_form_fields, pdf_path)
+
+    async def extract_field_schema(self, pdf_path: str) -> List[Dict[str, Any]]:
+        return await self.submit(_extract_field_schema, pdf_path)
+
+    async def fill_pdf_form(
+        self,
+        input_path: str,
+        field_values: Dict[str, str],
+        session_id: str,
+        field_schema: Optional[List[Dict[str, Any]]] = None,
+        output_path: Optional[str] = None,
+        base_path: Optional[str] = None,
+    ) -> str:
+        return await self.submit(
+            _fill_pdf_form, input_path, field_values, session_id, field_schema, output_path, base_path
+        )
+
+    async def fill_batch(
+        self,
+        template_path: str,
+        field_schema: List[Dict[str, Any]],
+        rows: List[Tuple[int, Dict[str, str]]],
+        output_dir: str,
+    ) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        return await self.submit(_fill_batch, template_path, field_schema, rows, output_dir)
@@ -0,0 +1,165 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from metrics import CACHE_LOOKUPS
+from models import QuestionCacheEntry
+from services.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionCache:
+    """
+    Cache of generated questions: an in-memory TTL/LRU in front of an optional cache shared
+    between worker processes, in front of a database table
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        shared: Optional[SharedCache] = None,
+    ):
+        self.session_factory = session_factory
+        self.max_entries = max_entries or int(os.getenv("QUESTION_CACHE_SIZE", 4096))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("QUESTION_CACHE_TTL", 3600))
+        self.shared = shared
+        self.shared_ttl_seconds = float(os.getenv("SHARED_CACHE_TTL", 86400))
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(field_name: str, field_type: str, prompt_version: str) -> str:
+        identity = f"{prompt_version}\x00{field_type}\x00{field_name}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, question: str):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl_seconds, question)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, question = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self.memory_hits += 1
+            CACHE_LOOKUPS.labels("question", "memory_hit").inc()
+            return question
+
+    async def get(self, field_name: str, field_type: str, prompt_version: str) -> Optional[str]:
+        """
+        Return the cached question for a field, or None on a miss
+        """
+        key = self.make_key(field_name, field_type, prompt_version)
+        question = self._get_memory(key)
+        if question is not None:
+            return question
+
+        if self.shared is not None:
+            question = await self.shared.get("question:" + key)
+            if question is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                CACHE_LOOKUPS.labels("question", f"{self.shared.name}_hit").inc()
+                self._remember(key, question)
+                return question
+
+        try:
+            async with self.session_factory() as db:
+                entry = await db.scalar(select(QuestionCacheEntry).where(QuestionCacheEntry.cache_key == key))
+        except Exception as e:
+            logger.error(f"Error reading question cache: {e}")
+            entry = None
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            CACHE_LOOKUPS.labels("question", "miss").inc()
+            return None
+
+        with self._lock:
+            self.db_hits += 1
+        CACHE_LOOKUPS.labels("question", "db_hit").inc()
+        self._remember(key, entry.question)
+        if self.shared is not None:
+            await self.shared.set("question:" + key, entry.question, self.shared_ttl_seconds)
+        return entry.question
+
+    async def set(self, field_name: str, field_type: str, prompt_version: str, question: str):
+        """
+        Store a generated question in every tier
+        """
+        key = self.make_key(field_name, field_type, prompt_version)
+        self._remember(key, question)
+        if self.shared is not None:
+            await self.shared.set("question:" + key, question, self.shared_ttl_seconds)
+
+        try:
+            async with self.session_factory() as db:
+                db.add(QuestionCacheEntry(
+                    cache_key=key,
+                    field_name=field_name,
+                    field_type=field_type,
+                    prompt_version=prompt_version,
+                    question=question,
+                ))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Another request cached the same field first
+                    await db.rollback()
+        except Exception as e:
+            logger.error(f"Error writing question cache: {e}")
+
+    async def warm(self, prompt_version: str, limit: Optional[int] = None) -> int:
+        """
+        Load the most recently cached questions of the current prompt version into memory
+        Returns: Number of questions loaded
+        """
+        limit = limit if limit is not None else int(os.getenv("QUESTION_CACHE_WARMUP", 512))
+        if limit <= 0:
+            return 0
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(QuestionCacheEntry.cache_key, QuestionCacheEntry.question)
+                .where(QuestionCacheEntry.prompt_version == prompt_version)
+                .order_by(QuestionCacheEntry.id.desc())
+                .limit(min(limit, self.max_entries))
+            )).all()
+        # Oldest first, so the newest end up most recently used
+        for key, question in reversed(rows):
+            self._remember(key, question)
+        return len(rows)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.shared_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,228 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Path prefixes, array indices and widget suffixes of generated field names, e.g. form1[0].Page1[0].FirstName[0]
+_PATH_RE = re.compile(r"^.*\.|\[\d*\]")
+_CAMEL_RE = re.compile(r"([a-z])([A-Z])|([A-Z]+)([A-Z][a-z])")
+_SPLIT_RE = re.compile(r"[^A-Za-z0-9]+|(?<=[A-Za-z])(?=\d)|(?<=\d)(?=[A-Za-z])")
+
+# Tokens that describe the widget rather than its meaning
+NOISE_TOKENS = {"txt", "text", "fld", "field", "tb", "textbox", "input", "cb", "chk", "check", "box", "checkbox"}
+
+# Whose value a field asks for, when a name is qualified; anything else is left to the model
+SUBJECTS = {
+    "applicant", "co applicant", "spouse", "partner", "employer", "employee", "parent", "guardian", "child",
+    "mother", "father", "emergency contact", "beneficiary", "owner", "patient", "student", "witness",
+}
+QUALIFIERS = {"home", "work", "mobile", "cell", "mailing", "billing", "shipping", "business", "personal", "alternate"}
+
+ORDINALS = {1: "first", 2: "second", 3: "third", 4: "fourth", 5: "fifth"}
+
+# A person has one name: "Business Name" is a company's, "Home First Name" is not understood
+PERSONAL_NAMES = {"first name", "middle name", "middle initial", "last name", "full name"}
+
+# Nouns that make up one value when they sit next to each other on a form, asked for as a whole
+FIELD_FAMILIES = {
+    "full name": ("first name", "middle name", "middle initial", "last name"),
+    "address": ("street address", "second address line", "city", "state", "ZIP code", "country"),
+}
+
+# Canonical noun phrase, how to ask for it, and the field names that mean it
+QUESTION_RULES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    (
+        "first name", "What is {owner} {qualifier}{noun}?",
+        ("first name", "firstname", "fname", "given name", "forename"),
+    ),
+    ("middle name", "What is {owner} {qualifier}{noun}?", ("middle name", "middlename", "mname")),
+    ("middle initial", "What is {owner} {qualifier}{noun}?", ("middle initial", "mi")),
+    ("last name", "What is {owner} {qualifier}{noun}?", ("last name", "lastname", "lname", "surname", "family name")),
+    ("full name", "What is {owner} {qualifier}{noun}?", ("name", "full name", "fullname")),
+    (
+        "date of birth", "What is {owner} {qualifier}{noun}? (MM/DD/YYYY)",
+        ("dob", "date of birth", "birth date", "birthdate", "birthday"),
+    ),
+    ("age", "What is {owner} {qualifier}{noun}?", ("age",)),
+    ("gender", "What is {owner} {qualifier}{noun}?", ("gender", "sex")),
+    ("email address", "What is {owner} {qualifier}{noun}?", ("email", "e mail", "email address", "e mail address")),
+    (
+        "phone number", "What is {owner} {qualifier}{noun}?",
+        ("phone", "phone number", "phone no", "telephone", "telephone number", "tel", "mobile", "mobile number",
+         "cell", "cell phone", "cell number"),
+    ),
+    ("fax number", "What is {owner} {qualifier}{noun}?", ("fax", "fax number")),
+    (
+        "street address", "What is {owner} {qualifier}{noun}?",
+        ("address", "street", "street address", "address line", "address line 1", "address 1", "addr"),
+    ),
+    (
+        "second address line", "What is the second line of {owner} {qualifier}address, if any?",
+        ("address line 2", "address 2"),
+    ),
+    ("city", "What {noun} is {owner} {qualifier}address in?", ("city", "town", "city town")),
+    ("state", "What {noun} is {owner} {qualifier}address in?", ("state", "province", "state province")),
+    (
+        "ZIP code", "What is {owner} {qualifier}{noun}?",
+        ("zip", "zip code", "zipcode", "postal code", "postcode", "postal", "zip postal code"),
+    ),
+    ("country", "What {noun} is {owner} {qualifier}address in?", ("country",)),
+    (
+        "Social Security number", "What is {owner} {qualifier}{noun}?",
+        ("ssn", "social security number", "social security no"),
+    ),
+    ("occupation", "What is {owner} {qualifier}{noun}?", ("occupation", "job title", "position")),
+    (
+        "company name", "What is the name of {owner} {qualifier}company?",
+        ("company", "company name", "employer name", "business name", "organization", "organisation",
+         "organization name", "organisation name"),
+    ),
+    (
+        "signature date", "What {qualifier}date should go next to the signature? (MM/DD/YYYY)",
+        ("signature date", "date signed"),
+    ),
+    ("date", "What {qualifier}date should go in this field? (MM/DD/YYYY)", ("date",)),
+]
+
+
+def _build_index() -> Dict[str, Tuple[str, str]]:
+    index = {}
+    for noun, template, aliases in QUESTION_RULES:
+        for alias in aliases:
+            index[alias] = (noun, template)
+    return index
+
+
+# Alias phrase -> (noun, template), built once at import
+_RULE_INDEX = _build_index()
+
+
+def tokenize_field_name(field_name: str) -> List[str]:
+    """
+    Split a field name into lowercase words: camelCase, snake_case, kebab-case and digit boundaries
+    e.g. "form1[0].ApplicantDOB_2[0]" -> ["applicant", "dob", "2"]
+    """
+    name = _PATH_RE.sub("", field_name) or field_name
+    name = _CAMEL_RE.sub(lambda m: f"{m.group(1)} {m.group(2)}" if m.group(1) else f"{m.group(3)} {m.group(4)}", name)
+    return [token.lower() for token in _SPLIT_RE.split(name) if token and token.lower() not in NOISE_TOKENS]
+
+
+def _label(tokens: List[str]) -> Optional[str]:
+    """
+    Readable label of a checkbox, or None when its name carries no words, like "Check Box1"
+    Numbers stay in: they are all that tells "Option 1" from "Option 2"
+    """
+    if not any(len(token) >= 3 and not token.isdigit() for token in tokens):
+        return None
+    return " ".join(tokens)
+
+
+def _owner(prefix: List[str]) -> Optional[Tuple[str, str]]:
+    """
+    Split the words before a recognised noun into whose value it is and a qualifier such as "home"
+    Returns: (possessive, qualifier), or None when the prefix is not understood
+    """
+    qualifier = ""
+    if prefix and prefix[-1] in QUALIFIERS:
+        qualifier = prefix[-1] + " "
+        prefix = prefix[:-1]
+    if not prefix:
+        return "your", qualifier
+    subject = " ".join(prefix)
+    if subject in SUBJECTS:
+        return f"the {subject}'s", qualifier
+    return None
+
+
+def _match(tokens: List[str]) -> Optional[Tuple[int, str, str]]:
+    """
+    Find the longest recognised suffix: "applicant first name" is a first name asked about the applicant
+    Returns: (index where the suffix starts, noun, template), or None
+    """
+    for start in range(len(tokens)):
+        match = _RULE_INDEX.get(" ".join(tokens[start:]))
+        if match is not None:
+            return start, match[0], match[1]
+    return None
+
+
+@lru_cache(maxsize=4096)
+def question_for_field(field_name: str, field_type: str) -> Optional[str]:
+    """
+    Write the question for a well-known field without the model
+    Returns: The question, or None when the field is not recognised
+    """
+    tokens = tokenize_field_name(field_name)
+    if field_type in ["checkbox", "radiobutton"]:
+        label = _label(tokens)
+        return f"Should \"{label}\" be checked? (yes/no)" if label else None
+    if field_type not in ["text", "combobox", "listbox"] or not tokens:
+        return None
+
+    number = 0
+    match = _match(tokens)
+    if match is None and len(tokens) > 1 and tokens[-1].isdigit():
+        # A trailing number tells repeated fields apart: Phone2 is the second phone number, Date1 the first date
+        number = int(tokens[-1])
+        tokens = tokens[:-1]
+        match = _match(tokens)
+    if match is None or (number and number not in ORDINALS):
+        return None
+
+    start, noun, template = match
+    owner = _owner(tokens[:start])
+    if owner is None:
+        return None
+    possessive, qualifier = owner
+    if qualifier and noun in PERSONAL_NAMES:
+        return None
+    if number:
+        qualifier = f"{ORDINALS[number]} {qualifier}"
+    question = template.format(owner=possessive, qualifier=qualifier, noun=noun)
+    return question[0].upper() + question[1:]
+
+
+def describe_field(field_name: str) -> Optional[Tuple[str, str]]:
+    """
+    Name what a field asks for, e.g. "ApplicantFirstName" -> ("applicant", "first name")
+    Returns: (words before the noun, noun), or None when the field is not recognised
+    """
+    tokens = tokenize_field_name(field_name)
+    match = _match(tokens)
+    if match is None:
+        return None
+    start, noun, _ = match
+    return " ".join(tokens[:start]), noun
+
+
+def _join(items: List[str]) -> str:
+    if len(items) <= 2:
+        return " and ".join(items)
+    return ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def _group_label(field_name: str) -> str:
+    described = describe_field(field_name)
+    owner = _owner(described[0].split()) if described else None
+    if owner is None:
+        return "the " + " ".join(tokenize_field_name(field_name))
+    possessive, qualifier = owner
+    return f"{possessive} {qualifier}{described[1]}"
+
+
+@lru_cache(maxsize=1024)
+def question_for_group(field_names: Tuple[str, ...]) -> str:
+    """
+    Write one question asking for every field of a group, in order
+    Parts of a name or an address with the same owner are asked for as a whole; anything else as a list
+    """
+    described = [describe_field(field_name) for field_name in field_names]
+    if all(described) and len({owner for owner, _ in described}) == 1:
+        nouns = [noun for _, noun in described]
+        owner = _owner(described[0][0].split())
+        for family, members in FIELD_FAMILIES.items():
+            if owner is not None and all(noun in members for noun in nouns):
+                possessive, qualifier = owner
+                question = f"What is {possessive} {qualifier}{family}? Please give the {_join(nouns)}, separated by commas."
+                return question[0].upper() + question[1:]
+
+    return f"Please provide {_join([_group_label(field_name) for field_name in field_names])}, separated by commas."
@@ -0,0 +1,334 @@
+import os
+import time
+import shutil
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; the lock file is then skipped
+    fcntl = None
+
+from sqlalchemy import delete, exists, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from logging_config import duration_ms, log_event
+from metrics import REAPER_ITEMS, REAPER_RUN_SECONDS, STORAGE_BYTES, STORAGE_FILES
+from models import BatchJob, CompletionJob, FormField, FormSession, FormTemplate
+from services.storage import LocalStorage, Storage, StoredObject, create_storage
+
+if TYPE_CHECKING:
+    from services.template_service import TemplateRegistry
+
+logger = logging.getLogger(__name__)
+
+# Key of the Postgres advisory lock that makes one process the reaper at a time
+REAPER_LOCK_KEY = 0x7265617065
+
+STORAGE_AREAS = ("templates", "outputs", "batches", "tmp")
+
+
+@dataclass
+class StorageUsage:
+    bytes_by_area: Dict[str, int] = field(default_factory=dict)
+    files_by_area: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.bytes_by_area.values())
+
+
+class SessionReaper:
+    """
+    Background task that expires idle sessions, deletes expired sessions and unused templates in batches and removes
+    stored files no row refers to any more. Only one process runs a pass at a time; every process measures storage
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        storage: Optional[Storage] = None,
+        interval: Optional[float] = None,
+        template_registry: Optional["TemplateRegistry"] = None,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage or create_storage()
+        self.template_registry = template_registry
+        # Lock file directory: next to the uploads for local storage, or the local scratch space
+        self.lock_dir = self.storage.root if isinstance(self.storage, LocalStorage) else self.storage.scratch_dir
+        self.interval = interval or float(os.getenv("REAPER_INTERVAL", 300))
+        # Sessions without activity for this long are expired, and deleted once expired for purge_after
+        self.session_ttl = float(os.getenv("SESSION_TTL_HOURS", 24)) * 3600
+        self.purge_after = float(os.getenv("SESSION_PURGE_AFTER_HOURS", 24)) * 3600
+        # Finished batch fills are kept this long for their download
+        self.batch_ttl = float(os.getenv("BATCH_JOB_TTL_HOURS", 24)) * 3600
+        # Templates no session or batch uses are deleted once unused for this long. Uses are only written every
+        # TEMPLATE_TOUCH_INTERVAL, so the TTL is never shorter than two intervals
+        self.template_touch_interval = float(os.getenv("TEMPLATE_TOUCH_INTERVAL", 3600))
+        self.template_ttl = max(
+            float(os.getenv("TEMPLATE_TTL_HOURS", 168)) * 3600, 2 * self.template_touch_interval
+        )
+        # Files younger than this may belong to an upload or a fill that has not been committed yet
+        self.orphan_grace = float(os.getenv("REAPER_ORPHAN_GRACE", 3600))
+        self.batch_size = int(os.getenv("REAPER_BATCH_SIZE", 500))
+        # 0 disables the quota
+        self.quota_bytes = int(os.getenv("STORAGE_QUOTA_BYTES", 0))
+        self.usage = StorageUsage()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def over_quota(self) -> bool:
+        """
+        Whether the last measured storage use exceeds STORAGE_QUOTA_BYTES
+        """
+        return self.quota_bytes > 0 and self.usage.total_bytes >= self.quota_bytes
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_event(logger, logging.ERROR, "reaper.failed", error=repr(e))
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Run one pass if no other process is running one
+        Returns: Number of sessions expired and rows and files deleted, by kind; empty when another process holds the lock
+        """
+        self.usage = self._measure_storage(await self.storage.list())
+        # Each replica has its own local copies of stored objects, so every process trims them
+        evicted = await self.storage.trim_cache()
+        if evicted:
+            REAPER_ITEMS.labels("evicted_cache_files").inc(evicted)
+            log_event(logger, logging.INFO, "reaper.cache_trimmed", evicted_files=evicted)
+        now = now or datetime.now(timezone.utc)
+        counts: Dict[str, int] = {}
+        start = time.perf_counter()
+        async with self.session_factory() as lock_db:
+            if not await self._try_lock(lock_db):
+                return counts
+            try:
+                async with self.session_factory() as db:
+                    counts["expired_sessions"] = await self._expire_sessions(db, now)
+                    # Under quota pressure expired sessions are deleted straight away
+                    purge_after = 0 if self.over_quota() else self.purge_after
+                    counts.update(await self._delete_expired(db, now - timedelta(seconds=purge_after)))
+                    counts["deleted_batch_jobs"] = await self._delete_batch_jobs(db, now)
+                    # Under quota pressure templates go as soon as their last use is surely recorded
+                    template_ttl = 2 * self.template_touch_interval if self.over_quota() else self.template_ttl
+                    counts["deleted_templates"] = await self._delete_templates(
+                        db, now - timedelta(seconds=template_ttl)
+                    )
+                    counts["deleted_files"] = await self._delete_orphan_files(db)
+            finally:
+                await self._unlock(lock_db)
+
+        for kind, count in counts.items():
+            REAPER_ITEMS.labels(kind).inc(count)
+        REAPER_RUN_SECONDS.observe(time.perf_counter() - start)
+        if counts["deleted_files"]:
+            self.usage = self._measure_storage(await self.storage.list())
+        log_event(
+            logger, logging.INFO, "reaper.run",
+            **counts, storage_bytes=self.usage.total_bytes, duration_ms=duration_ms(start),
+        )
+        return counts
+
+    async def _try_lock(self, db: AsyncSession) -> bool:
+        """
+        Take the reaper lock: a session-level advisory lock on Postgres, a lock file next to the uploads otherwise
+        The lock session stays open, without committing, until _unlock so the lock keeps its connection
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            return bool(await db.scalar(select(func.pg_try_advisory_lock(REAPER_LOCK_KEY))))
+        if fcntl is None:
+            return True
+        os.makedirs(self.lock_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.lock_dir, ".reaper.lock"), "w")
+        try:
+            # A POSIX record lock, unlike flock, is not inherited by PDF workers forked while it is held
+            fcntl.lockf(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        db.info["reaper_lock_file"] = lock_file
+        return True
+
+    async def _unlock(self, db: AsyncSession):
+        if db.get_bind().dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REAPER_LOCK_KEY})
+            await db.commit()
+            return
+        lock_file = db.info.pop("reaper_lock_file", None)
+        if lock_file is not None:
+            # Closing the file releases the lock
+            lock_file.close()
+
+    async def _expire_sessions(self, db: AsyncSession, now: datetime) -> int:
+        last_activity = func.coalesce(FormSession.updated_at, FormSession.created_at)
+        result = await db.execute(
+            update(FormSession)
+            .where(
+                FormSession.status != "expired",
+                last_activity < now - timedelta(seconds=self.session_ttl),
+            )
+            .values(status="expired")
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount or 0
+
+    async def _delete_expired(self, db: AsyncSession, expired_before: datetime) -> Dict[str, int]:
+        """
+        Delete expired sessions with their fields and jobs, one batch per transaction
+        """
+        counts = {"deleted_sessions": 0, "deleted_fields": 0, "deleted_jobs": 0}
+        while True:
+            session_ids = list((await db.scalars(
+                select(FormSession.session_id)
+                .where(
+                    FormSession.status == "expired",
+                    func.coalesce(FormSession.updated_at, FormSession.created_at) < expired_before,
+                )
+                .order_by(FormSession.id)
+                .limit(self.batch_size)
+            )).all())
+            if not session_ids:
+                return counts
+
+            fields = await db.execute(delete(FormField).where(FormField.session_id.in_(session_ids)))
+            jobs = await db.execute(delete(CompletionJob).where(CompletionJob.session_id.in_(session_ids)))
+            sessions = await db.execute(delete(FormSession).where(FormSession.session_id.in_(session_ids)))
+            await db.commit()
+            counts["deleted_fields"] += fields.rowcount or 0
+            counts["deleted_jobs"] += jobs.rowcount or 0
+            counts["deleted_sessions"] += sessions.rowcount or 0
+            if len(session_ids) < self.batch_size:
+                return counts
+            # Let requests in between batches
+            await asyncio.sleep(0)
+
+    async def _delete_batch_jobs(self, db: AsyncSession, now: datetime) -> int:
+        """
+        Delete finished batch jobs past their TTL; their rows and archive files then become orphans
+        """
+        result = await db.execute(
+            delete(BatchJob).where(
+                BatchJob.status.in_(("succeeded", "failed")),
+                BatchJob.finished_at < now - timedelta(seconds=self.batch_ttl),
+            )
+        )
+        await db.commit()
+        return result.rowcount or 0
+
+    async def _delete_templates(self, db: AsyncSession, used_before: datetime) -> int:
+        """
+        Delete templates that no session or batch job refers to and that were last used before used_before,
+        one batch per transaction; their files then become orphans
+        """
+        deleted = 0
+        unused = (
+            func.coalesce(FormTemplate.last_used_at, FormTemplate.created_at) < used_before,
+            ~exists().where(FormSession.template_id == FormTemplate.id),
+            ~exists().where(BatchJob.template_id == FormTemplate.id),
+        )
+        while True:
+            template_ids = list((await db.scalars(
+                select(FormTemplate.id).where(*unused).order_by(FormTemplate.id).limit(self.batch_size)
+            )).all())
+            if not template_ids:
+                return deleted
+
+            # The conditions are checked again, so a template touched or used since is kept
+            rows = (await db.execute(
+                delete(FormTemplate)
+                .where(FormTemplate.id.in_(template_ids), *unused)
+                .returning(FormTemplate.id, FormTemplate.content_hash)
+            )).all()
+            await db.commit()
+            deleted += len(rows)
+            if self.template_registry is not None:
+                for template_id, content_hash in rows:
+                    await self.template_registry.forget(content_hash, template_id)
+            if len(template_ids) < self.batch_size:
+                return deleted
+            await asyncio.sleep(0)
+
+    async def _referenced_keys(self, db: AsyncSession) -> Set[str]:
+        keys = set()
+        columns = (
+            FormSession.file_path, FormSession.output_path, CompletionJob.output_path, FormTemplate.file_path,
+            BatchJob.rows_path, BatchJob.output_path,
+        )
+        for column in columns:
+            keys.update(await db.scalars(select(column).where(column.is_not(None)).distinct()))
+        await db.commit()
+        return keys
+
+    async def _delete_orphan_files(self, db: AsyncSession) -> int:
+        """
+        Delete stored PDFs that no session, job or template refers to, and abandoned scratch files
+        """
+        referenced = await self._referenced_keys(db)
+        older_than = time.time() - self.orphan_grace
+        deleted = 0
+        for stored in await self.storage.list():
+            # Compressed variants live as long as the output they were made from
+            owner = stored.key[:-3] if stored.key.endswith(".gz") else stored.key
+            if stored.modified >= older_than or owner in referenced or stored.key.startswith("tmp/"):
+                continue
+            await self.storage.delete(stored.key)
+            deleted += 1
+        return deleted + await asyncio.to_thread(self._sweep_scratch, older_than)
+
+    def _sweep_scratch(self, older_than: float) -> int:
+        """
+        Delete staged uploads, fill results and batch output directories left behind by a crash
+        """
+        deleted = 0
+        try:
+            with os.scandir(self.storage.scratch_dir) as scan:
+                entries = list(scan)
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.name.startswith(".") or entry.stat(follow_symlinks=False).st_mtime >= older_than:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+                deleted += 1
+            except FileNotFoundError:
+                continue
+        return deleted
+
+    @staticmethod
+    def _measure_storage(objects: List[StoredObject]) -> StorageUsage:
+        usage = StorageUsage()
+        for stored in objects:
+            area = stored.key.split("/", 1)[0] if "/" in stored.key else "other"
+            if area not in STORAGE_AREAS:
+                area = "other"
+            usage.bytes_by_area[area] = usage.bytes_by_area.get(area, 0) + stored.size
+            usage.files_by_area[area] = usage.files_by_area.get(area, 0) + 1
+        for area in (*STORAGE_AREAS, "other"):
+            STORAGE_BYTES.labels(area).set(usage.bytes_by_area.get(area, 0))
+            STORAGE_FILES.labels(area).set(usage.files_by_area.get(area, 0))
+        return usage
@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional; only needed for SHARED_CACHE_BACKEND=redis
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache:
+    """
+    String key/value cache with per-entry TTLs, shared by every worker process when backed by Redis
+    Lookups never raise: a cache that is down behaves like an empty one
+    """
+
+    # Label of the tier in cache lookup metrics
+    name: str
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class MemoryCache(SharedCache):
+    """
+    In-process TTL/LRU stand-in for Redis: shared only within one worker, for single-process runs and tests
+    """
+
+    name = "shared_memory"
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv("SHARED_CACHE_SIZE", 16384))
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl_seconds, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._cache.pop(key, None)
+
+
+class RedisCache(SharedCache):
+    """
+    Cache in Redis or anything that speaks its protocol (Valkey, KeyDB, Dragonfly)
+    """
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, prefix: Optional[str] = None):
+        if aioredis is None:
+            raise RuntimeError("SHARED_CACHE_BACKEND=redis requires the redis package")
+        self.prefix = prefix if prefix is not None else os.getenv("SHARED_CACHE_PREFIX", "pdf-forms:")
+        self.client = aioredis.from_url(
+            url or os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            decode_responses=True,
+            # A slow cache must not hold up a request longer than the database would
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.25)),
+            socket_connect_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.25)),
+        )
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            return await self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Error reading shared cache: {e}")
+            return None
+
+    async def set(self, key: str, value: str, ttl_seconds: float):
+        try:
+            await self.client.set(self.prefix + key, value, ex=max(1, int(ttl_seconds)))
+        except Exception as e:
+            logger.warning(f"Error writing shared cache: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Error deleting from shared cache: {e}")
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_shared_cache() -> Optional[SharedCache]:
+    """
+    Build the cache named by SHARED_CACHE_BACKEND: none (default), memory or redis
+    Returns: The cache, or None when caches stay local to each process
+    """
+    backend = os.getenv("SHARED_CACHE_BACKEND", "none").lower()
+    if backend == "redis":
+        return RedisCache()
+    if backend == "memory":
+        return MemoryCache()
+    if backend != "none":
+        raise ValueError(f"Unknown SHARED_CACHE_BACKEND: {backend}")
+    return None
@@ -0,0 +1,313 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+import aiofiles
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # Optional; only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    key: str
+    size: int
+    modified: float  # seconds since the epoch
+
+
+def content_key(area: str, digest: str, suffix: str = ".pdf") -> str:
+    """
+    Key of a content-addressed object, e.g. templates/<sha256>.pdf; such objects never change once written
+    """
+    return f"{area}/{digest}{suffix}"
+
+
+class Storage:
+    """
+    Where uploaded templates and filled outputs live, addressed by keys such as outputs/<fingerprint>.pdf
+    PyMuPDF needs real files, so work happens on local copies and results are stored with put_file
+    """
+
+    # Directory for staged uploads and fill results on their way into storage
+    scratch_dir: str
+
+    def scratch_path(self, suffix: str = "") -> str:
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        return os.path.join(self.scratch_dir, f"{uuid.uuid4()}{suffix}")
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    async def put_file(self, key: str, source_path: str):
+        """
+        Store a local file under a key; the local file is consumed
+        """
+        raise NotImplementedError
+
+    async def local_path(self, key: str) -> str:
+        """
+        Path of a local copy of an object, for the PDF workers
+        """
+        raise NotImplementedError
+
+    def read_range(self, key: str, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+        """
+        Stream the inclusive byte range start-end of an object
+        """
+        raise NotImplementedError
+
+    async def download_url(self, key: str, disposition: str, media_type: str) -> Optional[str]:
+        """
+        URL the client can download an object from directly, or None to stream it through the API
+        disposition and media_type are the Content-Disposition and Content-Type the download should carry
+        """
+        return None
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def list(self, prefix: str = "") -> List[StoredObject]:
+        raise NotImplementedError
+
+    async def trim_cache(self) -> int:
+        """
+        Evict local copies of objects beyond the cache's size and age bounds
+        Safe to call from every process sharing the cache
+        Returns: Number of files evicted
+        """
+        return 0
+
+
+class LocalStorage(Storage):
+    """
+    Objects are files under UPLOAD_DIR; every replica needs the same volume
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.getenv("UPLOAD_DIR", "uploads")
+        # On the same filesystem as the objects, so storing a file is an atomic rename
+        self.scratch_dir = os.path.join(self.root, "tmp")
+
+    def path(self, key: str) -> str:
+        # Rows from before storage keys may hold absolute paths
+        return key if os.path.isabs(key) else os.path.join(self.root, key)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(key, stat.st_size, stat.st_mtime)
+
+    async def put_file(self, key: str, source_path: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    async def local_path(self, key: str) -> str:
+        return self.path(key)
+
+    async def read_range(self, key: str, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.path(key), "rb") as source:
+            await source.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await source.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    async def list(self, prefix: str = "") -> List[StoredObject]:
+        return await asyncio.to_thread(self._walk, prefix)
+
+    def _walk(self, prefix: str) -> List[StoredObject]:
+        objects = []
+        for directory, _, filenames in os.walk(os.path.join(self.root, prefix)):
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                objects.append(StoredObject(key, stat.st_size, stat.st_mtime))
+        return objects
+
+
+class S3Storage(Storage):
+    """
+    Objects live in an S3-compatible bucket (AWS S3, MinIO), so replicas share nothing on disk
+    Content-addressed objects are cached locally for the PDF workers; downloads redirect to presigned URLs
+    """
+
+    def __init__(self):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3")
+        self.bucket = os.environ["S3_BUCKET"]
+        self.prefix = os.getenv("S3_PREFIX", "").strip("/")
+        self.presign_expires = int(os.getenv("S3_PRESIGN_EXPIRES", 300))
+        self.redirect_downloads = os.getenv("S3_REDIRECT_DOWNLOADS", "true").lower() == "true"
+        self.cache_dir = os.getenv("STORAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "pdf-form-storage")
+        self.scratch_dir = os.path.join(self.cache_dir, "tmp")
+        # Local copies are evicted least recently used first above the size bound, and once unused for max_age;
+        # copies used within min_age stay, as a PDF worker may be about to open them
+        self.cache_max_bytes = int(os.getenv("STORAGE_CACHE_MAX_BYTES", 1024 ** 3))
+        self.cache_max_age = float(os.getenv("STORAGE_CACHE_MAX_AGE", 86400))
+        self.cache_min_age = float(os.getenv("STORAGE_CACHE_MIN_AGE", 900))
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+            region_name=os.getenv("S3_REGION") or None,
+            # Path-style addressing works with MinIO and other stand-ins without wildcard DNS
+            config=BotoConfig(s3={"addressing_style": os.getenv("S3_ADDRESSING_STYLE", "path")}),
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "objects", key)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(key, head["ContentLength"], head["LastModified"].timestamp())
+
+    async def put_file(self, key: str, source_path: str):
+        # upload_file streams from disk and switches to multipart uploads for large files
+        await asyncio.to_thread(self.client.upload_file, source_path, self.bucket, self._object_key(key))
+        # Keep the file as the local copy the next fill will ask for
+        cache_path = self._cache_path(key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        os.replace(source_path, cache_path)
+        os.utime(cache_path)
+
+    async def local_path(self, key: str) -> str:
+        cache_path = self._cache_path(key)
+        try:
+            # The modification time records the last use for trim_cache
+            os.utime(cache_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = self.scratch_path(".part")
+            await asyncio.to_thread(self.client.download_file, self.bucket, self._object_key(key), tmp_path)
+            os.replace(tmp_path, cache_path)
+        return cache_path
+
+    async def read_range(self, key: str, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self._object_key(key), Range=f"bytes={start}-{end}"
+        )
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def download_url(self, key: str, disposition: str, media_type: str) -> Optional[str]:
+        if not self.redirect_downloads:
+            return None
+        return await asyncio.to_thread(
+            self.client.generate_presigned_url,
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._object_key(key),
+                "ResponseContentDisposition": disposition,
+                "ResponseContentType": media_type,
+            },
+            ExpiresIn=self.presign_expires,
+        )
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+        try:
+            os.remove(self._cache_path(key))
+        except FileNotFoundError:
+            pass
+
+    async def list(self, prefix: str = "") -> List[StoredObject]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    def _list(self, prefix: str) -> List[StoredObject]:
+        objects = []
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for item in page.get("Contents", []):
+                objects.append(StoredObject(item["Key"][strip:], item["Size"], item["LastModified"].timestamp()))
+        return objects
+
+    async def trim_cache(self) -> int:
+        return await asyncio.to_thread(self._trim_cache)
+
+    def _trim_cache(self) -> int:
+        cached = []
+        for directory, _, filenames in os.walk(os.path.join(self.cache_dir, "objects")):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                cached.append((stat.st_mtime, stat.st_size, path))
+
+        now = time.time()
+        total = sum(size for _, size, _ in cached)
+        evicted = 0
+        for used, size, path in sorted(cached):
+            if used >= now - self.cache_min_age:
+                break
+            if total <= self.cache_max_bytes and used >= now - self.cache_max_age:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            else:
+                evicted += 1
+            total -= size
+        return evicted
+
+
+def create_storage() -> Storage:
+    """
+    Build the storage backend named by STORAGE_BACKEND: local (default) or s3
+    """
+    backend = os.getenv("STORAGE_BACKEND", "local").lower()
+    if backend == "s3":
+        return S3Storage()
+    if backend != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return LocalStorage()
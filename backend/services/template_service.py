@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from metrics import CACHE_LOOKUPS
+from models import FormTemplate
+from services.field_grouping import group_fields
+from services.pdf_service import PDFService
+from services.shared_cache import SharedCache
+from services.storage import Storage, content_key, create_storage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TemplateInfo:
+    id: int
+    content_hash: str
+    file_path: str
+    field_schema: List[Dict[str, Any]]
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        return PDFService.fields_from_schema(self.field_schema)
+
+    @property
+    def field_groups(self) -> Dict[str, str]:
+        return group_fields(self.field_schema)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": self.id,
+            "content_hash": self.content_hash,
+            "file_path": self.file_path,
+            "field_schema": self.field_schema,
+        })
+
+    @classmethod
+    def from_json(cls, data: str) -> "TemplateInfo":
+        return cls(**json.loads(data))
+
+
+class TemplateRegistry:
+    """
+    Content-addressed registry of uploaded PDF forms and their extracted field schema
+    Lookups go to memory, then to the cache shared between worker processes if any, then to the database
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        storage: Optional[Storage] = None,
+        shared: Optional[SharedCache] = None,
+    ):
+        self.max_entries = max_entries or int(os.getenv("TEMPLATE_CACHE_SIZE", 256))
+        self.storage = storage or create_storage()
+        self.shared = shared
+        self.shared_ttl_seconds = float(os.getenv("SHARED_CACHE_TTL", 86400))
+        self._cache: "OrderedDict[str, TemplateInfo]" = OrderedDict()
+        self._hash_by_id: Dict[int, str] = {}
+        # Last use is written at most this often per template; the reaper only deletes templates unused for longer
+        self.touch_interval = float(os.getenv("TEMPLATE_TOUCH_INTERVAL", 3600))
+        self._touched: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, template: TemplateInfo):
+        with self._lock:
+            self._cache[template.content_hash] = template
+            self._cache.move_to_end(template.content_hash)
+            self._hash_by_id[template.id] = template.content_hash
+            while len(self._cache) > self.max_entries:
+                _, evicted = self._cache.popitem(last=False)
+                self._hash_by_id.pop(evicted.id, None)
+
+    async def _get_shared(self, content_hash: str) -> Optional[TemplateInfo]:
+        if self.shared is None:
+            return None
+        data = await self.shared.get("template:" + content_hash)
+        if data is None:
+            return None
+        template = TemplateInfo.from_json(data)
+        with self._lock:
+            self.hits += 1
+            CACHE_LOOKUPS.labels("template", f"{self.shared.name}_hit").inc()
+        self._remember(template)
+        return template
+
+    async def _set_shared(self, template: TemplateInfo):
+        if self.shared is None:
+            return
+        await self.shared.set("template:" + template.content_hash, template.to_json(), self.shared_ttl_seconds)
+        await self.shared.set(f"template_id:{template.id}", template.content_hash, self.shared_ttl_seconds)
+
+    async def touch(self, db: AsyncSession, template: TemplateInfo) -> bool:
+        """
+        Record that a template is in use, so the reaper keeps it
+        Commits, so call it before making other changes in the session
+        Returns: False when the template has been deleted since it was cached; it is then forgotten
+        """
+        now = time.monotonic()
+        with self._lock:
+            touched = self._touched.get(template.id)
+        if touched is not None and now - touched < self.touch_interval:
+            # Touched recently, so its last use is too recent for the reaper
+            return True
+        result = await db.execute(
+            update(FormTemplate)
+            .where(FormTemplate.id == template.id)
+            .values(last_used_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if not result.rowcount:
+            await self.forget(template.content_hash, template.id)
+            return False
+        with self._lock:
+            self._touched[template.id] = now
+        return True
+
+    async def forget(self, content_hash: str, template_id: int):
+        """
+        Drop a deleted template from memory and from the shared cache
+        """
+        with self._lock:
+            self._cache.pop(content_hash, None)
+            self._hash_by_id.pop(template_id, None)
+            self._touched.pop(template_id, None)
+        if self.shared is not None:
+            await self.shared.delete("template:" + content_hash)
+            await self.shared.delete(f"template_id:{template_id}")
+
+    async def get(self, db: AsyncSession, content_hash: str) -> Optional[TemplateInfo]:
+        """
+        Look up a template by content hash, in memory first and then in the database, and mark it as used
+        """
+        with self._lock:
+            template = self._cache.get(content_hash)
+            if template is not None:
+                self._cache.move_to_end(content_hash)
+        # A cached template may have been reaped by another process, which the touch finds out
+        if template is not None and await self.touch(db, template):
+            with self._lock:
+                self.hits += 1
+                CACHE_LOOKUPS.labels("template", "hit").inc()
+            return template
+
+        template = await self._get_shared(content_hash)
+        if template is not None and await self.touch(db, template):
+            return template
+
+        row = await db.scalar(select(FormTemplate).where(FormTemplate.content_hash == content_hash))
+        if row is None or not await self.storage.exists(row.file_path):
+            with self._lock:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("template", "miss").inc()
+            return None
+
+        template = TemplateInfo(row.id, row.content_hash, row.file_path, row.field_schema)
+        if not await self.touch(db, template):
+            with self._lock:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("template", "miss").inc()
+            return None
+        with self._lock:
+            self.hits += 1
+            CACHE_LOOKUPS.labels("template", "hit").inc()
+        self._remember(template)
+        await self._set_shared(template)
+        return template
+
+    async def get_by_id(self, db: AsyncSession, template_id: int) -> Optional[TemplateInfo]:
+        """
+        Look up a template by id, in memory first and then in the database
+        """
+        with self._lock:
+            content_hash = self._hash_by_id.get(template_id)
+            template = self._cache.get(content_hash) if content_hash else None
+            if template is not None:
+                self._cache.move_to_end(content_hash)
+                self.hits += 1
+                CACHE_LOOKUPS.labels("template", "hit").inc()
+                return template
+
+        if self.shared is not None:
+            content_hash = await self.shared.get(f"template_id:{template_id}")
+            template = await self._get_shared(content_hash) if content_hash else None
+            if template is not None:
+                return template
+
+        row = await db.get(FormTemplate, template_id)
+        if row is None:
+            with self._lock:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("template", "miss").inc()
+            return None
+
+        template = TemplateInfo(row.id, row.content_hash, row.file_path, row.field_schema)
+        with self._lock:
+            self.hits += 1
+            CACHE_LOOKUPS.labels("template", "hit").inc()
+        self._remember(template)
+        await self._set_shared(template)
+        return template
+
+    async def store_file(self, content_hash: str, staged_path: str) -> str:
+        """
+        Store a staged upload under its content hash
+        An object already stored is written again: its row may have just been reaped, and a fresh copy is
+        kept by the reaper's orphan grace period until the new row is committed
+        Returns: Storage key of the template
+        """
+        key = content_key("templates", content_hash)
+        await self.storage.put_file(key, staged_path)
+        return key
+
+    async def register(
+        self,
+        db: AsyncSession,
+        content_hash: str,
+        file_path: str,
+        field_schema: List[Dict[str, Any]],
+        file_size: int,
+    ) -> TemplateInfo:
+        """
+        Persist a newly extracted template, tolerating a concurrent upload of the same form
+        """
+        row = await db.scalar(select(FormTemplate).where(FormTemplate.content_hash == content_hash))
+        if row is None:
+            row = FormTemplate(
+                content_hash=content_hash,
+                file_path=file_path,
+                file_size=file_size,
+                field_schema=field_schema,
+            )
+            db.add(row)
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                row = (await db.execute(
+                    select(FormTemplate).where(FormTemplate.content_hash == content_hash)
+                )).scalar_one()
+            else:
+                logger.info(f"Registered form template {content_hash[:12]} with {len(field_schema)} widgets")
+        elif row.file_path != file_path:
+            row.file_path = file_path
+            await db.commit()
+
+        template = TemplateInfo(row.id, row.content_hash, row.file_path, row.field_schema)
+        self._remember(template)
+        await self._set_shared(template)
+        return template
+
+    async def warm(self, db: AsyncSession, limit: Optional[int] = None) -> int:
+        """
+        Load the most recently registered templates into memory
+        Returns: Number of templates loaded
+        """
+        limit = limit if limit is not None else int(os.getenv("TEMPLATE_CACHE_WARMUP", 32))
+        if limit <= 0:
+            return 0
+        rows = (await db.scalars(
+            select(FormTemplate).order_by(FormTemplate.id.desc()).limit(min(limit, self.max_entries))
+        )).all()
+        for row in reversed(rows):
+            self._remember(TemplateInfo(row.id, row.content_hash, row.file_path, row.field_schema))
+        return len(rows)
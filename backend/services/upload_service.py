@@ -0,0 +1,80 @@
+import os
+import uuid
+import hashlib
+import logging
+from dataclasses import dataclass
+
+import aiofiles
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+# The PDF header must appear within the first 1024 bytes of the file
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+
+
+class UploadTooLargeError(Exception):
+    """
+    Raised as soon as an upload crosses the size limit
+    """
+
+
+class InvalidPDFError(Exception):
+    """
+    Raised when an upload does not start with a PDF header
+    """
+
+
+@dataclass(frozen=True)
+class StagedUpload:
+    path: str
+    content_hash: str
+    size: int
+
+
+async def stage_upload(file: UploadFile, max_size: int, staging_dir: str) -> StagedUpload:
+    """
+    Stream an upload to a staging file in fixed-size chunks, hashing and validating it on the way
+    Memory use is bounded by the chunk size regardless of the upload size
+    """
+    chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, f"{uuid.uuid4()}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    header = b""
+    try:
+        async with aiofiles.open(path, "wb") as buffer:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"File size exceeds limit of {max_size} bytes")
+
+                if len(header) < PDF_HEADER_WINDOW:
+                    header += chunk[:PDF_HEADER_WINDOW - len(header)]
+                    if len(header) >= PDF_HEADER_WINDOW and PDF_MAGIC not in header:
+                        raise InvalidPDFError("File is not a PDF")
+
+                digest.update(chunk)
+                await buffer.write(chunk)
+
+        if PDF_MAGIC not in header:
+            raise InvalidPDFError("File is not a PDF")
+    except Exception:
+        discard_upload(path)
+        raise
+
+    return StagedUpload(path=path, content_hash=digest.hexdigest(), size=size)
+
+
+def discard_upload(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Modules build their database engine at import time; tests run against a throwaway SQLite file
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from services.answer_normalizer import normalize_answer, normalize_number, normalize_yes_no
+from services.batch_fill import parse_rows
+
+
+@pytest.mark.parametrize(
+    "field_name, answer",
+    [
+        ("ApartmentNumber", "Apt 4B"),
+        ("AnnualIncome", "50k"),
+        ("PolicyNumber", "Policy ABC-1234"),
+        ("PassportNumber", "Passport X1234567"),
+        ("PrimaryLanguage", "Spanish, level 2"),
+        ("ManagerName", "Bob Jones ext 4"),
+    ],
+)
+def test_digits_are_not_pulled_out_of_other_values(field_name, answer):
+    assert normalize_answer(answer, "text", field_name) in (None, answer)
+
+
+@pytest.mark.parametrize(
+    "field_name, answer, expected",
+    [
+        ("AnnualIncome", "$50,000", "50,000"),
+        ("Age", "42", "42"),
+        ("NumberOfChildren", " 3 ", "3"),
+        ("ZipCode", "02134", "02134"),
+        ("ContactEmail", "It is Jane@Example.com", "jane@example.com"),
+        ("HomePhone", "555 123 4567", "(555) 123-4567"),
+    ],
+)
+def test_field_name_hints(field_name, answer, expected):
+    assert normalize_answer(answer, "text", field_name) == expected
+
+
+def test_number_search_needs_the_whole_answer():
+    assert normalize_number("£ 1,200.50", search=True) == "1,200.50"
+    assert normalize_number("about 40", search=True) is None
+
+
+def test_two_digit_years_are_not_guessed():
+    assert normalize_answer("01/02/65", "text", "DateOfBirth") is None
+    assert normalize_answer("01/02/1965", "text", "DateOfBirth") == "01/02/1965"
+
+
+def test_birth_dates_are_never_in_the_future():
+    next_year = datetime.now().year + 1
+    assert normalize_answer(f"{next_year}-01-02", "text", "ApplicantDOB") is None
+    assert normalize_answer(f"{next_year}-01-02", "text", "ExpirationDate") == f"01/02/{next_year}"
+
+
+@pytest.mark.parametrize(
+    "answer, expected",
+    [
+        ("yes", "yes"),
+        ("Yes please", "yes"),
+        ("nope", "no"),
+        ("", "no"),
+        ("yes, not a problem", None),
+        ("maybe later", None),
+    ],
+)
+def test_yes_no(answer, expected):
+    assert normalize_yes_no(answer) == expected
+
+
+def test_mixed_checkbox_answers_go_to_the_model():
+    assert normalize_answer("yes, not a problem", "checkbox", "Consent") is None
+
+
+def test_batch_rows_keep_identifiers():
+    data = (
+        b"ApartmentNumber,PolicyNumber,DateOfBirth,Consent\n"
+        b"Apt 4B,Policy ABC-1234,01/02/65,\"yes, not a problem\"\n"
+    )
+    fields = {"ApartmentNumber": "text", "PolicyNumber": "text", "DateOfBirth": "text", "Consent": "checkbox"}
+    [row] = parse_rows(data, "csv", fields)
+    assert row.values == {
+        "ApartmentNumber": "Apt 4B",
+        "PolicyNumber": "Policy ABC-1234",
+        "DateOfBirth": "01/02/65",
+        "Consent": "no",
+    }
+
+
+def test_unparsed_dates_go_to_the_model():
+    assert normalize_answer("next friday", "text", "Date") is None
+    assert normalize_answer("next friday", "text", "ExpirationDate") is None
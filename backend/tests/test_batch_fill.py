@@ -0,0 +1,36 @@
+import asyncio
+import io
+import json
+import zipfile
+
+from services.batch_fill import BatchFiller, BatchRow, stream_zip
+from services.pdf_worker import PDFWorkerBusyError
+from services.storage import LocalStorage
+
+
+class SaturatedPool:
+    max_workers = 2
+    job_timeout = 120
+
+    def __init__(self):
+        self.attempts = 0
+
+    async def fill_batch(self, template_path, field_schema, rows, output_dir):
+        self.attempts += 1
+        raise PDFWorkerBusyError(retry_after=0.05)
+
+
+def test_batch_gives_up_on_a_pool_that_stays_busy(tmp_path):
+    pool = SaturatedPool()
+    filler = BatchFiller(pool, LocalStorage(str(tmp_path)), chunk_size=2, busy_wait=0.3)
+    rows = [BatchRow(index, f"row-{index}.pdf", {"Name": "Ada"}) for index in range(1, 4)]
+
+    async def scenario():
+        chunks = [chunk async for chunk in stream_zip(filler.fill("template.pdf", [], rows))]
+        return b"".join(chunks)
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(asyncio.wait_for(scenario(), timeout=5))))
+    errors = [json.loads(line) for line in archive.read("errors.jsonl").decode().splitlines()]
+    assert [error["row"] for error in sorted(errors, key=lambda error: error["row"])] == [1, 2, 3]
+    assert all("busy" in error["error"] for error in errors)
+    assert 2 <= pool.attempts <= 20
@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from database import Base, SessionLocal, engine
+from metrics import BATCH_JOB_SECONDS
+from models import BatchJob
+from services.completion_queue import CompletionQueue
+
+
+def batch_queue(handler, stale_after: float) -> CompletionQueue:
+    return CompletionQueue(
+        SessionLocal, handler, concurrency=1, poll_interval=0.05, stale_after=stale_after,
+        model=BatchJob, name="batch", job_seconds=BATCH_JOB_SECONDS, log_keys=("template_id", "total_rows"),
+    )
+
+
+async def add_job(**values) -> str:
+    job = BatchJob(
+        job_id=str(uuid.uuid4()), template_id=1, rows_path="batches/rows.jsonl", total_rows=10, **values
+    )
+    async with SessionLocal() as db:
+        db.add(job)
+        await db.commit()
+    return job.job_id
+
+
+async def load_job(job_id: str) -> BatchJob:
+    async with SessionLocal() as db:
+        return await batch_queue(None, 1).get(db, job_id)
+
+
+def run(coroutine):
+    async def main():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        try:
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_long_running_batch_is_not_reclaimed():
+    stale_after = 0.4
+
+    async def handler(db, job):
+        # Run well past stale_after, committing progress the way run_batch_job does
+        for _ in range(12):
+            await asyncio.sleep(0.1)
+            job.filled_rows += 1
+            job.started_at = datetime.now(timezone.utc)
+            await db.commit()
+        return "batches/out.zip"
+
+    async def scenario():
+        job_id = await add_job(status="queued", attempts=0)
+        worker = batch_queue(handler, stale_after)
+        # Another process polling the same table
+        other = batch_queue(handler, stale_after)
+        worker.start()
+        try:
+            deadline = asyncio.get_running_loop().time() + 3
+            while (await load_job(job_id)).status != "succeeded":
+                assert await other._claim() is None
+                assert asyncio.get_running_loop().time() < deadline
+                await asyncio.sleep(0.05)
+        finally:
+            await worker.stop()
+        return await load_job(job_id)
+
+    job = run(scenario())
+    assert job.attempts == 1
+    assert job.filled_rows == 12
+
+
+def test_batch_without_heartbeat_is_requeued():
+    async def scenario():
+        started_at = datetime.now(timezone.utc) - timedelta(seconds=10)
+        job_id = await add_job(status="running", attempts=1, started_at=started_at)
+        assert await batch_queue(None, 5)._claim() is not None
+        return await load_job(job_id)
+
+    job = run(scenario())
+    assert job.status == "running"
+    assert job.attempts == 2
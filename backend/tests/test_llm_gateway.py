@@ -0,0 +1,53 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from services.llm_gateway import LLMGateway
+
+
+class SlowCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(60)
+
+
+def open_gateway() -> LLMGateway:
+    completions = SlowCompletions()
+    gateway = LLMGateway(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    for _ in range(gateway.breaker.failure_threshold):
+        gateway.breaker.record_failure()
+    # The cool-down is over; the next call is the probe
+    gateway.breaker.opened_at = time.monotonic() - gateway.breaker.reset_after
+    return gateway
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    async def scenario():
+        gateway = open_gateway()
+        probe = asyncio.create_task(gateway.create("question", token_cost=1, stream=True, messages=[]))
+        await asyncio.sleep(0.01)
+        assert gateway.breaker.probing
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        return gateway
+
+    gateway = asyncio.run(scenario())
+    assert not gateway.breaker.probing
+    assert gateway.breaker.allow()
+
+
+def test_timed_out_probe_lets_the_next_call_probe():
+    async def scenario():
+        gateway = open_gateway()
+        gateway.max_retries = 0
+        try:
+            await gateway.create("question", timeout=0.01, token_cost=1, messages=[])
+        except asyncio.TimeoutError:
+            pass
+        return gateway
+
+    gateway = asyncio.run(scenario())
+    assert not gateway.breaker.probing
@@ -0,0 +1,55 @@
+import time
+import threading
+from types import SimpleNamespace
+
+from services import llm_profiles
+from services.llm_profiles import count_tokens, load_encoding
+
+MESSAGES = [{"role": "user", "content": "What is your name?"}]
+
+
+class FakeEncoding:
+    def encode(self, text):
+        return text.split()
+
+
+def use_tiktoken(monkeypatch, encoding_for_model):
+    monkeypatch.setattr(llm_profiles, "tiktoken", SimpleNamespace(encoding_for_model=encoding_for_model))
+    monkeypatch.setattr(llm_profiles, "_encodings", {})
+    monkeypatch.setattr(llm_profiles, "_encoding_failed_at", {})
+    monkeypatch.setattr(llm_profiles, "_encodings_loading", set())
+
+
+def test_failed_encoding_load_is_retried(monkeypatch):
+    results = [OSError("offline"), FakeEncoding()]
+
+    def encoding_for_model(model):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    use_tiktoken(monkeypatch, encoding_for_model)
+    assert load_encoding("gpt-4o") is None
+    assert isinstance(load_encoding("gpt-4o"), FakeEncoding)
+
+
+def test_counting_does_not_wait_for_a_download(monkeypatch):
+    download = threading.Event()
+    loaded = threading.Event()
+
+    def encoding_for_model(model):
+        download.wait(5)
+        loaded.set()
+        return FakeEncoding()
+
+    use_tiktoken(monkeypatch, encoding_for_model)
+    estimate = count_tokens(MESSAGES, "gpt-4o")
+    download.set()
+    assert loaded.wait(5)
+    for _ in range(100):
+        if "gpt-4o" in llm_profiles._encodings:
+            break
+        time.sleep(0.01)
+    assert estimate == 3 + 3 + (len(MESSAGES[0]["content"]) + 3) // 4
+    assert count_tokens(MESSAGES, "gpt-4o") == 3 + 3 + 4
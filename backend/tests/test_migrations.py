@@ -0,0 +1,39 @@
+import os
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    return config
+
+
+def test_create_all_database_is_stamped_and_upgraded(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'create_all.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    config = alembic_config()
+
+    # The tables the old startup create_all() built, without Alembic's version table
+    command.upgrade(config, "0001_initial_schema")
+    engine = sa.create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(sa.text("DROP TABLE alembic_version"))
+        connection.execute(sa.text(
+            "INSERT INTO form_sessions (session_id, filename, file_path, status) "
+            "VALUES ('s1', 'f.pdf', 'f.pdf', 'active')"
+        ))
+
+    command.upgrade(config, "head")
+
+    head = ScriptDirectory.from_config(config).get_current_head()
+    with engine.connect() as connection:
+        assert connection.scalar(sa.text("SELECT version_num FROM alembic_version")) == head
+        assert connection.scalar(sa.text("SELECT session_id FROM form_sessions")) == "s1"
+        assert "batch_jobs" in sa.inspect(connection).get_table_names()
+    engine.dispose()
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from services.pdf_worker import PDFWorkerBusyError, PDFWorkerPool, PDFWorkerTimeoutError
+
+
+def _sleep(seconds: float):
+    time.sleep(seconds)
+    return os.getpid(), {}
+
+
+def test_timed_out_job_gives_back_its_process_and_slot():
+    async def scenario():
+        pool = PDFWorkerPool(max_workers=1, queue_size=2, job_timeout=0.5)
+        try:
+            hung_pid = await pool.submit(_sleep, 0)
+            hung = asyncio.create_task(pool.submit(_sleep, 30))
+            await asyncio.sleep(0.05)
+            # Waiting behind the hung job in the same pool
+            queued = asyncio.create_task(pool.submit(_sleep, 0))
+            with pytest.raises(PDFWorkerTimeoutError):
+                await hung
+            queued_pid = await queued
+            await asyncio.sleep(0.2)
+            return hung_pid, queued_pid, pool.pending, await pool.submit(_sleep, 0)
+        finally:
+            pool.shutdown()
+
+    hung_pid, queued_pid, pending, next_pid = asyncio.run(scenario())
+    assert queued_pid != hung_pid
+    assert next_pid == queued_pid
+    assert pending == 0
+    with pytest.raises(ProcessLookupError):
+        os.kill(hung_pid, 0)
+
+
+def test_waiting_in_the_queue_does_not_count_towards_the_timeout():
+    async def scenario():
+        pool = PDFWorkerPool(max_workers=2, queue_size=4, job_timeout=0.5)
+        pool.queue_timeout = 5
+        try:
+            await pool.warm()
+            # Three waves of healthy jobs; the last one finishes well after job_timeout from submission
+            return await asyncio.gather(*(pool.submit(_sleep, 0.3) for _ in range(6)))
+        finally:
+            pool.shutdown()
+
+    pids = asyncio.run(scenario())
+    assert len(set(pids)) == 2
+
+
+def test_job_stuck_in_the_queue_is_withdrawn_without_killing_running_jobs():
+    async def scenario():
+        pool = PDFWorkerPool(max_workers=1, queue_size=3, job_timeout=5)
+        pool.queue_timeout = 0.3
+        try:
+            await pool.warm()
+            running = asyncio.create_task(pool.submit(_sleep, 0.8))
+            await asyncio.sleep(0.1)
+            # The executor hands a couple of jobs to its call queue early, where they can no longer be withdrawn
+            handed_over = [asyncio.create_task(pool.submit(_sleep, 0)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            with pytest.raises(PDFWorkerBusyError):
+                await pool.submit(_sleep, 0)
+            assert pool.pending == 3
+            return await running, await asyncio.gather(*handed_over), pool.pending
+        finally:
+            pool.shutdown()
+
+    running_pid, handed_over_pids, pending = asyncio.run(scenario())
+    assert set(handed_over_pids) == {running_pid}
+    assert pending == 0
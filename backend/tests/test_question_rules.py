@@ -0,0 +1,23 @@
+from services.question_rules import question_for_field
+
+
+def test_numbered_checkboxes_get_distinct_questions():
+    questions = {question_for_field(f"Option {number}", "checkbox") for number in (1, 2, 3)}
+    assert questions == {f'Should "option {number}" be checked? (yes/no)' for number in (1, 2, 3)}
+
+
+def test_checkbox_without_words_is_left_to_the_model():
+    assert question_for_field("Check Box1", "checkbox") is None
+
+
+def test_business_name_asks_for_the_company():
+    assert question_for_field("Business Name", "text") == "What is the name of your company?"
+    assert question_for_field("Home First Name", "text") is None
+
+
+def test_numbered_fields_keep_their_ordinal():
+    questions = [question_for_field(f"Date{number}", "text") for number in (1, 2, 3)]
+    assert len(set(questions)) == 3
+    assert questions[1] == "What second date should go in this field? (MM/DD/YYYY)"
+    assert question_for_field("Position 1", "text") == "What is your first occupation?"
+    assert question_for_field("Position 2", "text") == "What is your second occupation?"
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from database import Base, SessionLocal, engine
+from models import BatchJob, FormTemplate
+from services.session_reaper import SessionReaper
+from services.storage import LocalStorage
+from services.template_service import TemplateRegistry
+
+
+def run(coroutine):
+    async def main():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        try:
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def add_template(registry: TemplateRegistry, storage: LocalStorage):
+    content_hash = uuid.uuid4().hex
+    staged_path = os.path.join(storage.root, content_hash)
+    with open(staged_path, "wb") as f:
+        f.write(b"%PDF-1.4")
+    file_path = await registry.store_file(content_hash, staged_path)
+    # Uploaded long enough ago for the orphan grace period to have passed
+    os.utime(storage.path(file_path), (time.time() - 7200,) * 2)
+    async with SessionLocal() as db:
+        return await registry.register(db, content_hash, file_path, [], 8)
+
+
+def test_unused_templates_are_reaped():
+    storage = LocalStorage(tempfile.mkdtemp())
+    registry = TemplateRegistry(storage=storage)
+    reaper = SessionReaper(SessionLocal, storage, template_registry=registry)
+
+    async def scenario():
+        # Batch jobs left by other tests would keep templates with their made up ids
+        async with SessionLocal() as db:
+            await db.execute(delete(BatchJob))
+            await db.commit()
+        unused = await add_template(registry, storage)
+        in_use = await add_template(registry, storage)
+        async with SessionLocal() as db:
+            # A batch still waiting to run keeps its template however long ago it was used
+            db.add(BatchJob(
+                job_id=str(uuid.uuid4()), template_id=in_use.id, rows_path="batches/rows.jsonl", total_rows=1,
+                status="queued",
+            ))
+            await db.commit()
+
+        # Nothing is old enough yet
+        assert (await reaper.run_once())["deleted_templates"] == 0
+        later = datetime.now(timezone.utc) + timedelta(seconds=reaper.template_ttl + 60)
+        counts = await reaper.run_once(later)
+
+        async with SessionLocal() as db:
+            remaining = set(await db.scalars(
+                select(FormTemplate.id).where(FormTemplate.id.in_((unused.id, in_use.id)))
+            ))
+            # Another process still holding the reaped template finds out when it uses it
+            assert not await TemplateRegistry(storage=storage).touch(db, unused)
+        return counts, remaining, unused, in_use
+
+    counts, remaining, unused, in_use = run(scenario())
+    assert counts["deleted_templates"] == 1
+    assert remaining == {in_use.id}
+    assert registry._hash_by_id.get(unused.id) is None
+    assert unused.content_hash not in registry._cache
+    assert not os.path.exists(storage.path(unused.file_path))
+    assert os.path.exists(storage.path(in_use.file_path))
+
@@ -0,0 +1,38 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from services.storage import S3Storage  # noqa: E402
+
+
+def test_s3_cache_is_trimmed_least_recently_used_first(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "forms")
+    monkeypatch.setenv("STORAGE_CACHE_DIR", tempfile.mkdtemp())
+    monkeypatch.setenv("STORAGE_CACHE_MAX_BYTES", "25")
+    monkeypatch.setenv("STORAGE_CACHE_MIN_AGE", "60")
+    storage = S3Storage()
+
+    def cache(name: str, used_ago: float):
+        path = storage._cache_path(f"templates/{name}.pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        os.utime(path, (time.time() - used_ago,) * 2)
+
+    cache("old", 1000)
+    cache("older", 2000)
+    cache("recent", 500)
+    # Over the size bound but used too recently to evict
+    cache("in_use", 10)
+    assert asyncio.run(storage.trim_cache()) == 2
+    assert sorted(os.listdir(os.path.join(storage.cache_dir, "objects", "templates"))) == ["in_use.pdf", "recent.pdf"]
+
+    # Unused for longer than the age bound
+    cache("stale", storage.cache_max_age + 60)
+    assert asyncio.run(storage.trim_cache()) == 1
+    assert not os.path.exists(storage._cache_path("templates/stale.pdf"))
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react'
 import { Download, CheckCircle, RefreshCw } from 'lucide-react'
-import { completeForm, downloadForm } from '../services/api'
+import { waitForCompletedForm, downloadForm } from '../services/api'
 
 const CompletionStep = ({ sessionId, filename, onStartOver }) => {
   const [isGenerating, setIsGenerating] = useState(true)
@@ -17,7 +17,7 @@ const CompletionStep = ({ sessionId, filename, onStartOver }) => {
     setError('')
     
     try {
-      const result = await completeForm(sessionId)
+      const result = await waitForCompletedForm(sessionId)
       setDownloadUrl(result.download_url)
       setIsReady(true)
     } catch (err) {
@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { MessageSquare, Send, Loader } from 'lucide-react'
-import { getNextQuestion, submitAnswer, getSessionStatus } from '../services/api'
+import { getNextQuestion, streamNextQuestion, submitAnswer, getSessionStatus } from '../services/api'
 
 const ConversationStep = ({ sessionId, onFormComplete, onProgressUpdate }) => {
   const [question, setQuestion] = useState('')
@@ -9,13 +9,64 @@ const ConversationStep = ({ sessionId, onFormComplete, onProgressUpdate }) => {
   const [isLoading, setIsLoading] = useState(false)
   const [isSubmitting, setIsSubmitting] = useState(false)
   const [conversation, setConversation] = useState([])
+  const closeStreamRef = useRef(null)
 
   useEffect(() => {
     loadNextQuestion()
     updateProgress()
+    return () => closeStreamRef.current?.()
   }, [sessionId])
 
-  const loadNextQuestion = async () => {
+  const loadNextQuestion = () => {
+    if (typeof EventSource === 'undefined') {
+      return fetchNextQuestion()
+    }
+
+    setIsLoading(true)
+    closeStreamRef.current?.()
+
+    return new Promise((resolve) => {
+      let receivedField = false
+
+      closeStreamRef.current = streamNextQuestion(sessionId, {
+        onField: (field) => {
+          receivedField = true
+          if (field.is_complete) {
+            closeStreamRef.current?.()
+            setIsLoading(false)
+            onFormComplete()
+            resolve()
+            return
+          }
+          setQuestion('')
+          setCurrentField({
+            name: field.field_name,
+            type: field.field_type,
+            names: field.field_names || [field.field_name]
+          })
+          setIsLoading(false)
+        },
+        onToken: (text) => {
+          setQuestion(prev => prev + text)
+        },
+        onDone: (fullQuestion) => {
+          setQuestion(fullQuestion)
+          resolve()
+        },
+        onError: async (error) => {
+          console.error('Error streaming question:', error)
+          // Fall back to the regular endpoint if the stream failed before it started
+          if (!receivedField) {
+            await fetchNextQuestion()
+          }
+          setIsLoading(false)
+          resolve()
+        }
+      })
+    })
+  }
+
+  const fetchNextQuestion = async () => {
     setIsLoading(true)
     try {
       const response = await getNextQuestion(sessionId)
@@ -28,7 +79,8 @@ const ConversationStep = ({ sessionId, onFormComplete, onProgressUpdate }) => {
       setQuestion(response.question)
       setCurrentField({
         name: response.field_name,
-        type: response.field_type
+        type: response.field_type,
+        names: response.field_names || [response.field_name]
       })
     } catch (error) {
       console.error('Error loading question:', error)
@@ -59,13 +111,13 @@ const ConversationStep = ({ sessionId, onFormComplete, onProgressUpdate }) => {
       setConversation(prev => [...prev, {
         type: 'question',
         text: question,
-        fieldName: currentField.name
+        fieldName: currentField.names.join(', ')
       }, {
         type: 'answer',
         text: answer
       }])
 
-      await submitAnswer(sessionId, currentField.name, answer)
+      await submitAnswer(sessionId, currentField.names, answer)
       setAnswer('')
       
       // Update progress
@@ -141,7 +193,9 @@ const ConversationStep = ({ sessionId, onFormComplete, onProgressUpdate }) => {
                 <p className="text-gray-800 text-lg">{question}</p>
                 {currentField && (
                   <p className="text-xs text-gray-500 mt-2">
-                    Field: {currentField.name} ({currentField.type})
+                    {currentField.names.length > 1
+                      ? `Fields: ${currentField.names.join(', ')}`
+                      : `Field: ${currentField.name} (${currentField.type})`}
                   </p>
                 )}
               </div>
@@ -60,10 +60,39 @@ export const getNextQuestion = async (sessionId) => {
   return api.get(`/session/${sessionId}/question`)
 }
 
-export const submitAnswer = async (sessionId, fieldName, answer) => {
-  return api.post(`/session/${sessionId}/answer`, {
-    field_name: fieldName,
-    answer: answer
+// Stream the next question over Server-Sent Events. Returns a function that closes the stream.
+export const streamNextQuestion = (sessionId, { onField, onToken, onDone, onError }) => {
+  const apiUrl = import.meta.env.VITE_API_URL?.replace(/\/$/, '') || ''
+  const source = new EventSource(`${apiUrl}/session/${sessionId}/question/stream`)
+
+  source.addEventListener('field', (event) => onField?.(JSON.parse(event.data)))
+  source.addEventListener('token', (event) => onToken?.(JSON.parse(event.data).text))
+  source.addEventListener('done', (event) => {
+    source.close()
+    onDone?.(JSON.parse(event.data).question)
+  })
+  source.onerror = (error) => {
+    source.close()
+    onError?.(error)
+  }
+
+  return () => source.close()
+}
+
+// fieldNames is one field name, or every field of a multi-field question
+export const submitAnswer = async (sessionId, fieldNames, answer) => {
+  const names = Array.isArray(fieldNames) ? fieldNames : [fieldNames]
+  return api.post(`/session/${sessionId}/answer`, names.length > 1
+    ? { field_names: names, answer: answer }
+    : { field_name: names[0], answer: answer })
+}
+
+export const submitAnswers = async (sessionId, answers) => {
+  return api.post(`/session/${sessionId}/answers`, {
+    answers: answers.map(({ fieldName, answer }) => ({
+      field_name: fieldName,
+      answer: answer
+    }))
   })
 }
 
@@ -71,6 +100,27 @@ export const completeForm = async (sessionId) => {
   return api.get(`/session/${sessionId}/complete`)
 }
 
+export const getCompletionJob = async (jobId) => {
+  return api.get(`/jobs/${jobId}`)
+}
+
+// Queue PDF generation and poll the job until it finishes
+export const waitForCompletedForm = async (sessionId, { interval = 1000, timeout = 300000 } = {}) => {
+  let job = await completeForm(sessionId)
+  const deadline = Date.now() + timeout
+  while (job.status === 'queued' || job.status === 'running') {
+    if (Date.now() > deadline) {
+      throw new Error('Generating the completed form is taking too long. Please try again.')
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval))
+    job = await getCompletionJob(job.job_id)
+  }
+  if (job.status === 'failed') {
+    throw new Error(job.error || 'Failed to generate completed form')
+  }
+  return job
+}
+
 export const downloadForm = async (sessionId, filename) => {
   try {
     const apiUrl = import.meta.env.VITE_API_URL?.replace(/\/$/, '') || '';